@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of the copyright notice checker on synthetic source trees.
+
+Each scenario generates a tree, then checks it in a fresh process, either
+through CopyrightNoticeChecker.check_files_have_notice ("api") or through the
+command line entry point ("cli"). The results are compared to a stored baseline:
+
+    python -m benchmarks.run [--scenario NAME] [--update-baseline]
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from scripts.copyright_notice import CopyrightNoticeChecker, main
+
+from .synthetic import TreeSpec, generate_tree
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_TOLERANCE = 0.25
+
+NOTICE = b"""Copyright (C) ACME Inc - All Rights Reserved
+
+Unauthorized copying of this file, via any medium is strictly prohibited.
+Proprietary and confidential."""
+
+
+class Scenario(NamedTuple):
+    """Synthetic tree and checker options to measure"""
+
+    tree: TreeSpec
+    entry: str = "api"
+    jobs: Optional[int] = None
+    io_concurrency: Optional[int] = None
+    max_header_lines: Optional[int] = None
+
+
+class Result(NamedTuple):
+    """Measurements of a scenario"""
+
+    files: int
+    bytes: int
+    wall_s: float
+    files_per_s: float
+    bytes_per_s: float
+    peak_rss_kib: Optional[int]
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "small-files-api": Scenario(TreeSpec(files=5000, mean_size=2048)),
+    "small-files-cli": Scenario(TreeSpec(files=5000, mean_size=2048), entry="cli"),
+    "small-files-serial": Scenario(TreeSpec(files=5000, mean_size=2048), jobs=1),
+    "small-files-async": Scenario(
+        TreeSpec(files=5000, mean_size=2048), io_concurrency=64
+    ),
+    "large-files-misses": Scenario(
+        TreeSpec(
+            files=200, mean_size=256 * 1024, notice_position="bottom", hit_ratio=0.5
+        )
+    ),
+    "header-window": Scenario(
+        TreeSpec(files=2000, mean_size=16 * 1024, hit_ratio=0.8), max_header_lines=30
+    ),
+}
+
+
+def peak_rss_kib() -> Optional[int]:
+    """
+    Get the peak resident set size of the current process.
+
+    :return: Peak RSS in KiB, or None where it cannot be measured (Windows)
+    """
+    # Unlike ru_maxrss, VmHWM is not inherited from the parent across exec
+    try:
+        with open("/proc/self/status", encoding="ascii") as f_status:
+            for line in f_status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, in KiB elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _check(scenario: Scenario, paths: List[str], notice_path: str) -> None:
+    if scenario.entry == "api":
+        CopyrightNoticeChecker.check_files_have_notice_with_retcode(
+            paths,
+            notice_path,
+            enforce_all=True,
+            jobs=scenario.jobs,
+            io_concurrency=scenario.io_concurrency,
+            max_header_lines=scenario.max_header_lines,
+        )
+        return
+    argv = [*paths, "--enforce-all", "--no-cache", f"--notice={notice_path}"]
+    if scenario.jobs is not None:
+        argv.append(f"--jobs={scenario.jobs}")
+    if scenario.io_concurrency is not None:
+        argv.append(f"--io-concurrency={scenario.io_concurrency}")
+    if scenario.max_header_lines is not None:
+        argv.append(f"--max-header-lines={scenario.max_header_lines}")
+    main(argv)
+
+
+def _measure(
+    scenario: Scenario, paths: List[str], total: int, notice_path: str, repeat: int
+) -> Result:
+    # The warnings about the files missing the notice would flood the output
+    logging.disable(logging.WARNING)
+    wall_s = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _check(scenario, paths, notice_path)
+        wall_s = min(wall_s, time.perf_counter() - start)
+    return Result(
+        files=len(paths),
+        bytes=total,
+        wall_s=wall_s,
+        files_per_s=len(paths) / wall_s,
+        bytes_per_s=total / wall_s,
+        peak_rss_kib=peak_rss_kib(),
+    )
+
+
+def run_scenario(scenario: Scenario, repeat: int = 3) -> Result:
+    """
+    Generate the tree of a scenario and measure the check of it.
+
+    The check runs in a fresh process, so that the peak RSS is its own.
+    The wall time is the best one of the repetitions.
+
+    :param scenario: Scenario to run
+    :param repeat: Number of repetitions of the check
+    :return: Measurements of the scenario
+    """
+    with tempfile.TemporaryDirectory(prefix="copyright-notice-bench-") as root:
+        notice_path = os.path.join(root, "copyright.txt")
+        with open(notice_path, "wb") as f_notice:
+            f_notice.write(NOTICE)
+        paths, total = generate_tree(root, scenario.tree, NOTICE)
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            return pool.apply(_measure, (scenario, paths, total, notice_path, repeat))
+
+
+def compare_to_baseline(
+    name: str,
+    result: Result,
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> List[str]:
+    """
+    Find the regressions of a scenario with respect to the baseline.
+
+    :param name: Name of the scenario
+    :param result: Measurements of the scenario
+    :param baseline: Baseline measurements, by scenario name
+    :param tolerance: Accepted relative slowdown or memory increase
+    :return: Description of each regression found
+    """
+    reference = baseline.get(name)
+    if reference is None:
+        return []
+    regressions = []
+    for metric in ("files_per_s", "bytes_per_s"):
+        if getattr(result, metric) < reference[metric] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {metric} {getattr(result, metric):.0f} "
+                f"< baseline {reference[metric]:.0f}"
+            )
+    if (
+        result.peak_rss_kib is not None
+        and reference.get("peak_rss_kib") is not None
+        and result.peak_rss_kib > reference["peak_rss_kib"] * (1 + tolerance)
+    ):
+        regressions.append(
+            f"{name}: peak_rss_kib {result.peak_rss_kib} "
+            f"> baseline {reference['peak_rss_kib']}"
+        )
+    return regressions
+
+
+def _load_baseline(path: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as f_baseline:
+            return json.load(f_baseline)["scenarios"]
+    except FileNotFoundError:
+        return {}
+
+
+def run(argv: Optional[Sequence[str]] = None) -> int:
+    """Benchmark entry point"""
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="Scenario to run (default: all). Can be repeated.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of repetitions of each check; the best time is kept.",
+    )
+    parser.add_argument(
+        "--baseline", default=BASELINE_PATH, help="Path to the baseline file."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Accepted relative regression with respect to the baseline.",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store the results as the new baseline instead of comparing them.",
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    baseline = _load_baseline(args.baseline)
+    results: Dict[str, Dict[str, Any]] = {}
+    regressions: List[str] = []
+    for name in args.scenario or sorted(SCENARIOS):
+        result = run_scenario(SCENARIOS[name], args.repeat)
+        results[name] = result._asdict()
+        print(
+            f"{name:<20} {result.files:>6} files {result.bytes / 2 ** 20:>8.1f} MiB "
+            f"{result.wall_s:>7.3f} s {result.files_per_s:>9.0f} files/s "
+            f"{result.bytes_per_s / 2 ** 20:>7.1f} MiB/s "
+            f"peak RSS {result.peak_rss_kib or 0:>7} KiB"
+        )
+        regressions.extend(compare_to_baseline(name, result, baseline, args.tolerance))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f_out:
+            json.dump({"scenarios": results}, f_out, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f_baseline:
+            json.dump({"scenarios": {**baseline, **results}}, f_baseline, indent=2)
+            f_baseline.write("\n")
+        return 0
+    for regression in regressions:
+        print(f"Regression: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+"""Generation of synthetic source trees to benchmark the checker on"""
+
+import math
+import os
+import random
+from typing import List, NamedTuple, Tuple
+
+SIZE_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+NOTICE_POSITIONS = ("top", "middle", "bottom")
+
+_FILLER_LINE = b"value = compute(value, 42)  # filler line of a synthetic file\n"
+
+
+class TreeSpec(NamedTuple):
+    """Shape of a synthetic source tree"""
+
+    files: int
+    mean_size: int
+    size_distribution: str = "lognormal"
+    notice_position: str = "top"
+    hit_ratio: float = 1.0
+    files_per_dir: int = 100
+    seed: int = 0
+
+
+def _file_size(rng: random.Random, spec: TreeSpec) -> int:
+    if spec.size_distribution == "fixed":
+        return spec.mean_size
+    if spec.size_distribution == "uniform":
+        return rng.randint(1, 2 * spec.mean_size)
+    # The mean of lognormvariate(0, 1) is exp(1/2)
+    return max(1, int(rng.lognormvariate(0, 1) * spec.mean_size / math.exp(0.5)))
+
+
+def _file_content(
+    rng: random.Random, spec: TreeSpec, size: int, notice: bytes
+) -> bytes:
+    filler = (_FILLER_LINE * (size // len(_FILLER_LINE) + 1))[:size]
+    if rng.random() >= spec.hit_ratio:
+        return filler
+    if spec.notice_position == "top":
+        pos = 0
+    elif spec.notice_position == "middle":
+        pos = filler.rfind(b"\n", 0, size // 2) + 1
+    else:
+        pos = len(filler)
+    return filler[:pos] + notice + b"\n" + filler[pos:]
+
+
+def generate_tree(root: str, spec: TreeSpec, notice: bytes) -> Tuple[List[str], int]:
+    """
+    Write a synthetic source tree, deterministically for a given spec.
+
+    :param root: Directory to write the tree into
+    :param spec: Shape of the tree
+    :param notice: Bytes representation of the notice to insert in the hits
+    :return: Paths of the generated files, and their total size in bytes
+    :raises ValueError: if the spec is invalid
+    """
+    if spec.size_distribution not in SIZE_DISTRIBUTIONS:
+        raise ValueError(f"Unknown size distribution: {spec.size_distribution}")
+    if spec.notice_position not in NOTICE_POSITIONS:
+        raise ValueError(f"Unknown notice position: {spec.notice_position}")
+    rng = random.Random(spec.seed)
+    paths = []
+    total = 0
+    for idx in range(spec.files):
+        dirpath = os.path.join(root, f"pkg{idx // spec.files_per_dir:04d}")
+        if idx % spec.files_per_dir == 0:
+            os.makedirs(dirpath, exist_ok=True)
+        path = os.path.join(dirpath, f"module{idx:06d}.py")
+        content = _file_content(rng, spec, _file_size(rng, spec), notice)
+        with open(path, "wb") as f_out:
+            f_out.write(content)
+        paths.append(path)
+        total += len(content)
+    return paths, total
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+
+"""Persistent cache of the per-file check results"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from stat import S_ISREG
+from typing import Any, Dict, List, Optional, Tuple
+
+from .util import cmd_output, git_dir, write_atomically
+
+CACHE_FILENAME = "results.json"
+CACHE_FORMAT_VERSION = 3
+DEFAULT_MAX_ENTRIES = 100000
+
+# Files modified less than this many seconds before the check are not cached,
+# since a further change within the same mtime tick would go unnoticed.
+RACY_INTERVAL_S = 2.0
+
+FileKey = Tuple[int, int, int]
+
+# Entries of the cache files kept loaded across checks, by path (see keep_loaded)
+_loaded_entries: Optional[Dict[str, Dict[str, List[Any]]]] = None
+
+
+def keep_loaded() -> None:
+    """
+    Keep the cache files in memory once loaded, for long-lived processes.
+
+    Further ResultCache instances on the same file share its entries instead of
+    reading it again. The file is still written on save.
+    """
+    global _loaded_entries
+    if _loaded_entries is None:
+        _loaded_entries = {}
+
+
+def default_cache_dir() -> Optional[str]:
+    """
+    Get the default cache directory, inside the Git directory of the repository.
+
+    :return: Path to the cache directory, or None if not in a Git repository
+    """
+    gitdir = git_dir()
+    if gitdir is None:
+        try:
+            gitdir = cmd_output("git", "rev-parse", "--git-dir").strip()
+        except (OSError, RuntimeError):
+            return None
+    return os.path.join(gitdir, "copyright-notice-cache")
+
+
+def config_digest(*parts: bytes) -> str:
+    """
+    Hash the inputs a verdict depends on, besides the file content.
+
+    :param parts: Notice template bytes and serialized check options
+    :return: Hex digest
+    """
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(len(part).to_bytes(8, "little"))
+        hasher.update(part)
+    return hasher.hexdigest()[:32]
+
+
+def file_key(filepath: str) -> Optional[FileKey]:
+    """
+    Identify a version of a file by its size, modification time and inode.
+
+    :param filepath: Path to the file
+    :return: Key of the file, or None if the file should not be cached
+    """
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    if not S_ISREG(stat.st_mode):
+        # e.g. named pipes, whose content is not identified by their stat
+        return None
+    if time.time() - stat.st_mtime < RACY_INTERVAL_S:
+        return None
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+class ResultCache:
+    """
+    On-disk map from (file path, file key, config digest) to the check outcome.
+
+    Entries are evicted in least-recently-used order once max_entries is exceeded.
+    """
+
+    def __init__(
+        self, cache_dir: str, digest: str, max_entries: int = DEFAULT_MAX_ENTRIES
+    ):
+        self.path = os.path.join(cache_dir, CACHE_FILENAME)
+        self.digest = digest
+        self.max_entries = max_entries
+        self._entries: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._now = int(time.time())
+        self._load()
+
+    def _entry_name(self, filepath: str) -> str:
+        return f"{self.digest}:{filepath}"
+
+    def _load(self) -> None:
+        if _loaded_entries is not None and self.path in _loaded_entries:
+            self._entries = _loaded_entries[self.path]
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f_cache:
+                data = json.load(f_cache)
+            if data.get("version") == CACHE_FORMAT_VERSION:
+                self._entries = data["entries"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, AttributeError) as exc:
+            logging.debug("Ignoring unreadable cache %s: %s", self.path, exc)
+        if _loaded_entries is not None:
+            _loaded_entries[self.path] = self._entries
+
+    def get(
+        self, filepath: str, key: FileKey
+    ) -> Optional[Tuple[str, int, Optional[str], Optional[str]]]:
+        """
+        Look up the outcome of a previous check of a file.
+
+        :param filepath: Path to the file
+        :param key: Current key of the file
+        :return: (verdict, offset, template, skip reason) tuple,
+            or None on cache miss
+        """
+        entry = self._entries.get(self._entry_name(filepath))
+        if entry is None or tuple(entry[0]) != key:
+            return None
+        with self._lock:
+            entry[3] = self._now
+            self._dirty = True
+        return entry[1], entry[2], entry[4], entry[5]
+
+    def put(
+        self,
+        filepath: str,
+        key: FileKey,
+        verdict: str,
+        offset: int,
+        template: Optional[str] = None,
+        reason: Optional[str] = None,
+    ) -> None:
+        """
+        Store the outcome of the check of a file.
+
+        :param filepath: Path to the file
+        :param key: Key of the file when it was checked
+        :param verdict: Verdict of the check
+        :param offset: Position of the notice in the file
+        :param template: Name of the matched notice template
+        :param reason: Reason the check of the file was skipped
+        """
+        with self._lock:
+            self._entries[self._entry_name(filepath)] = [
+                list(key),
+                verdict,
+                offset,
+                self._now,
+                template,
+                reason,
+            ]
+            self._dirty = True
+
+    def save(self) -> None:
+        """Evict the exceeding entries and write the cache to disk atomically"""
+        if not self._dirty:
+            return
+        if len(self._entries) > self.max_entries:
+            by_last_use = sorted(self._entries.items(), key=lambda item: item[1][3])
+            self._entries = dict(by_last_use[-self.max_entries :])
+            if _loaded_entries is not None:
+                _loaded_entries[self.path] = self._entries
+        data = {"version": CACHE_FORMAT_VERSION, "entries": self._entries}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            write_atomically(
+                self.path, json.dumps(data, separators=(",", ":")).encode()
+            )
+        except OSError as exc:
+            logging.debug("Failed to write cache %s: %s", self.path, exc)
+        self._dirty = False
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+"""
+Thin client of the copyright-notice daemon.
+
+It forwards the command line to the daemon if one is listening, and checks
+the files in-process otherwise. Only lightweight modules are imported until
+the fallback is needed, to keep the startup time of the client low.
+"""
+
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+import tempfile
+from typing import Any, Dict, Optional, Sequence
+
+PROTOCOL_VERSION = 1
+SOCKET_ENV = "COPYRIGHT_NOTICE_SOCKET"
+
+# Seconds to wait for the daemon to accept a request (e.g. while it serves
+# another client, or if it is stuck), before checking the files in-process
+ACCEPT_TIMEOUT = 5.0
+
+
+def default_socket_path() -> str:
+    """
+    Get the path to the socket of the daemon of the current user.
+
+    :return: Value of COPYRIGHT_NOTICE_SOCKET if set, otherwise a path in the
+        runtime directory of the user (or in the temporary directory)
+    """
+    if os.environ.get(SOCKET_ENV):
+        return os.environ[SOCKET_ENV]
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.path.join(runtime_dir, f"copyright-notice-{uid}.sock")
+
+
+def build_request(argv: Sequence[str]) -> Dict[str, Any]:
+    """
+    Describe an invocation of the command line to the daemon.
+
+    :param argv: Command-line arguments
+    :return: Request with the arguments, the working directory and the
+        Git environment variables (e.g. GIT_INDEX_FILE set by Git hooks)
+    """
+    return {
+        "version": PROTOCOL_VERSION,
+        "argv": list(argv),
+        "cwd": os.getcwd(),
+        "env": {key: val for key, val in os.environ.items() if key.startswith("GIT_")},
+    }
+
+
+def _is_own_socket(socket_path: str) -> bool:
+    """
+    Check that a socket was created by the current user, so that its daemon
+    can be trusted (e.g. not one of another user, in a shared temporary
+    directory).
+
+    :param socket_path: Path to the socket of the daemon
+    :return: False if there is no socket, or if it belongs to another user
+    """
+    try:
+        st = os.stat(socket_path)
+    except OSError:
+        return False
+    if not stat.S_ISSOCK(st.st_mode):
+        return False
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        sys.stderr.write(f"Ignoring {socket_path}, owned by another user\n")
+        return False
+    return True
+
+
+def _is_own_peer(sock: socket.socket) -> bool:
+    """Check that the peer of a connected socket runs as the current user"""
+    if not hasattr(socket, "SO_PEERCRED"):
+        # The owner of the socket was checked before connecting
+        return True
+    creds = sock.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid == os.getuid()
+
+
+def run_remote(
+    argv: Sequence[str], socket_path: str, accept_timeout: float = ACCEPT_TIMEOUT
+) -> Optional[int]:
+    """
+    Run the command line through the daemon, relaying its output.
+
+    Only daemons of the current user are trusted. Once the daemon accepted
+    the request, the check runs as long as it takes.
+
+    :param argv: Command-line arguments
+    :param socket_path: Path to the socket of the daemon
+    :param accept_timeout: Seconds to wait for the daemon to accept the request
+    :return: Exit code, or None if the daemon is not available and
+        nothing was relayed yet
+    """
+    if not hasattr(socket, "AF_UNIX") or not _is_own_socket(socket_path):
+        return None
+    relayed = False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(accept_timeout)
+            sock.connect(socket_path)
+            if not _is_own_peer(sock):
+                return None
+            sock.sendall(json.dumps(build_request(argv)).encode() + b"\n")
+            with sock.makefile("rb") as f_sock:
+                for line in f_sock:
+                    message = json.loads(line)
+                    if "accepted" in message:
+                        sock.settimeout(None)
+                        continue
+                    if "retcode" in message:
+                        return int(message["retcode"])
+                    if "error" in message:
+                        break
+                    for name in ("stdout", "stderr"):
+                        if name in message:
+                            getattr(sys, name).write(message[name])
+                            relayed = True
+    except (OSError, ValueError):
+        pass
+    # The daemon went away, did not accept the request in time or refused it
+    return 255 if relayed else None
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """copyright-notice-precommit entry point, through the daemon if available"""
+
+    if argv is None:
+        argv = sys.argv[1:]
+    # The standard input of the client cannot be checked by the daemon
+    if "-" not in argv:
+        retcode = run_remote(argv, default_socket_path())
+        if retcode is not None:
+            return retcode
+
+    from .copyright_notice import main as check_main
+
+    return check_main(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+"""Registry of the comment syntaxes, to render plain-text notices per language"""
+
+import os
+from typing import Dict, Mapping, NamedTuple, Optional
+
+
+class CommentStyle(NamedTuple):
+    """Syntax of the comment holding a notice"""
+
+    # Prefix of each line of the notice
+    prefix: str
+    # Lines opening and closing the comment block, if any
+    start: str = ""
+    end: str = ""
+
+    def render(self, text: bytes) -> bytes:
+        """
+        Turn a plain-text notice into a comment.
+
+        Leading and trailing line breaks of the text are ignored, and the
+        trailing whitespace of each line is removed (e.g. the prefix of empty
+        lines). The line endings of the text are kept.
+
+        :param text: Bytes representation of the plain-text notice
+        :return: Bytes representation of the commented notice
+        """
+        newline = b"\r\n" if b"\r\n" in text else b"\n"
+        prefix = self.prefix.encode()
+        lines = [
+            (prefix + line).rstrip()
+            for line in text.strip(b"\r\n").replace(b"\r\n", b"\n").split(b"\n")
+        ]
+        if self.start:
+            lines.insert(0, self.start.encode())
+        if self.end:
+            lines.append(self.end.encode())
+        return newline.join(lines)
+
+
+# Comment styles, by name
+COMMENT_STYLES: Dict[str, CommentStyle] = {
+    "hash": CommentStyle("# "),
+    "slash": CommentStyle("// "),
+    "c-block": CommentStyle(" * ", "/*", " */"),
+    "dash": CommentStyle("-- "),
+    "html": CommentStyle("", "<!--", "-->"),
+    "semicolon": CommentStyle("; "),
+    "percent": CommentStyle("% "),
+}
+
+# Comment style of the files, by extension (or by name for files without one)
+EXTENSION_STYLES: Dict[str, str] = {
+    **dict.fromkeys(
+        (
+            ".py",
+            ".pyi",
+            ".pyx",
+            ".sh",
+            ".bash",
+            ".zsh",
+            ".fish",
+            ".rb",
+            ".pl",
+            ".pm",
+            ".r",
+            ".R",
+            ".jl",
+            ".ex",
+            ".exs",
+            ".nim",
+            ".cmake",
+            ".mk",
+            ".tf",
+            ".nix",
+            ".ps1",
+            ".yaml",
+            ".yml",
+            ".toml",
+            "CMakeLists.txt",
+            "Dockerfile",
+            "Makefile",
+        ),
+        "hash",
+    ),
+    **dict.fromkeys(
+        (
+            ".cc",
+            ".cpp",
+            ".cxx",
+            ".hh",
+            ".hpp",
+            ".hxx",
+            ".cs",
+            ".d",
+            ".dart",
+            ".go",
+            ".groovy",
+            ".java",
+            ".js",
+            ".jsx",
+            ".mjs",
+            ".cjs",
+            ".kt",
+            ".kts",
+            ".proto",
+            ".rs",
+            ".scala",
+            ".swift",
+            ".ts",
+            ".tsx",
+            ".zig",
+        ),
+        "slash",
+    ),
+    **dict.fromkeys((".c", ".h", ".m", ".css", ".scss", ".less"), "c-block"),
+    **dict.fromkeys((".sql", ".lua", ".hs", ".elm", ".adb", ".ads"), "dash"),
+    **dict.fromkeys((".html", ".htm", ".xhtml", ".xml", ".svg", ".vue", ".md"), "html"),
+    **dict.fromkeys((".el", ".lisp", ".clj", ".scm", ".asm"), "semicolon"),
+    **dict.fromkeys((".tex", ".sty", ".erl"), "percent"),
+}
+
+
+class CommentRegistry:
+    """
+    Map from files to the style of their comments.
+
+    The style of a file is given by its name (e.g. Makefile), otherwise by its
+    extension, as registered in EXTENSION_STYLES, with per-run overrides.
+    """
+
+    def __init__(self, overrides: Optional[Mapping[str, str]] = None) -> None:
+        """
+        :param overrides: Style names, by file extension (e.g. .jsx) or name
+        :raises ValueError: if a style is unknown
+        """
+        overrides = overrides or {}
+        self.styles: Dict[str, str] = {**EXTENSION_STYLES, **overrides}
+        for name in overrides.values():
+            if name not in COMMENT_STYLES:
+                raise ValueError(
+                    f"Unknown comment style: {name} "
+                    f"(expected one of {', '.join(COMMENT_STYLES)})"
+                )
+
+    def style_for(self, filepath: str) -> Optional[CommentStyle]:
+        """
+        Get the comment style of a file.
+
+        :param filepath: Path to the file
+        :return: Style of the file, or None if it is not known
+        """
+        basename = os.path.basename(filepath)
+        name = self.styles.get(basename)
+        if name is None:
+            name = self.styles.get(os.path.splitext(basename)[1])
+        return None if name is None else COMMENT_STYLES[name]
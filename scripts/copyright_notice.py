@@ -3,11 +3,37 @@
 """Entry point and core logic of the copyright-notice-precommit"""
 
 import argparse
+import datetime
+import enum
+import functools
 import logging
 import mmap
 import os.path
+import stat
 import sys
-from typing import Optional, Sequence
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from types import TracebackType
+from typing import (
+    Any,
+    BinaryIO,
+    Container,
+    Counter,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    Union,
+    cast,
+)
 
 from scripts.error import (
     CopyrightNoticeParsingError,
@@ -17,45 +43,664 @@ from scripts.error import (
     exception_to_retcode_mapping,
 )
 
-from .util import added_files, parse_file_as_bytes
+from .cache import (
+    DEFAULT_MAX_ENTRIES,
+    ResultCache,
+    config_digest,
+    default_cache_dir,
+    file_key,
+)
+from .comments import COMMENT_STYLES, CommentRegistry
+from .fixer import write_with_notice
+from .matcher import NearMiss, NoticeMatcher
+from .notice_config import PathTrie, read_notice_config
+from .reporters import JsonLinesReporter, Reporter, SarifReporter
+from .stats import CheckStats, phase
+from .util import (
+    HEADER_CHUNK_SIZE,
+    SKIP_REASONS,
+    SNIFF_SIZE,
+    STDIN_PATH,
+    STREAM_CHUNK_SIZE,
+    WIDE_ENCODINGS,
+    Buffer,
+    CreationYears,
+    GitCatFile,
+    added_files,
+    async_ordered_map,
+    changed_files,
+    content_skip_reason,
+    header_end,
+    ordered_map,
+    parse_file_as_bytes,
+    path_filter,
+    read_file_header,
+    read_stream_header,
+    readinto_full,
+    run_coroutine,
+    shard_of,
+    size_skip_reason,
+    sniff_encoding,
+    staged_object,
+    submodules_added_files,
+    tracked_files,
+)
+
+
+class Verdict(enum.Enum):
+    """Outcome of the check of a single file"""
+
+    FOUND = "found"
+    NOT_IN_HEADER = "not-in-header"
+    MISSING = "missing"
+    OUTDATED = "outdated"
+    FIXED = "fixed"
+    SKIPPED = "skipped"
+
+
+# Warning logged for each file failing the check, by verdict
+VERDICT_WARNINGS = {
+    Verdict.MISSING: "File %s does not contain a valid copyright notice.",
+    Verdict.NOT_IN_HEADER: (
+        "File %s does not contain a valid copyright notice in its header."
+    ),
+    Verdict.OUTDATED: "File %s contains a copyright notice with an outdated year.",
+    Verdict.FIXED: "File %s did not contain a valid copyright notice: fixed.",
+}
+
+# Verdicts of the files where the notice can be inserted
+FIXABLE_VERDICTS = (Verdict.MISSING, Verdict.NOT_IN_HEADER)
+
+# Verdicts of the files passing the check
+PASSING_VERDICTS = (Verdict.FOUND, Verdict.SKIPPED)
+
+# Policies on the year of templated notices:
+#  - any: any year is accepted
+#  - current: the latest year in the notice must be the current one
+#  - creation: the latest year in the notice must not precede the file creation
+YEAR_POLICIES = ("any", "current", "creation")
+
+# Default maximum number of files checked at once by the asynchronous checker
+DEFAULT_IO_CONCURRENCY = 64
+
+# Default maximum edit distance of the near misses, as a ratio of the notice length
+DEFAULT_NEAR_MISS_RATIO = 0.25
+
+# Maximum number of bytes at the beginning of the files searched for near misses
+NEAR_MISS_WINDOW = 16 * 1024
+
+
+class FileResult(NamedTuple):
+    """Result of the check of a single file"""
+
+    path: str
+    verdict: Verdict
+    offset: int = -1
+    template: Optional[str] = None
+    year: Optional[int] = None
+    reason: Optional[str] = None
+    near_miss: Optional[NearMiss] = None
+
+
+# Single notice template, or a matcher of one or more templates
+NoticePattern = Union[bytes, NoticeMatcher]
+
+# Path to one or more notice template files
+NoticePaths = Union[str, "os.PathLike[str]", Sequence[Union[str, "os.PathLike[str]"]]]
 
 
 class CopyrightNoticeChecker:
-    """Copyright notice checker for source code files"""
+    """
+    Copyright notice checker for source code files.
+
+    The static methods check files in one call. An instance is meant for
+    repeated checks with the same options (e.g. from a lint runner): the notices
+    are loaded and compiled, the added staged files listed, the results cache
+    loaded, and the worker threads started once, when the checker is created.
+    Used as a context manager, the checker is closed on exit.
+    """
+
+    def __init__(
+        self, notice_path: NoticePaths, *, jobs: Optional[int] = None, **options: Any
+    ):
+        """
+        :param notice_path: Path to the copyright notice template, or list of
+            paths to alternative templates (any of them is accepted)
+        :param jobs: Number of files checked in parallel (default: CPU count)
+        :param options: Further options of check_files_have_notice
+        :raises CopyrightNoticeTemplateFileNotFoundError:
+            if the copyright notice template file is not found at the given path
+        :raises CopyrightNoticeParsingError:
+            if the copyright notice template file cannot be parsed correctly
+        :raises CopyrightNoticeValidationError:
+            if the staged content of the files cannot be read
+        """
+        self._run = _CheckRun(notice_path, **options)
+        self._run.open()
+        self._jobs = jobs or os.cpu_count() or 1
+        self._executor = None
+        if self._jobs > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self._jobs)
+
+    def iter_results(self, filenames: Iterable[str]) -> Iterator[FileResult]:
+        """
+        Check files, yielding the result of each file as soon as it is available.
+
+        Results are yielded in path order, or in the iterator order if the file
+        paths are given as an iterator (consumed lazily). They are also logged,
+        and written to the reporters of the checker, as by
+        check_files_have_notice. Closing the iterator early (e.g. breaking out
+        of a loop over it) cancels the pending checks.
+
+        :param filenames: List of file paths to check, or iterator over them
+        :return: Iterator over the results of the selected files
+        :raises SourceCodeFileNotFoundError:
+            if one of the files to validate is not found at the given path
+        :raises CopyrightNoticeValidationError:
+            if an error occurs while validating a file
+        """
+        run = self._run
+        results = ordered_map(
+            run.check, run.select(filenames), self._jobs, self._executor
+        )
+        try:
+            for result in results:
+                run.record(result)
+                yield result
+        finally:
+            results.close()
+            run.finish()
+
+    def check_files(self, filenames: Iterable[str]) -> bool:
+        """
+        Check if a set of files contains the required copyright notice.
+
+        :param filenames: List of file paths to check, or iterator over them
+        :return: Bool indicating if all the files contains a copyright notice or not
+        :raises: see iter_results
+        """
+        has_notice = True
+        with phase(self._run.stats, "check"):
+            for result in self.iter_results(filenames):
+                if result.verdict not in PASSING_VERDICTS:
+                    has_notice = False
+        return has_notice
+
+    def close(self) -> None:
+        """Stop the worker threads and release the resources of the checker"""
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._run.close()
+
+    def __enter__(self) -> "CopyrightNoticeChecker":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    @staticmethod
+    def check_content(
+        filepath: str,
+        content: Buffer,
+        notice_pattern: NoticePattern,
+        *,
+        max_header_bytes: Optional[int] = None,
+        max_header_lines: Optional[int] = None,
+        stats: Optional[CheckStats] = None,
+        truncated: bool = False,
+    ) -> FileResult:
+        """
+        Look for the required copyright notice in the content of a file.
+
+        Empty, binary and Git LFS pointer contents are skipped.
+        The encoding of the content is sniffed from its first bytes (BOM),
+        and the notice is searched in that encoding (see
+        NoticeMatcher.search_encoded), without decoding the content.
+
+        :param filepath: Path to the file the content belongs to
+        :param content: Content of the file
+        :param notice_pattern: Bytes representation of the copyright notice,
+            or matcher of the accepted notices
+        :param max_header_bytes: If set, search only the first bytes of the content
+        :param max_header_lines: If set, search only the first lines of the content
+        :param stats: If set, statistics to record the search time into
+        :param truncated: If True, the content is only the beginning of the file
+            (e.g. its header), so a missing notice may be further in the file
+        :return: Result of the check
+        """
+        reason = content_skip_reason(content)
+        if reason is not None:
+            logging.debug("File: %s  Skipped: %s", filepath, reason)
+            return FileResult(filepath, Verdict.SKIPPED, reason=reason)
+        if isinstance(notice_pattern, bytes):
+            notice_pattern = NoticeMatcher([notice_pattern])
+        with phase(stats, "search"):
+            end = len(content)
+            if max_header_bytes is not None or max_header_lines is not None:
+                end = header_end(content, max_header_bytes, max_header_lines)
+            not_found = Verdict.MISSING
+            # The notice can only be out of the header if it is not the whole file
+            if end < len(content) or truncated:
+                not_found = Verdict.NOT_IN_HEADER
+            encoding, _ = sniff_encoding(content)
+            match = notice_pattern.search_encoded(content, encoding, 0, end)
+        if stats is not None:
+            stats.count("bytes_scanned", end)
+        if match is None:
+            logging.debug("File: %s  NoticePos: -1", filepath)
+            return FileResult(filepath, not_found)
+        logging.debug(
+            "File: %s  NoticePos: %d  Notice: %s", filepath, match.start, match.template
+        )
+        return FileResult(
+            filepath, Verdict.FOUND, match.start, match.template, match.year
+        )
 
     @staticmethod
-    def file_contains_valid_notice(filepath: str, notice_pattern: bytes) -> bool:
+    def check_stream(
+        filepath: str,
+        stream: BinaryIO,
+        notice_pattern: NoticePattern,
+        *,
+        max_header_bytes: Optional[int] = None,
+        max_header_lines: Optional[int] = None,
+        stats: Optional[CheckStats] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> FileResult:
+        """
+        Look for the required copyright notice in a stream, e.g. a pipe.
+
+        The stream is read by chunks into a single reused buffer, where the end
+        of each chunk is kept before the next one, so that notices spanning
+        two chunks are still found, and the memory used is bounded. The kept
+        overlap is the length of the longest notice (minus one byte), or a whole
+        chunk for tolerant and templated notices, whose length is not bounded.
+
+        :param filepath: Path to the file the stream reads
+        :param stream: Binary stream of the content of the file
+        :param notice_pattern: Bytes representation of the copyright notice,
+            or matcher of the accepted notices
+        :param max_header_bytes: If set, search only the first bytes of the stream
+        :param max_header_lines: If set, search only the first lines of the stream
+        :param stats: If set, statistics to record the time of each phase into
+        :param chunk_size: Size of each read (at least SNIFF_SIZE)
+        :return: Result of the check
+        """
+        options: Dict[str, Any] = {
+            "max_header_bytes": max_header_bytes,
+            "max_header_lines": max_header_lines,
+            "stats": stats,
+        }
+        if max_header_bytes is not None or max_header_lines is not None:
+            with phase(stats, "read"):
+                header = read_stream_header(stream, max_header_bytes, max_header_lines)
+            # The stream may go on after a full header window
+            truncated = (
+                max_header_bytes is not None and len(header) >= max_header_bytes
+            ) or (
+                max_header_lines is not None and header.count(b"\n") >= max_header_lines
+            )
+            return CopyrightNoticeChecker.check_content(
+                filepath, header, notice_pattern, truncated=truncated, **options
+            )
+        if isinstance(notice_pattern, bytes):
+            notice_pattern = NoticeMatcher([notice_pattern])
+        # Skipped contents are classified on whole first chunks, and chunks
+        # are aligned on the code units of wide encodings
+        chunk_size = max(chunk_size, SNIFF_SIZE) // 4 * 4
+        buffer = bytearray(2 * chunk_size)
+        view = memoryview(buffer)
+        with phase(stats, "read"):
+            size = readinto_full(stream, view[:chunk_size])
+        if size < chunk_size:
+            return CopyrightNoticeChecker.check_content(
+                filepath, bytes(view[:size]), notice_pattern, **options
+            )
+        reason = content_skip_reason(buffer)
+        if reason is not None:
+            logging.debug("File: %s  Skipped: %s", filepath, reason)
+            return FileResult(filepath, Verdict.SKIPPED, reason=reason)
+        encoding, _ = sniff_encoding(buffer)
+        max_length = notice_pattern.max_match_length(encoding)
+        overlap = chunk_size if max_length is None else min(max_length - 1, chunk_size)
+        if encoding in WIDE_ENCODINGS:
+            overlap = min(-(-overlap // 4) * 4, chunk_size)
+        # Offset in the stream of the beginning of the buffer
+        base = 0
+        end_of_stream = False
+        while True:
+            with phase(stats, "search"):
+                match = notice_pattern.search_encoded(buffer, encoding, 0, size)
+            if match is not None or end_of_stream:
+                break
+            view[:overlap] = view[size - overlap : size]
+            base += size - overlap
+            with phase(stats, "read"):
+                count = readinto_full(stream, view[overlap : overlap + chunk_size])
+            size = overlap + count
+            end_of_stream = count < chunk_size
+            if count == 0:
+                # The overlap was already searched
+                break
+        if stats is not None:
+            stats.count("bytes_scanned", base + size)
+        if match is None:
+            logging.debug("File: %s  NoticePos: -1", filepath)
+            return FileResult(filepath, Verdict.MISSING)
+        logging.debug(
+            "File: %s  NoticePos: %d  Notice: %s",
+            filepath,
+            base + match.start,
+            match.template,
+        )
+        return FileResult(
+            filepath, Verdict.FOUND, base + match.start, match.template, match.year
+        )
+
+    @staticmethod
+    def check_file(
+        filepath: str,
+        notice_pattern: NoticePattern,
+        *,
+        max_header_bytes: Optional[int] = None,
+        max_header_lines: Optional[int] = None,
+        fix_notice: Optional[bytes] = None,
+        max_file_size: Optional[int] = None,
+        stats: Optional[CheckStats] = None,
+    ) -> FileResult:
+        """
+        Look for the required copyright notice in a file.
+
+        If a header window is given, only the beginning of the file is read,
+        and a missing notice is reported as not found in the header, unless
+        the window covers the whole file.
+        Empty and oversized files are skipped based on their size,
+        without reading them.
+
+        :param filepath: Path to the file to check
+        :param notice_pattern: Bytes representation of the copyright notice,
+            or matcher of the accepted notices
+        :param max_header_bytes: If set, search only the first bytes of the file
+        :param max_header_lines: If set, search only the first lines of the file
+        :param fix_notice: If set, notice to insert in the file if missing
+        :param max_file_size: If set, skip the files larger than this many bytes
+        :param stats: If set, statistics to record the time of each phase into
+        :return: Result of the check
+        """
+        try:
+            with phase(stats, "stat"):
+                st = os.stat(filepath)
+        except FileNotFoundError as exc:
+            raise SourceCodeFileNotFoundError(filepath) from exc
+        options: Dict[str, Any] = {
+            "max_header_bytes": max_header_bytes,
+            "max_header_lines": max_header_lines,
+            "stats": stats,
+        }
+        if not stat.S_ISREG(st.st_mode):
+            # Named pipes, character devices... have no size, and cannot be mapped
+            with open(filepath, "rb") as f_src:
+                return CopyrightNoticeChecker.check_stream(
+                    filepath, f_src, notice_pattern, **options
+                )
+        reason = size_skip_reason(st.st_size, max_file_size)
+        if reason is not None:
+            logging.debug("File: %s  Skipped: %s", filepath, reason)
+            return FileResult(filepath, Verdict.SKIPPED, reason=reason)
+        fixed_path = None
+        if max_header_bytes is None and max_header_lines is None:
+            start = time.perf_counter()
+            with open(filepath, "rb", 0) as f_src, ExitStack() as stack:
+                try:
+                    src_bytes = stack.enter_context(
+                        mmap.mmap(f_src.fileno(), 0, access=mmap.ACCESS_READ)
+                    )
+                except (OSError, ValueError):
+                    # e.g. filesystems not supporting mmap, or files truncated since
+                    logging.debug("File: %s  Streamed: cannot be mapped", filepath)
+                    result = CopyrightNoticeChecker.check_stream(
+                        filepath, f_src, notice_pattern, **options
+                    )
+                    if fix_notice is not None and result.verdict in FIXABLE_VERDICTS:
+                        with phase(stats, "fix"):
+                            head = read_file_header(filepath, HEADER_CHUNK_SIZE)
+                            fixed_path = write_with_notice(filepath, head, fix_notice)
+                else:
+                    if stats is not None:
+                        stats.add_time("read", time.perf_counter() - start)
+                    result = CopyrightNoticeChecker.check_content(
+                        filepath, src_bytes, notice_pattern, **options
+                    )
+                    if fix_notice is not None and result.verdict in FIXABLE_VERDICTS:
+                        with phase(stats, "fix"):
+                            fixed_path = write_with_notice(
+                                filepath, src_bytes, fix_notice
+                            )
+        else:
+            with phase(stats, "read"):
+                header = read_file_header(filepath, max_header_bytes, max_header_lines)
+            result = CopyrightNoticeChecker.check_content(
+                filepath,
+                header,
+                notice_pattern,
+                truncated=len(header) < st.st_size,
+                **options,
+            )
+            if fix_notice is not None and result.verdict in FIXABLE_VERDICTS:
+                with phase(stats, "fix"):
+                    fixed_path = write_with_notice(filepath, header, fix_notice)
+        if fixed_path is not None:
+            # Replace the file only once it is unmapped (required on Windows)
+            with phase(stats, "fix"):
+                os.replace(fixed_path, filepath)
+            result = result._replace(verdict=Verdict.FIXED)
+        return result
+
+    @staticmethod
+    def file_contains_valid_notice(
+        filepath: str,
+        notice_pattern: NoticePattern,
+        *,
+        max_header_bytes: Optional[int] = None,
+        max_header_lines: Optional[int] = None,
+    ) -> bool:
         """
         Check if a file contains the required copyright notice.
 
         :param filepath: Path to the file to check
-        :param notice_pattern: Bytes representation of the copyright notice
+        :param notice_pattern: Bytes representation of the copyright notice,
+            or matcher of the accepted notices
+        :param max_header_bytes: If set, search only the first bytes of the file
+        :param max_header_lines: If set, search only the first lines of the file
         :return: Bool indicating if the file contains a valid copyright notice or not
         """
-        if not os.path.exists(filepath):
-            raise SourceCodeFileNotFoundError(filepath)
-        ret = False
-        with open(filepath, "rb", 0) as f_src, mmap.mmap(
-            f_src.fileno(), 0, access=mmap.ACCESS_READ
-        ) as src_bytes:
-            found_pos = src_bytes.find(notice_pattern)
-            if found_pos != -1:
-                ret = True
-        logging.debug("File: %s  NoticePos: %d", filepath, found_pos)
-        return ret
+        result = CopyrightNoticeChecker.check_file(
+            filepath,
+            notice_pattern,
+            max_header_bytes=max_header_bytes,
+            max_header_lines=max_header_lines,
+        )
+        return result.verdict is Verdict.FOUND
+
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def compile_notices(
+        templates: Tuple[bytes, ...],
+        names: Tuple[str, ...],
+        *,
+        tolerant_whitespace: bool = False,
+        placeholders: bool = False,
+    ) -> NoticeMatcher:
+        """
+        Compile notice templates into a matcher, reusing previous compilations.
+
+        :param templates: Bytes representation of the accepted notices
+        :param names: Names of the templates, reported on match
+        :param tolerant_whitespace: If True, accept changes of line endings,
+            indentation and whitespace runs with respect to the templates
+        :param placeholders: If True, the templates may contain placeholders
+        :return: Matcher of the notices
+        """
+        return NoticeMatcher(
+            templates,
+            names,
+            tolerant_whitespace=tolerant_whitespace,
+            placeholders=placeholders,
+        )
+
+    @staticmethod
+    def load_notices(
+        notice_path: NoticePaths,
+        *,
+        tolerant_whitespace: bool = False,
+        placeholders: bool = False,
+        loaded: Optional[Dict[str, bytes]] = None,
+    ) -> NoticeMatcher:
+        """
+        Load the copyright notice templates and compile them into a matcher.
+
+        :param notice_path: Path to one or more copyright notice templates
+        :param tolerant_whitespace: If True, accept changes of line endings,
+            indentation and whitespace runs with respect to the templates
+        :param placeholders: If True, the templates may contain placeholders
+            ({year}, {year_range}, {holder})
+        :param loaded: If set, templates already loaded, by path, which are
+            not read again. The newly loaded templates are added to it.
+        :return: Matcher of the notices, reporting the template paths on match
+        :raises CopyrightNoticeTemplateFileNotFoundError:
+            if a copyright notice template file is not found at the given path
+        :raises CopyrightNoticeParsingError:
+            if a copyright notice template file cannot be parsed correctly
+        """
+        if isinstance(notice_path, (str, os.PathLike)):
+            notice_paths = [notice_path]
+        else:
+            notice_paths = list(notice_path)
+        if loaded is None:
+            loaded = {}
+        templates: List[bytes] = []
+        for path in notice_paths:
+            if str(path) in loaded:
+                templates.append(loaded[str(path)])
+                continue
+            try:
+                loaded[str(path)] = parse_file_as_bytes(path)
+                templates.append(loaded[str(path)])
+            except FileNotFoundError as exc:
+                raise CopyrightNoticeTemplateFileNotFoundError(str(path)) from exc
+            except Exception as exc:
+                raise CopyrightNoticeParsingError(str(path), str(exc)) from exc
+        try:
+            return CopyrightNoticeChecker.compile_notices(
+                tuple(templates),
+                tuple(str(path) for path in notice_paths),
+                tolerant_whitespace=tolerant_whitespace,
+                placeholders=placeholders,
+            )
+        except Exception as exc:
+            raise CopyrightNoticeParsingError(
+                ", ".join(str(path) for path in notice_paths), str(exc)
+            ) from exc
 
     @staticmethod
     def check_files_have_notice(
-        filenames: Sequence[str], notice_path: str, *, enforce_all: bool = False
+        filenames: Iterable[str],
+        notice_path: NoticePaths,
+        *,
+        enforce_all: bool = False,
+        include: Sequence[str] = (),
+        exclude: Sequence[str] = (),
+        max_header_bytes: Optional[int] = None,
+        max_header_lines: Optional[int] = None,
+        jobs: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        cache_max_entries: int = DEFAULT_MAX_ENTRIES,
+        staged: bool = False,
+        tolerant_whitespace: bool = False,
+        placeholders: bool = False,
+        year_policy: str = "any",
+        fix: bool = False,
+        max_file_size: Optional[int] = None,
+        stats: Optional[CheckStats] = None,
+        reporters: Sequence[Reporter] = (),
+        notice_config: Optional[str] = None,
+        blobs: Optional[Mapping[str, str]] = None,
+        shard: Optional[Tuple[int, int]] = None,
+        comment_styles: Optional[Mapping[str, str]] = None,
+        recurse_submodules: bool = False,
+        near_miss: Optional[float] = None,
     ) -> bool:
         """
         Check if a set of files contains the required copyright notice.
 
         Returns a bool.
+        Files are checked concurrently, but results are reported in path order.
+        If the file paths are given as an iterator (e.g. a generator), they are
+        consumed lazily and reported in the iterator order instead.
 
-        :param filenames: List of file paths to check
-        :param notice_path: Path to the copyright notice template
+        :param filenames: List of file paths to check, or iterator over them
+        :param notice_path: Path to the copyright notice template, or list of
+            paths to alternative templates (any of them is accepted)
         :param enforce_all: If False, checks only added staged files
+        :param include: If not empty, check only the files matching these globs
+        :param exclude: Do not check the files matching these globs
+        :param max_header_bytes: If set, search only the first bytes of each file
+        :param max_header_lines: If set, search only the first lines of each file
+        :param jobs: Number of files checked in parallel (default: CPU count)
+        :param cache_dir: If set, reuse the results of unchanged files, and the set
+            of added staged files if the index did not change, from the cache
+            in this directory
+        :param cache_max_entries: Maximum number of files kept in the cache
+        :param staged: If True, check the staged content of the files instead of
+            the working tree (the results cache is not used)
+        :param tolerant_whitespace: If True, accept changes of line endings,
+            indentation and whitespace runs with respect to the notice
+        :param placeholders: If True, the notice may contain placeholders
+            ({year}, {year_range}, {holder}) matching any value
+        :param year_policy: Policy on the year of templated notices
+            (one of YEAR_POLICIES)
+        :param fix: If True, insert the notice (the first one, if several) in the
+            files missing it. Fixed files are still reported as failing the check.
+            Not available when checking the staged content.
+        :param max_file_size: If set, skip the files larger than this many bytes.
+            Empty, binary and Git LFS pointer files are always skipped.
+        :param stats: If set, statistics to record the timings of the phases,
+            the file counters and the slowest files into (e.g. to forward them
+            to a telemetry system)
+        :param reporters: Reporters to write the result of each file to,
+            as soon as it is available
+        :param notice_config: If set, configuration file mapping path patterns
+            to the notices of the matching files (see read_notice_config).
+            The files matching no pattern are checked against notice_path.
+        :param blobs: If set, check the content of these Git blobs, by file path
+            (see util.changed_files), instead of the working tree, e.g. to check
+            the files changed by a range of commits in a bare repository.
+            Only the files in it are checked, even if enforce_all is False
+            (the results cache is not used, and the files cannot be fixed).
+        :param shard: If set, (index, count) of the shard of the files to check,
+            from 1 to count: the files are partitioned into count disjoint
+            shards by a stable hash of their path (see util.shard_of)
+        :param comment_styles: If set, the notices are plain text, and each file
+            is checked against their rendering in the comment style of its
+            language (see comments.EXTENSION_STYLES), overridden by this mapping
+            from file extensions (or names) to style names. The files of unknown
+            style are checked against the notices as is.
+        :param recurse_submodules: If True, check the files of the (nested)
+            submodules as well: unless enforce_all is True, the files added
+            to the staging area of each submodule are accepted in addition to
+            those of the repository, and checked with them if no file is given
+            (an empty list). The submodules are inspected concurrently.
+            Not available when checking Git objects (staged or blobs).
+        :param near_miss: If set, look for the closest approximate notice in
+            the header of the files failing the check (e.g. with a typo or a
+            stale year), with an edit distance up to this ratio of the notice
+            length (e.g. DEFAULT_NEAR_MISS_RATIO), and report it with its diff.
+            The files passing the check are not affected.
         :return: Bool indicating if all the files contains a copyright notice or not
         :raises SourceCodeFileNotFoundError:
             if one of the files to validate is not found at the given path
@@ -66,59 +711,578 @@ class CopyrightNoticeChecker:
         :raises CopyrightNoticeValidationError:
             if an error occurs while validating a file
         """
-        # Load notice
-        try:
-            notice_pattern = parse_file_as_bytes(notice_path)
-        except FileNotFoundError as exc:
-            raise CopyrightNoticeTemplateFileNotFoundError(notice_path) from exc
-        except Exception as exc:
-            raise CopyrightNoticeParsingError(notice_path, str(exc)) from exc
+        with CopyrightNoticeChecker(
+            notice_path,
+            enforce_all=enforce_all,
+            include=include,
+            exclude=exclude,
+            max_header_bytes=max_header_bytes,
+            max_header_lines=max_header_lines,
+            jobs=jobs,
+            cache_dir=cache_dir,
+            cache_max_entries=cache_max_entries,
+            staged=staged,
+            tolerant_whitespace=tolerant_whitespace,
+            placeholders=placeholders,
+            year_policy=year_policy,
+            fix=fix,
+            max_file_size=max_file_size,
+            stats=stats,
+            reporters=reporters,
+            notice_config=notice_config,
+            blobs=blobs,
+            shard=shard,
+            comment_styles=comment_styles,
+            recurse_submodules=recurse_submodules,
+            near_miss=near_miss,
+        ) as checker:
+            return checker.check_files(filenames)
 
-        # Define the set of files to check
-        filepaths_filtered = set(filenames)
-        if not enforce_all:
-            filepaths_filtered &= added_files()
+    @staticmethod
+    async def check_files_have_notice_async(
+        filenames: Iterable[str],
+        notice_path: NoticePaths,
+        *,
+        concurrency: int = DEFAULT_IO_CONCURRENCY,
+        **options: Any,
+    ) -> bool:
+        """
+        Check if a set of files contains the required copyright notice, as a coroutine.
 
-        # Iterate over the files to check
-        ret = True
-        for filepath in filepaths_filtered:
-            try:
-                if not CopyrightNoticeChecker.file_contains_valid_notice(
-                    filepath, notice_pattern
-                ):
-                    logging.warning(
-                        "File %s does not contain a valid copyright notice.", filepath
-                    )
-                    ret = False
-            except SourceCodeFileNotFoundError:
-                raise
-            except Exception as exc:
-                raise CopyrightNoticeValidationError(notice_path, str(exc)) from exc
-        return ret
+        Up to `concurrency` files are read at once, which hides the latency of
+        the reads on high-latency filesystems (e.g. network storage) without
+        using more CPU cores. The files are read in worker threads, so the event
+        loop is not blocked, except while the notices are loaded and the files
+        to check are selected. Results are reported, and exceptions raised,
+        as by check_files_have_notice.
+
+        :param filenames: List of file paths to check, or iterator over them
+        :param notice_path: Path to the copyright notice template, or list of
+            paths to alternative templates (any of them is accepted)
+        :param concurrency: Maximum number of files checked at once
+        :param options: Further options of check_files_have_notice, except jobs
+        :return: Bool indicating if all the files contains a copyright notice or not
+        """
+        run = _CheckRun(notice_path, **options)
+        with run, phase(run.stats, "check"):
+            results = async_ordered_map(run.check, run.select(filenames), concurrency)
+            async for result in results:
+                run.record(result)
+        return run.finish()
 
     @staticmethod
     def check_files_have_notice_with_retcode(
-        filenames: Sequence[str], notice_path: str, *, enforce_all: bool = False
+        filenames: Iterable[str],
+        notice_path: NoticePaths,
+        *,
+        enforce_all: bool = False,
+        io_concurrency: Optional[int] = None,
+        **options: Any,
     ) -> int:
         """
         Check if a set of files contains the required copyright notice.
 
         Returns an appropriate exit code.
 
-        :param filenames: List of file paths to check
-        :param notice_path: Path to the copyright notice template
+        :param filenames: List of file paths to check, or iterator over them
+        :param notice_path: Path to the copyright notice template, or list of
+            paths to alternative templates (any of them is accepted)
         :param enforce_all: If False, checks only added staged files
+        :param io_concurrency: If set, check the files with
+            check_files_have_notice_async, with this concurrency
+        :param options: Further options forwarded to check_files_have_notice
         :return: unsigned exit code (0 for success)
         """
         try:
-            has_notice = CopyrightNoticeChecker.check_files_have_notice(
-                filenames=filenames, notice_path=notice_path, enforce_all=enforce_all
-            )
+            if io_concurrency is not None:
+                if options.pop("jobs", None) is not None:
+                    raise ValueError("jobs and io_concurrency are mutually exclusive")
+                has_notice = run_coroutine(
+                    CopyrightNoticeChecker.check_files_have_notice_async(
+                        filenames,
+                        notice_path,
+                        concurrency=io_concurrency,
+                        enforce_all=enforce_all,
+                        **options,
+                    )
+                )
+            else:
+                has_notice = CopyrightNoticeChecker.check_files_have_notice(
+                    filenames=filenames,
+                    notice_path=notice_path,
+                    enforce_all=enforce_all,
+                    **options,
+                )
             return 0 if has_notice else 1
         except Exception as exc:  # pylint: disable=broad-except
             return exception_to_retcode_mapping.get(exc.__class__, 255)
 
 
+class _CheckRun:
+    """
+    State of the runs of the checks with the same options.
+
+    The run is shared by the synchronous and asynchronous drivers, which call
+    check() on each file selected by select(), possibly from several threads,
+    record() on each result, in order, and finish() at the end of each batch
+    of files. Once opened (e.g. used as a context manager), it holds the
+    resources of the run (e.g. the cat-file process to read the staged content).
+    """
+
+    def __init__(
+        self,
+        notice_path: NoticePaths,
+        *,
+        enforce_all: bool = False,
+        include: Sequence[str] = (),
+        exclude: Sequence[str] = (),
+        max_header_bytes: Optional[int] = None,
+        max_header_lines: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        cache_max_entries: int = DEFAULT_MAX_ENTRIES,
+        staged: bool = False,
+        tolerant_whitespace: bool = False,
+        placeholders: bool = False,
+        year_policy: str = "any",
+        fix: bool = False,
+        max_file_size: Optional[int] = None,
+        stats: Optional[CheckStats] = None,
+        reporters: Sequence[Reporter] = (),
+        notice_config: Optional[str] = None,
+        blobs: Optional[Mapping[str, str]] = None,
+        shard: Optional[Tuple[int, int]] = None,
+        comment_styles: Optional[Mapping[str, str]] = None,
+        recurse_submodules: bool = False,
+        near_miss: Optional[float] = None,
+    ):
+        """See check_files_have_notice for the parameters and raised exceptions"""
+        # Load notices, reading each template once
+        loaded: Dict[str, bytes] = {}
+
+        def load(paths: NoticePaths) -> NoticeMatcher:
+            return CopyrightNoticeChecker.load_notices(
+                paths,
+                tolerant_whitespace=tolerant_whitespace,
+                placeholders=placeholders,
+                loaded=loaded,
+            )
+
+        self.notice_index: Optional[PathTrie[NoticeMatcher]] = None
+        self.notice_root = ""
+        with phase(stats, "load_notices"):
+            if notice_config is None:
+                self.notice_pattern = load(notice_path)
+                matchers = [self.notice_pattern]
+                notices: Any = self.notice_pattern.names
+            else:
+                try:
+                    mapping = read_notice_config(notice_config)
+                except (OSError, ValueError) as exc:
+                    raise CopyrightNoticeParsingError(notice_config, str(exc)) from exc
+                self.notice_index = PathTrie()
+                self.notice_root = os.path.dirname(os.path.abspath(notice_config))
+                for pattern, paths in mapping:
+                    self.notice_index.insert(pattern, load(paths))
+                if not self.notice_index.covers_all():
+                    fallback = load(notice_path)
+                    self.notice_index.insert("", fallback)
+                    mapping.append(("", list(fallback.names)))
+                matchers = list(dict.fromkeys(self.notice_index.values()))
+                notices = mapping
+        self.notice_names = ", ".join(
+            dict.fromkeys(name for matcher in matchers for name in matcher.names)
+        )
+        self.comments: Optional[CommentRegistry] = None
+        if comment_styles is not None:
+            self.comments = CommentRegistry(comment_styles)
+        self.current_year = datetime.date.today().year
+        self.fix_notices: Dict[NoticeMatcher, bytes] = {}
+        year = str(self.current_year)
+        self._year_values = {"year": year, "year_range": year}
+        if fix:
+            if staged or blobs is not None:
+                raise ValueError("Cannot fix the content of Git objects")
+            for matcher in matchers:
+                try:
+                    self.fix_notices[matcher] = matcher.render(self._year_values)
+                except ValueError as exc:
+                    raise CopyrightNoticeParsingError(
+                        matcher.names[0], str(exc)
+                    ) from exc
+
+        # Define the set of files to check
+        is_selected = path_filter(include, exclude)
+        staged_added: Optional[Container[str]] = blobs
+        submodule_added: Set[str] = set()
+        submodule_paths: Container[str] = ()
+        if recurse_submodules:
+            if staged or blobs is not None:
+                raise ValueError("Cannot check the submodules of Git objects")
+            if not enforce_all:
+                with phase(stats, "submodules"):
+                    submodule_paths, submodule_added = submodules_added_files(cache_dir)
+        # Files checked when none is given
+        self.default_files: Set[str] = set()
+        if blobs is None and not enforce_all:
+            with phase(stats, "added_files"):
+                staged_added = added_files(cache_dir) | submodule_added
+            if recurse_submodules:
+                self.default_files = staged_added
+
+        def selected(filepath: str) -> bool:
+            if filepath == STDIN_PATH:
+                # The content piped to the check is always checked
+                return True
+            if filepath in submodule_paths:
+                # Added submodules are checked through their files
+                return False
+            if staged_added is not None and filepath not in staged_added:
+                return False
+            if shard is not None and shard_of(filepath, shard[1]) != shard[0]:
+                return False
+            return is_selected(filepath)
+
+        self._selected = selected
+
+        self.cache = None
+        if cache_dir is not None and not staged and blobs is None:
+            options = repr(
+                (
+                    notices,
+                    tolerant_whitespace,
+                    placeholders,
+                    year_policy,
+                    self.current_year,
+                    max_header_bytes,
+                    max_header_lines,
+                    max_file_size,
+                    None if self.comments is None else self.comments.styles,
+                    near_miss,
+                )
+            ).encode()
+            with phase(stats, "cache_load"):
+                self.cache = ResultCache(
+                    cache_dir,
+                    config_digest(options, *loaded.values()),
+                    cache_max_entries,
+                )
+
+        self.max_header_bytes = max_header_bytes
+        self.max_header_lines = max_header_lines
+        self.staged = staged
+        self.blobs = blobs
+        self.year_policy = year_policy
+        self.creation_years = CreationYears()
+        self.near_miss = near_miss
+        self.max_file_size = max_file_size
+        self.stats = stats
+        self.reporters = reporters
+        self.cat_file: Optional[GitCatFile] = None
+        self.ret = True
+        self.skipped: Counter[str] = Counter()
+        self._stack = ExitStack()
+
+    def select(self, filenames: Iterable[str]) -> Iterable[str]:
+        """
+        Select the files to check.
+
+        :param filenames: List of file paths, or iterator over them. If the list
+            is empty, the files added to the staging areas of the repository
+            and of its submodules are checked when recursing into submodules.
+        :return: Selected paths, in path order, or in the iterator order
+            (consumed lazily) if the paths are given as an iterator
+        """
+        if isinstance(filenames, Iterator):
+            return filter(self._selected, filenames)
+        with phase(self.stats, "select"):
+            return sorted(
+                filter(self._selected, set(filenames) or self.default_files), key=str
+            )
+
+    def open(self) -> None:
+        """Acquire the resources of the run"""
+        with ExitStack() as stack:
+            if self.staged or self.blobs is not None:
+                try:
+                    self.cat_file = stack.enter_context(GitCatFile())
+                except OSError as exc:
+                    raise CopyrightNoticeValidationError(
+                        self.notice_names, str(exc)
+                    ) from exc
+            if self.cache is not None:
+                stack.callback(self._save_cache)
+            self._stack = stack.pop_all()
+
+    def close(self) -> None:
+        """Release the resources of the run, saving the results cache"""
+        self._stack.close()
+
+    def __enter__(self) -> "_CheckRun":
+        self.open()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def _save_cache(self) -> None:
+        with phase(self.stats, "cache_save"):
+            cast(ResultCache, self.cache).save()
+
+    def notice_for(self, filepath: str) -> NoticeMatcher:
+        """
+        Get the notices to check a file against.
+
+        :param filepath: Path to the file
+        :return: Matcher of the notices of the most specific pattern of the
+            notice configuration matching the file, if any, otherwise of the
+            notice templates of the run, rendered in the comment style of the
+            file if comment styles are enabled
+        """
+        if self.notice_index is None:
+            matcher = self.notice_pattern
+        else:
+            relpath = os.path.relpath(os.path.abspath(filepath), self.notice_root)
+            matcher = cast(NoticeMatcher, self.notice_index.lookup(relpath))
+        if self.comments is not None:
+            style = self.comments.style_for(filepath)
+            if style is not None:
+                matcher = matcher.commented(style)
+        return matcher
+
+    def fix_notice_for(self, matcher: NoticeMatcher) -> Optional[bytes]:
+        """
+        Get the notice to insert in the files missing the notices of a matcher.
+
+        :param matcher: Matcher of the notices of the file (see notice_for)
+        :return: Rendered notice, or None if the files are not fixed
+        """
+        if not self.fix_notices:
+            return None
+        try:
+            return self.fix_notices[matcher]
+        except KeyError:
+            # Notices rendered as comments, whose placeholders were validated
+            notice = self.fix_notices[matcher] = matcher.render(self._year_values)
+            return notice
+
+    def check(self, filepath: str) -> FileResult:
+        """
+        Check a file, possibly from a worker thread.
+
+        :param filepath: Path to the file to check
+        :return: Result of the check
+        """
+        if self.stats is None:
+            return self._check(filepath)
+        start = time.perf_counter()
+        result = self._check(filepath)
+        self.stats.record_file(filepath, time.perf_counter() - start)
+        return result
+
+    def _check(self, filepath: str) -> FileResult:
+        cache, stats = self.cache, self.stats
+        key = None
+        if cache is not None and filepath != STDIN_PATH:
+            key = file_key(str(filepath))
+        if cache is not None and key is not None:
+            cached = cache.get(str(filepath), key)
+            if cached is not None and (self.near_miss is not None or self.fix_notices):
+                # Near misses are not cached, and fixes are not applied to
+                # cached results: failing files are checked again
+                if Verdict(cached[0]) in FIXABLE_VERDICTS:
+                    cached = None
+            if cached is not None:
+                if stats is not None:
+                    stats.count("cached")
+                verdict, offset, template, reason = cached
+                return FileResult(
+                    filepath, Verdict(verdict), offset, template, reason=reason
+                )
+        notice_pattern = self.notice_for(filepath)
+        content: Optional[bytes] = None
+        try:
+            if filepath == STDIN_PATH:
+                result = CopyrightNoticeChecker.check_stream(
+                    filepath,
+                    sys.stdin.buffer,
+                    notice_pattern,
+                    max_header_bytes=self.max_header_bytes,
+                    max_header_lines=self.max_header_lines,
+                    stats=stats,
+                )
+            elif self.cat_file is not None:
+                if self.blobs is None:
+                    obj = staged_object(filepath)
+                else:
+                    obj = self.blobs[filepath]
+                with phase(stats, "read"):
+                    content = self.cat_file.read_blob(obj)
+                if content is None:
+                    raise SourceCodeFileNotFoundError(filepath)
+                reason = size_skip_reason(len(content), self.max_file_size)
+                if reason is not None:
+                    return FileResult(filepath, Verdict.SKIPPED, reason=reason)
+                result = CopyrightNoticeChecker.check_content(
+                    filepath,
+                    content,
+                    notice_pattern,
+                    max_header_bytes=self.max_header_bytes,
+                    max_header_lines=self.max_header_lines,
+                    stats=stats,
+                )
+            else:
+                result = CopyrightNoticeChecker.check_file(
+                    filepath,
+                    notice_pattern,
+                    max_header_bytes=self.max_header_bytes,
+                    max_header_lines=self.max_header_lines,
+                    fix_notice=self.fix_notice_for(notice_pattern),
+                    max_file_size=self.max_file_size,
+                    stats=stats,
+                )
+            if result.year is not None and self.year_policy != "any":
+                min_year = self.current_year
+                if self.year_policy == "creation":
+                    with phase(stats, "creation_year"):
+                        creation_year = self.creation_years.get(filepath)
+                    min_year = creation_year or self.current_year
+                if result.year < min_year:
+                    result = result._replace(verdict=Verdict.OUTDATED)
+            if (
+                self.near_miss is not None
+                and result.verdict in FIXABLE_VERDICTS
+                and filepath != STDIN_PATH
+            ):
+                with phase(stats, "near_miss"):
+                    near_miss = self._near_miss(filepath, notice_pattern, content)
+                result = result._replace(near_miss=near_miss)
+        except SourceCodeFileNotFoundError:
+            raise
+        except Exception as exc:
+            raise CopyrightNoticeValidationError(
+                ", ".join(notice_pattern.names), str(exc)
+            ) from exc
+        if (
+            cache is not None
+            and key is not None
+            and result.verdict is not Verdict.FIXED
+        ):
+            cache.put(
+                str(filepath),
+                key,
+                result.verdict.value,
+                result.offset,
+                result.template,
+                result.reason,
+            )
+        return result
+
+    def _near_miss(
+        self, filepath: str, matcher: NoticeMatcher, content: Optional[bytes]
+    ) -> Optional[NearMiss]:
+        """
+        Look for an approximate notice in a file failing the check.
+
+        :param filepath: Path to the file
+        :param matcher: Matcher of the notices of the file
+        :param content: Content of the file, if read from Git, otherwise the
+            beginning of the file is read again
+        :return: Closest approximate notice in the header of the file (up to
+            NEAR_MISS_WINDOW bytes), if any
+        """
+        max_bytes = min(self.max_header_bytes or NEAR_MISS_WINDOW, NEAR_MISS_WINDOW)
+        if content is None:
+            head = read_file_header(filepath, max_bytes, self.max_header_lines)
+        else:
+            head = content[: header_end(content, max_bytes, self.max_header_lines)]
+        return matcher.near_miss(
+            head, cast(float, self.near_miss), values=self._year_values
+        )
+
+    def record(self, result: FileResult) -> None:
+        """
+        Account for the result of a file, in the order of the files.
+
+        :param result: Result of the check of the file
+        """
+        if self.stats is not None:
+            self.stats.count("files")
+            self.stats.count(result.verdict.value)
+        for reporter in self.reporters:
+            reporter.report(result)
+        if result.verdict is Verdict.SKIPPED:
+            self.skipped[cast(str, result.reason)] += 1
+        elif result.verdict is not Verdict.FOUND:
+            logging.warning(VERDICT_WARNINGS[result.verdict], result.path)
+            if result.near_miss is not None:
+                near_miss = result.near_miss
+                logging.warning(
+                    "Closest notice (%s) at line %d, %d edit(s) away:\n%s",
+                    near_miss.template,
+                    near_miss.line,
+                    near_miss.distance,
+                    "\n".join(near_miss.diff()),
+                )
+            self.ret = False
+
+    def finish(self) -> bool:
+        """
+        Report the skipped files, and reset the counts for the next files.
+
+        :return: Bool indicating if all the files contains a copyright notice or not
+        """
+        ret, skipped = self.ret, self.skipped
+        self.ret, self.skipped = True, Counter()
+        if self.stats is not None:
+            for reason, count in skipped.items():
+                self.stats.count(f"skipped:{reason}", count)
+        if skipped:
+            logging.warning(
+                "Skipped %d files: %s.",
+                sum(skipped.values()),
+                ", ".join(
+                    f"{skipped[reason]} {reason}"
+                    for reason in SKIP_REASONS
+                    if skipped[reason]
+                ),
+            )
+        return ret
+
+
+def _positive_int(value: str) -> int:
+    """Parse a strictly positive integer command-line argument"""
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value}")
+    return number
+
+
+def _shard(value: str) -> Tuple[int, int]:
+    """Parse a shard command-line argument, as INDEX/COUNT"""
+    try:
+        index, count = map(int, value.split("/"))
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"expected INDEX/COUNT, got {value}") from exc
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"expected 1 <= INDEX <= COUNT, got {value}")
+    return index, count
+
+
+def _comment_style(value: str) -> Tuple[str, str]:
+    """Parse a comment style command-line argument, as EXT=STYLE"""
+    ext, sep, style = value.partition("=")
+    if not sep or not ext:
+        raise argparse.ArgumentTypeError(f"expected EXT=STYLE, got {value}")
+    if style not in COMMENT_STYLES:
+        raise argparse.ArgumentTypeError(f"unknown comment style: {style}")
+    return ext, style
+
+
 def main(argv: Optional[Sequence[str]] = None) -> int:
     """copyright-notice-precommit entry point"""
 
@@ -126,23 +1290,297 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
     parser.add_argument(
         "filenames",
         nargs="*",
-        help="Filenames pre-commit believes are changed.",
+        help="Filenames pre-commit believes are changed "
+        "(- to check the standard input).",
     )
     parser.add_argument(
         "--notice",
-        default="copyright.txt",
-        help="Path to a file containing the copyright notice to match.",
+        action="append",
+        help="Path to a file containing the copyright notice to match "
+        "(default: copyright.txt). Can be repeated to accept any of several notices.",
+    )
+    parser.add_argument(
+        "--notice-config",
+        metavar="FILE",
+        help="Path to a configuration file (e.g. setup.cfg) whose "
+        "[tool:copyright-notice] section maps path patterns (e.g. third_party/, "
+        "projects/*/oss/) to the notices of the matching files. The most specific "
+        "pattern applies; files matching none are checked against --notice.",
     )
     parser.add_argument(
         "--enforce-all",
         action="store_true",
         help="Enforce all files are checked, not just staged files.",
     )
+    parser.add_argument(
+        "--all-tracked",
+        action="store_true",
+        help="Check all the files tracked by Git instead of the given ones "
+        "(implies --enforce-all).",
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="Check only the files matching this glob. Can be repeated.",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="Do not check the files matching this glob. Can be repeated.",
+    )
+    parser.add_argument(
+        "--max-header-bytes",
+        type=_positive_int,
+        help="Search the notice only in the first N bytes of each file.",
+    )
+    parser.add_argument(
+        "--max-header-lines",
+        type=_positive_int,
+        help="Search the notice only in the first N lines of each file.",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=_positive_int,
+        help="Number of files checked in parallel (default: number of CPUs).",
+    )
+    parser.add_argument(
+        "--io-concurrency",
+        type=_positive_int,
+        metavar="N",
+        help="Check the files with the asyncio pipeline, with up to N files read "
+        "at once, to hide the latency of high-latency filesystems "
+        "(e.g. network storage). Not compatible with --jobs.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory of the results cache (default: inside the .git directory).",
+    )
+    parser.add_argument(
+        "--cache-max-entries",
+        type=_positive_int,
+        default=DEFAULT_MAX_ENTRIES,
+        help="Maximum number of files kept in the results cache.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the results cache.",
+    )
+    staged_or_fix = parser.add_mutually_exclusive_group()
+    staged_or_fix.add_argument(
+        "--staged",
+        action="store_true",
+        help="Check the staged content of the files instead of the working tree.",
+    )
+    staged_or_fix.add_argument(
+        "--fix",
+        action="store_true",
+        help="Insert the notice (the first one, if several) in the files missing "
+        "it, after the shebang and encoding lines.",
+    )
+    staged_or_fix.add_argument(
+        "--from-ref",
+        metavar="REF",
+        help="Check the files added between REF and --to-ref instead of the given "
+        "ones (implies --enforce-all), e.g. to check a pull request in CI. "
+        "Their content is read from Git at --to-ref, so no checkout is needed.",
+    )
+    parser.add_argument(
+        "--to-ref",
+        metavar="REF",
+        help="Revision to check with --from-ref (default: HEAD).",
+    )
+    parser.add_argument(
+        "--check-modified",
+        action="store_true",
+        help="With --from-ref, check the modified files as well as the added ones.",
+    )
+    parser.add_argument(
+        "--recurse-submodules",
+        action="store_true",
+        help="Check the files of the submodules too: if no file is given, the "
+        "files added to the staging area of the repository and of each submodule "
+        "(inspected concurrently), e.g. with pass_filenames: false in pre-commit, "
+        "or all their tracked files with --all-tracked.",
+    )
+    parser.add_argument(
+        "--shard",
+        type=_shard,
+        metavar="INDEX/COUNT",
+        help="Check only the INDEX-th of COUNT disjoint shards of the files "
+        "(INDEX from 1 to COUNT), assigned by a stable hash of their path, e.g. "
+        "to split an audit across CI nodes. The exit codes of the shards can be "
+        "combined with copyright-notice-merge.",
+    )
+    parser.add_argument(
+        "--max-file-size",
+        type=_positive_int,
+        help="Skip the files larger than N bytes. Empty, binary and Git LFS "
+        "pointer files are always skipped.",
+    )
+    parser.add_argument(
+        "--tolerant-whitespace",
+        action="store_true",
+        help="Accept notices differing from the template only in line endings "
+        "(LF/CRLF), indentation, trailing whitespace or runs of spaces and tabs.",
+    )
+    parser.add_argument(
+        "--placeholders",
+        action="store_true",
+        help="Allow the {year}, {year_range} and {holder} placeholders in the "
+        "notice template ({{ and }} for literal braces).",
+    )
+    parser.add_argument(
+        "--comment-styles",
+        action="store_true",
+        help="The notices are plain text: check each file against the notices "
+        "rendered in the comment syntax of its language, by file extension.",
+    )
+    parser.add_argument(
+        "--comment-style",
+        action="append",
+        type=_comment_style,
+        default=[],
+        metavar="EXT=STYLE",
+        help="Comment style of the files with extension (or name) EXT, "
+        f"one of {', '.join(COMMENT_STYLES)} (implies --comment-styles). "
+        "Can be repeated.",
+    )
+    parser.add_argument(
+        "--year-policy",
+        choices=YEAR_POLICIES,
+        default="any",
+        help="Policy on the latest year of templated notices: any year, "
+        "the current year, or not before the file creation (default: any).",
+    )
+    parser.add_argument(
+        "--near-miss",
+        action="store_const",
+        const=DEFAULT_NEAR_MISS_RATIO,
+        help="For the files failing the check, report the closest approximate "
+        "notice in their header (e.g. with a typo or a stale year) and its diff, "
+        f"if within {DEFAULT_NEAR_MISS_RATIO:.0%} of edits.",
+    )
+    parser.add_argument(
+        "--jsonl",
+        metavar="FILE",
+        help="Write the result of each file as a line of JSON to FILE "
+        "(- for the standard output), while the check runs.",
+    )
+    parser.add_argument(
+        "--sarif",
+        metavar="FILE",
+        help="Write a SARIF report of the files failing the check to FILE "
+        "(- for the standard output).",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print the time spent in each phase, the file counters and the "
+        "slowest files (to the standard error if a report is written to the "
+        "standard output).",
+    )
+    parser.add_argument(
+        "--stats-format",
+        choices=("text", "json"),
+        default="text",
+        help="Format of the statistics printed with --stats (default: text).",
+    )
     args = parser.parse_args(argv)
+    if args.io_concurrency is not None and args.jobs is not None:
+        parser.error("--io-concurrency is not compatible with --jobs")
 
-    return CopyrightNoticeChecker.check_files_have_notice_with_retcode(
-        args.filenames, args.notice, enforce_all=args.enforce_all
-    )
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = args.cache_dir or default_cache_dir()
+
+    if args.from_ref is None and (args.to_ref or args.check_modified):
+        parser.error("--to-ref and --check-modified require --from-ref")
+    if args.from_ref is not None and args.all_tracked:
+        parser.error("--from-ref and --all-tracked are mutually exclusive")
+    if args.jsonl == "-" and args.sarif == "-":
+        parser.error("--jsonl and --sarif cannot both write to the standard output")
+    if args.recurse_submodules and (args.staged or args.from_ref is not None):
+        parser.error(
+            "--recurse-submodules is not compatible with --staged and --from-ref"
+        )
+
+    filenames: Iterable[str] = args.filenames
+    if args.all_tracked:
+        filenames = tracked_files(recurse_submodules=args.recurse_submodules)
+    blobs = None
+    if args.from_ref is not None:
+        try:
+            blobs = changed_files(
+                args.from_ref, args.to_ref or "HEAD", modified=args.check_modified
+            )
+        except RuntimeError as exc:
+            logging.error("Failed to list the changed files: %s", exc)
+            return 255
+        filenames = list(blobs)
+
+    comment_styles = None
+    if args.comment_styles or args.comment_style:
+        comment_styles = dict(args.comment_style)
+
+    stats = CheckStats() if args.stats else None
+    with ExitStack() as stack:
+        reporters: List[Reporter] = []
+        for path, reporter_cls in (
+            (args.jsonl, JsonLinesReporter),
+            (args.sarif, SarifReporter),
+        ):
+            if path is None:
+                continue
+            stream = sys.stdout
+            if path != "-":
+                try:
+                    stream = stack.enter_context(open(path, "w", encoding="utf-8"))
+                except OSError as exc:
+                    parser.error(f"cannot write report {path}: {exc}")
+            reporters.append(reporter_cls(stream))
+        retcode = CopyrightNoticeChecker.check_files_have_notice_with_retcode(
+            filenames,
+            args.notice or ["copyright.txt"],
+            enforce_all=args.enforce_all or args.all_tracked or blobs is not None,
+            include=args.include,
+            exclude=args.exclude,
+            max_header_bytes=args.max_header_bytes,
+            max_header_lines=args.max_header_lines,
+            jobs=args.jobs,
+            io_concurrency=args.io_concurrency,
+            cache_dir=cache_dir,
+            cache_max_entries=args.cache_max_entries,
+            staged=args.staged,
+            tolerant_whitespace=args.tolerant_whitespace,
+            placeholders=args.placeholders,
+            year_policy=args.year_policy,
+            fix=args.fix,
+            max_file_size=args.max_file_size,
+            stats=stats,
+            reporters=reporters,
+            notice_config=args.notice_config,
+            blobs=blobs,
+            shard=args.shard,
+            comment_styles=comment_styles,
+            recurse_submodules=args.recurse_submodules,
+            near_miss=args.near_miss,
+        )
+        for reporter in reporters:
+            reporter.close(successful=retcode in (0, 1))
+    if stats is not None:
+        # Keep the standard output parseable when a report is written to it
+        out = sys.stderr if "-" in (args.jsonl, args.sarif) else sys.stdout
+        print(
+            stats.to_json() if args.stats_format == "json" else stats.format(),
+            file=out,
+        )
+    return retcode
 
 
 if __name__ == "__main__":
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+
+"""
+Long-lived daemon checking files on behalf of the copyright-notice client.
+
+The daemon saves the interpreter startup and the imports of each invocation,
+and keeps warm across invocations the compiled notice matchers and the
+results cache (whose entries are still invalidated by size, mtime and inode).
+Requests are served one at a time, in the working directory and with the
+Git environment variables of the client. Clients which do not send their
+request in time are disconnected, so that they do not block the others.
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Any, Dict, Optional, Sequence, TextIO, cast
+
+from . import cache
+from .client import PROTOCOL_VERSION, default_socket_path
+from .copyright_notice import main as check_main
+
+# Seconds to wait for each read of a request, and for each write of the output
+REQUEST_TIMEOUT = 10.0
+
+
+class _MessageWriter(io.TextIOBase):
+    """Text stream sending what is written to the client, as messages"""
+
+    def __init__(self, wfile: io.BufferedIOBase, name: str):
+        super().__init__()
+        self._wfile = wfile
+        self._name = name
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: str) -> int:
+        if data:
+            message = json.dumps({self._name: data})
+            self._wfile.write(message.encode() + b"\n")
+        return len(data)
+
+    def flush(self) -> None:
+        self._wfile.flush()
+
+
+class _CurrentStderr:
+    """Stream writing to whatever sys.stderr is when written to"""
+
+    def write(self, data: str) -> int:
+        return sys.stderr.write(data)
+
+    def flush(self) -> None:
+        sys.stderr.flush()
+
+
+def _set_git_env(env: Dict[str, str]) -> None:
+    for key in [key for key in os.environ if key.startswith("GIT_")]:
+        del os.environ[key]
+    os.environ.update(env)
+
+
+def run_request(request: Dict[str, Any], stdout: TextIO, stderr: TextIO) -> int:
+    """
+    Run an invocation of the command line on behalf of a client.
+
+    :param request: Request of the client (see client.build_request)
+    :param stdout: Stream to write the standard output of the invocation to
+    :param stderr: Stream to write the standard error of the invocation to
+    :return: Exit code of the invocation
+    """
+    saved_argv = sys.argv
+    saved_cwd = os.getcwd()
+    saved_env = {key: val for key, val in os.environ.items() if key.startswith("GIT_")}
+    try:
+        # As seen by argparse, in particular for the program name
+        sys.argv = ["copyright-notice", *request["argv"]]
+        os.chdir(request["cwd"])
+        _set_git_env(request["env"])
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                return check_main(request["argv"])
+            except SystemExit as exc:
+                # Raised by argparse on invalid arguments or --help
+                if exc.code is None or isinstance(exc.code, int):
+                    return exc.code or 0
+                print(exc.code, file=sys.stderr)
+                return 2
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+                return 255
+    finally:
+        sys.argv = saved_argv
+        os.chdir(saved_cwd)
+        _set_git_env(saved_env)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Handler of a single invocation of the client"""
+
+    timeout = REQUEST_TIMEOUT
+
+    def _send(self, message: Dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(message).encode() + b"\n")
+
+    def handle(self) -> None:
+        try:
+            line = self.rfile.readline()
+        except OSError:
+            # e.g. timed out
+            return
+        try:
+            request = json.loads(line)
+            if request.get("version") != PROTOCOL_VERSION:
+                raise ValueError(f"Unsupported protocol version: {request['version']}")
+        except (ValueError, KeyError, AttributeError) as exc:
+            self._send({"error": str(exc)})
+            return
+        # The client waits without timeout from now on
+        self._send({"accepted": True})
+        stdout = cast(TextIO, _MessageWriter(self.wfile, "stdout"))
+        stderr = cast(TextIO, _MessageWriter(self.wfile, "stderr"))
+        try:
+            retcode = run_request(request, stdout, stderr)
+        except (OSError, KeyError, TypeError) as exc:
+            self._send({"error": str(exc)})
+            return
+        self._send({"retcode": retcode})
+
+
+class Daemon(socketserver.UnixStreamServer):
+    """Server of the requests of the clients on a Unix socket"""
+
+    def __init__(self, socket_path: str, idle_timeout: Optional[float] = None):
+        """
+        :param socket_path: Path to the socket to listen on
+        :param idle_timeout: If set, stop after this many seconds without requests
+        :raises RuntimeError: if another daemon is listening on the socket
+        """
+        if os.path.exists(socket_path):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                try:
+                    sock.connect(socket_path)
+                except OSError:
+                    # Left by a daemon which did not stop cleanly
+                    os.unlink(socket_path)
+                else:
+                    raise RuntimeError(
+                        f"A daemon is already listening on {socket_path}"
+                    )
+        # Only the current user may connect to the socket
+        umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _RequestHandler)
+        finally:
+            os.umask(umask)
+        self.socket_path = socket_path
+        self.timeout = idle_timeout
+        self.idle = False
+
+    def handle_timeout(self) -> None:
+        self.idle = True
+
+    def serve(self) -> None:
+        """Serve the requests until idle for too long or interrupted"""
+        try:
+            while not self.idle:
+                self.handle_request()
+        finally:
+            self.server_close()
+            os.unlink(self.socket_path)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """copyright-notice-daemon entry point"""
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--socket",
+        default=default_socket_path(),
+        help="Path to the socket to listen on (default: %(default)s, "
+        "or the COPYRIGHT_NOTICE_SOCKET environment variable).",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        help="Stop after this many seconds without requests (default: never).",
+    )
+    args = parser.parse_args(argv)
+
+    if not hasattr(socket, "AF_UNIX"):
+        parser.error("Unix sockets are not supported on this platform")
+    cache.keep_loaded()
+    # Warnings follow the redirection of stderr to the current client
+    logging.basicConfig(stream=_CurrentStderr())
+    try:
+        daemon = Daemon(args.socket, args.idle_timeout)
+    except (OSError, RuntimeError) as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    print(f"Listening on {args.socket}", file=sys.stderr)
+    try:
+        daemon.serve()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+"""Insertion of the copyright notice in files missing it"""
+
+import os
+import re
+import shutil
+import tempfile
+from typing import Optional
+
+from .util import WIDE_ENCODINGS, Buffer, is_utf8, sniff_encoding
+
+# Encoding declaration of Python sources (PEP 263)
+_CODING_RE = re.compile(rb"^[ \t\f]*#.*?coding[:=][ \t]*[-\w.]+")
+
+# XML declaration, which must start XML documents, and the end of its line
+_XML_DECLARATION_RE = re.compile(r"<\?xml[ \t\r\n][^>]*\?>[ \t]*(?:\r?\n)?")
+
+# Number of bytes at the beginning of a file searched for an XML declaration
+XML_DECLARATION_MAX_SIZE = 1024
+
+
+def notice_insertion_point(
+    head: Buffer, start: int = 0, encoding: Optional[str] = None
+) -> int:
+    """
+    Find where the notice should be inserted, i.e. after the XML declaration,
+    or after the shebang and encoding declaration lines, if any.
+
+    :param head: Beginning of the file content
+    :param start: Offset of the first line (e.g. after a byte order mark)
+    :param encoding: Encoding of the content, if not ASCII-compatible
+    :return: Offset of the insertion point
+    """
+    if encoding not in WIDE_ENCODINGS:
+        encoding = "latin-1"
+    text = bytes(head[start : start + XML_DECLARATION_MAX_SIZE]).decode(
+        encoding, errors="replace"
+    )
+    declaration = _XML_DECLARATION_RE.match(text)
+    if declaration is not None:
+        return start + len(text[: declaration.end()].encode(encoding))
+    if encoding in WIDE_ENCODINGS:
+        # Shebang and encoding declarations are ASCII-compatible
+        return start
+    pos = start
+    for lineno in range(2):
+        end = head.find(b"\n", pos)
+        line_end = len(head) if end == -1 else end + 1
+        line = head[pos:line_end]
+        if not ((lineno == 0 and line.startswith(b"#!")) or _CODING_RE.match(line)):
+            break
+        pos = line_end
+    return pos
+
+
+def write_with_notice(filepath: str, head: Buffer, notice: bytes) -> str:
+    """
+    Write a copy of a file with the notice inserted, next to the file itself.
+
+    The notice follows the line endings and the encoding of the file, i.e. the
+    encoding of its byte order mark, or Latin-1 if the file is not valid UTF-8.
+    The copy is meant to atomically replace the file with os.replace.
+
+    :param filepath: Path to the file
+    :param head: Beginning of the file content (possibly the whole content)
+    :param notice: Bytes representation of the notice, in UTF-8
+    :return: Path to the copy
+    :raises UnicodeError: if the notice cannot be encoded in the file encoding
+    """
+    encoding, bom_size = sniff_encoding(head)
+    if encoding is None and not is_utf8(head):
+        encoding = "latin-1"
+    insert_at = notice_insertion_point(head, bom_size, encoding)
+    encoding = encoding or "utf-8"
+    eol, cr = "\n".encode(encoding), "\r".encode(encoding)
+    first_eol = head.find(eol, bom_size)
+    newline = eol
+    if first_eol >= bom_size + len(cr) and head[first_eol - len(cr) : first_eol] == cr:
+        newline = cr + eol
+    notice = notice.replace(b"\r\n", b"\n")
+    if not notice.endswith(b"\n"):
+        notice += b"\n"
+    if encoding != "utf-8":
+        notice = notice.decode("utf-8").encode(encoding)
+    notice = notice.replace(eol, newline)
+    prefix = head[:insert_at]
+    if len(prefix) > bom_size and not prefix.endswith(eol):
+        prefix += newline
+
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(filepath)),
+        prefix=f".{os.path.basename(filepath)}.",
+        suffix=".tmp",
+    )
+    try:
+        with os.fdopen(fd, "wb") as f_tmp, open(filepath, "rb") as f_src:
+            f_tmp.write(prefix)
+            f_tmp.write(notice)
+            f_tmp.write(head[insert_at:])
+            f_src.seek(len(head))
+            shutil.copyfileobj(f_src, f_tmp)
+        shutil.copymode(filepath, tmp_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path
@@ -0,0 +1,826 @@
+#!/usr/bin/env python
+
+"""Matchers to look for copyright notices in file contents"""
+
+import difflib
+import re
+from typing import (
+    Any,
+    Dict,
+    List,
+    Match,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Sequence,
+    Tuple,
+)
+
+from .comments import CommentStyle
+from .util import WIDE_ENCODINGS, Buffer, is_utf8, sniff_encoding
+
+# Regexes matching line breaks and whitespace runs in tolerant mode
+_LINE_BREAK = rb"[ \t]*\r?\n[ \t]*"
+_SPACE_RUN = rb"[ \t]+"
+
+_LINE_BREAK_RE = re.compile(_LINE_BREAK)
+_SPACE_RUN_RE = re.compile(_SPACE_RUN)
+_WORD_RE = re.compile(rb"[^ \t\r\n]+")
+
+
+# Regexes of the placeholders of templated notices, as (regex, number of years)
+PLACEHOLDERS: Dict[bytes, Tuple[bytes, int]] = {
+    b"year": (rb"([0-9]{4})", 1),
+    b"year_range": (rb"([0-9]{4})(?:[ \t]*(?:-|\xe2\x80\x93)[ \t]*([0-9]{4}))?", 2),
+    b"holder": (rb"[^\r\n]+", 0),
+}
+
+_PLACEHOLDER_RE = re.compile(rb"\{\{|\}\}|\{([A-Za-z_]*)\}")
+
+# Minimum size of the ranges of the contents searched by the regexes of tolerant
+# and templated notices (see NoticeMatcher._search_regex)
+WINDOW_SIZE = 64 * 1024
+
+# Minimum size of the bytes shared by literal templates searched together, and
+# number of occurrences of these bytes checked before searching each template
+# (see shared_keys)
+MIN_KEY_SIZE = 8
+MAX_KEY_HITS = 64
+
+
+def _literal_pattern(text: bytes, tolerant_whitespace: bool) -> bytes:
+    if not tolerant_whitespace:
+        return re.escape(text)
+    return _LINE_BREAK.join(
+        _SPACE_RUN.join(re.escape(word) for word in _SPACE_RUN_RE.split(line))
+        for line in _LINE_BREAK_RE.split(text)
+    )
+
+
+def tolerant_pattern(template: bytes) -> bytes:
+    """
+    Translate a notice template into a regex tolerant to whitespace changes.
+
+    The regex accepts both LF and CRLF line endings, trailing whitespace,
+    any indentation, and any run of spaces or tabs in place of another.
+    Leading and trailing whitespace of the template are ignored.
+
+    :param template: Bytes representation of the notice
+    :return: Regex source, without capturing groups
+    """
+    return _literal_pattern(template.strip(), True)
+
+
+def placeholder_pattern(
+    template: bytes, tolerant_whitespace: bool = False
+) -> Tuple[bytes, int]:
+    """
+    Translate a templated notice into a regex.
+
+    Placeholders ({year}, {year_range}, {holder}) match any value,
+    while {{ and }} stand for literal braces.
+
+    :param template: Bytes representation of the templated notice
+    :param tolerant_whitespace: If True, the literal parts of the template
+        are matched as in tolerant_pattern
+    :return: Regex source, and number of its capturing groups (all years)
+    :raises ValueError: if the template contains an unknown placeholder
+    """
+    if tolerant_whitespace:
+        template = template.strip()
+    parts: List[bytes] = []
+    groups = 0
+    pos = 0
+    for token in _PLACEHOLDER_RE.finditer(template):
+        parts.append(
+            _literal_pattern(template[pos : token.start()], tolerant_whitespace)
+        )
+        pos = token.end()
+        if token.group(1) is None:
+            parts.append(re.escape(token.group()[:1]))
+            continue
+        if token.group(1) not in PLACEHOLDERS:
+            raise ValueError(f"Unknown placeholder: {token.group().decode()}")
+        regex, years = PLACEHOLDERS[token.group(1)]
+        parts.append(regex)
+        groups += years
+    parts.append(_literal_pattern(template[pos:], tolerant_whitespace))
+    return b"".join(parts), groups
+
+
+def render_template(template: bytes, values: Dict[str, str]) -> bytes:
+    """
+    Replace the placeholders of a templated notice with actual values.
+
+    :param template: Bytes representation of the templated notice
+    :param values: Value of each placeholder, by name
+    :return: Bytes representation of the notice
+    :raises ValueError: if no value is given for a placeholder of the template
+    """
+
+    def replace(token: Match[bytes]) -> bytes:
+        if token.group(1) is None:
+            return token.group()[:1]
+        name = token.group(1).decode()
+        if name not in values:
+            raise ValueError(f"No value for placeholder: {{{name}}}")
+        return values[name].encode()
+
+    return _PLACEHOLDER_RE.sub(replace, template)
+
+
+class NoticeMatch(NamedTuple):
+    """Occurrence of a notice template in a file content"""
+
+    template: str
+    start: int
+    end: int
+    year: Optional[int] = None
+
+
+class NearMiss(NamedTuple):
+    """Closest approximate occurrence of a notice template in a file content"""
+
+    template: str
+    # Number of character insertions, deletions and substitutions
+    distance: int
+    # Line of the beginning of the occurrence, from 1
+    line: int
+    text: str
+    expected: str
+
+    def diff(self) -> List[str]:
+        """
+        Compare the occurrence with the notice.
+
+        :return: Lines of the unified diff from the notice to the occurrence
+        """
+        return list(
+            difflib.unified_diff(
+                self.expected.splitlines(),
+                self.text.splitlines(),
+                "expected",
+                "found",
+                lineterm="",
+            )
+        )
+
+
+def _edit_distances(text: str, pattern: str, anchored: bool) -> Tuple[int, int]:
+    """
+    Find the prefix of a text ending with the fewest edits from a pattern,
+    with the bit-parallel algorithm of Myers (1999).
+
+    The columns of the dynamic programming matrix are encoded as bit vectors
+    of the length of the pattern, so that the text is scanned in a single pass
+    of a few integer operations per character.
+
+    :param text: Text to search
+    :param pattern: Pattern to search for (not empty)
+    :param anchored: If True, the occurrence must start at the beginning of the
+        text, otherwise it can start anywhere (i.e. approximate search)
+    :return: Edit distance of the best occurrence, and offset of its end
+        (the first one, if several)
+    """
+    size = len(pattern)
+    peq: Dict[str, int] = {}
+    for idx, char in enumerate(pattern):
+        peq[char] = peq.get(char, 0) | 1 << idx
+    mask = (1 << size) - 1
+    last = 1 << (size - 1)
+    pv, mv = mask, 0
+    score = best = size
+    best_end = 0
+    for pos, char in enumerate(text):
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = (ph << 1 | anchored) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        if score < best:
+            best, best_end = score, pos + 1
+    return best, best_end
+
+
+def approximate_search(text: str, pattern: str) -> Tuple[int, int, int]:
+    """
+    Find the substring of a text with the fewest edits from a pattern.
+
+    The end of the best substring is found by an approximate search of the
+    pattern in the text, and its beginning by a search of the reversed pattern
+    in the reversed text, anchored at that end. Both are linear in the length
+    of the text.
+
+    :param text: Text to search
+    :param pattern: Pattern to search for (not empty)
+    :return: Edit distance of the substring (Levenshtein), and its start and
+        end offsets (the shortest of the first best substrings)
+    """
+    distance, end = _edit_distances(text, pattern, False)
+    lower = max(0, end - len(pattern) - distance)
+    _, length = _edit_distances(text[lower:end][::-1], pattern[::-1], True)
+    return distance, end - length, end
+
+
+class _Anchor(NamedTuple):
+    """Longest literal word of a template, found before its regex is run"""
+
+    text: bytes
+    # Number of line breaks of the template before and after the word
+    lines_before: int
+    lines_after: int
+
+
+def template_anchor(
+    template: bytes, tolerant_whitespace: bool = False, placeholders: bool = False
+) -> _Anchor:
+    """
+    Find the longest word of a template that any occurrence contains as is.
+
+    As whitespace may vary in tolerant mode and placeholders match any value,
+    the words are the literal parts of the template between whitespace and
+    placeholders. Neither can match a line break that is not in the template,
+    so an occurrence spans as many lines as the template.
+
+    :param template: Bytes representation of the notice
+    :param tolerant_whitespace: If True, the template is matched as in
+        tolerant_pattern
+    :param placeholders: If True, the template may contain placeholders
+    :return: Longest word, and its position in the template (if there is no
+        word, an empty anchor at the beginning of the template, which occurs
+        at any offset)
+    """
+    if tolerant_whitespace:
+        template = template.strip()
+    literals = []
+    pos = 0
+    if placeholders:
+        for token in _PLACEHOLDER_RE.finditer(template):
+            literals.append((pos, token.start()))
+            pos = token.end()
+    literals.append((pos, len(template)))
+    best = _Anchor(b"", 0, template.count(b"\n"))
+    for start, end in literals:
+        for word in _WORD_RE.finditer(template, start, end):
+            if len(word.group()) > len(best.text):
+                best = _Anchor(
+                    word.group(),
+                    template.count(b"\n", 0, word.start()),
+                    template.count(b"\n", word.start()),
+                )
+    return best
+
+
+class _KeyGroup(NamedTuple):
+    """Literal templates searched together, by the bytes they all contain"""
+
+    key: bytes
+    # Index of each template, and offset of the first occurrence of the key in it
+    members: List[Tuple[int, int]]
+
+
+def _common_bytes(key: bytes, template: bytes) -> bytes:
+    """Find the longest run of bytes of a key that a template contains"""
+    match = difflib.SequenceMatcher(
+        None, key, template, autojunk=False
+    ).find_longest_match(0, len(key), 0, len(template))
+    return key[match.a : match.a + match.size]
+
+
+def shared_keys(templates: Sequence[bytes]) -> List[_KeyGroup]:
+    """
+    Group literal templates by the bytes they contain in common, e.g. the
+    "Copyright (C) " of several notices, so that each group is searched with a
+    single scan for these bytes (its key).
+
+    The groups are built greedily: each template joins the group with which
+    it shares the longest key, if at least MIN_KEY_SIZE bytes long, and
+    otherwise makes its own group, whose key is the whole template.
+
+    :param templates: Bytes representation of the notices, in search order
+    :return: Groups of templates, with their keys
+    """
+    groups: List[Tuple[bytes, List[int]]] = []
+    for idx, template in enumerate(templates):
+        best_key, best_pos = b"", -1
+        for pos, (group_key, _) in enumerate(groups):
+            key = _common_bytes(group_key, template)
+            if len(key) >= MIN_KEY_SIZE and len(key) > len(best_key):
+                best_key, best_pos = key, pos
+        if best_pos == -1:
+            groups.append((template, [idx]))
+        else:
+            groups[best_pos] = (best_key, groups[best_pos][1] + [idx])
+    return [
+        _KeyGroup(key, [(idx, templates[idx].find(key)) for idx in indexes])
+        for key, indexes in groups
+    ]
+
+
+def _find(buffer: Buffer, sub: bytes, start: int, end: int, unit: int) -> int:
+    """Find the first occurrence of bytes aligned on code units from start"""
+    pos = buffer.find(sub, start, end)
+    while pos != -1 and (pos - start) % unit:
+        pos = buffer.find(sub, pos + 1, end)
+    return pos
+
+
+def _rfind(buffer: Buffer, sub: bytes, start: int, end: int, unit: int) -> int:
+    """Find the last occurrence of bytes aligned on code units from start"""
+    pos = buffer.rfind(sub, start, end)
+    while pos != -1 and (pos - start) % unit:
+        pos = buffer.rfind(sub, start, pos + len(sub) - 1)
+    return pos
+
+
+class NoticeMatcher:
+    """
+    Matcher of one or more notice templates.
+
+    Literal templates are searched with the find method of the content, one
+    fast scan for each group of templates sharing a run of bytes (e.g. the
+    "Copyright (C) " of several notices, see shared_keys), and one scan for
+    each other template. Tolerant and templated notices are compiled
+    into one regex per template, which only runs on the lines around the
+    occurrences of the longest literal word of the template (see
+    template_anchor): contents are scanned at the speed of find, unless the
+    word is frequent, at worst at the speed of the regex.
+    The templates are UTF-8 (or ASCII) text, which is encoded once into each
+    other encoding searched for (see search_encoded).
+    """
+
+    def __init__(
+        self,
+        templates: Sequence[bytes],
+        names: Sequence[str] = (),
+        *,
+        tolerant_whitespace: bool = False,
+        placeholders: bool = False,
+    ):
+        """
+        :param templates: Bytes representation of the accepted notices
+        :param names: Names of the templates, reported on match
+            (default: their index)
+        :param tolerant_whitespace: If True, accept changes of line endings,
+            indentation and whitespace runs (see tolerant_pattern)
+        :param placeholders: If True, the templates may contain placeholders
+            (see placeholder_pattern)
+        :raises ValueError: if no template is given or a template is invalid
+        """
+        if not templates:
+            raise ValueError("At least one notice template is required")
+        self.templates = tuple(templates)
+        self.names = tuple(names) or tuple(str(idx) for idx in range(len(templates)))
+        self.tolerant_whitespace = tolerant_whitespace
+        self.placeholders = placeholders
+        self._variants: Dict[str, Optional[NoticeMatcher]] = {}
+        self._commented: Dict[CommentStyle, NoticeMatcher] = {}
+        self._anchors: Dict[str, List[_Anchor]] = {}
+        # Prefer the longest template when several match at the same position
+        self._order = sorted(
+            range(len(self.templates)), key=lambda idx: -len(self.templates[idx])
+        )
+        self._rank = {idx: rank for rank, idx in enumerate(self._order)}
+        self._regexes: List[Pattern[bytes]] = []
+        self._groups: List[_KeyGroup] = []
+        if tolerant_whitespace or placeholders:
+            self._compile()
+        else:
+            self._groups = [
+                _KeyGroup(key, [(self._order[idx], offset) for idx, offset in members])
+                for key, members in shared_keys(
+                    [self.templates[idx] for idx in self._order]
+                )
+            ]
+
+    def _compile(self) -> None:
+        for template in self.templates:
+            if self.placeholders:
+                regex, _ = placeholder_pattern(template, self.tolerant_whitespace)
+            else:
+                regex = tolerant_pattern(template)
+            self._regexes.append(re.compile(regex))
+        self._anchors["utf-8"] = [
+            template_anchor(template, self.tolerant_whitespace, self.placeholders)
+            for template in self.templates
+        ]
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, NoticeMatcher):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def _key(self) -> Tuple[Any, ...]:
+        return (self.templates, self.names, self.tolerant_whitespace, self.placeholders)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(names={self.names!r})"
+
+    def render(self, values: Dict[str, str]) -> bytes:
+        """
+        Get the notice to insert in files missing it, i.e. the first template.
+
+        :param values: Value of each placeholder, by name
+        :return: Bytes representation of the notice
+        :raises ValueError: if no value is given for a placeholder of the template
+        """
+        notice = self.templates[0]
+        if self.tolerant_whitespace:
+            notice = notice.strip()
+        if self.placeholders:
+            notice = render_template(notice, values)
+        return notice
+
+    def encoded(self, encoding: str) -> Optional["NoticeMatcher"]:
+        """
+        Get the matcher of the templates encoded in another encoding.
+
+        The matchers are cached, so that each encoding is handled once.
+
+        :param encoding: Encoding of the contents to search
+        :return: Matcher of the encoded templates, or None if the templates
+            cannot be encoded, or if they would match as is (e.g. ASCII
+            templates in Latin-1), or if their regexes cannot be encoded
+            (tolerant or templated notices in a wide encoding)
+        """
+        try:
+            return self._variants[encoding]
+        except KeyError:
+            pass
+        variant = None
+        regex_based = self.tolerant_whitespace or self.placeholders
+        if not (regex_based and encoding in WIDE_ENCODINGS):
+            try:
+                templates = [
+                    template.decode("utf-8").encode(encoding)
+                    for template in self.templates
+                ]
+            except UnicodeError:
+                pass
+            else:
+                if templates != list(self.templates):
+                    variant = NoticeMatcher(
+                        templates,
+                        self.names,
+                        tolerant_whitespace=self.tolerant_whitespace,
+                        placeholders=self.placeholders,
+                    )
+        self._variants[encoding] = variant
+        return variant
+
+    def commented(self, style: CommentStyle) -> "NoticeMatcher":
+        """
+        Get the matcher of the templates rendered as comments.
+
+        The templates are plain text, rendered by style.render. The matchers
+        are cached, so that each style is rendered and compiled once.
+
+        :param style: Comment style of the contents to search
+        :return: Matcher of the commented templates
+        """
+        try:
+            return self._commented[style]
+        except KeyError:
+            pass
+        matcher = NoticeMatcher(
+            [style.render(template) for template in self.templates],
+            self.names,
+            tolerant_whitespace=self.tolerant_whitespace,
+            placeholders=self.placeholders,
+        )
+        self._commented[style] = matcher
+        return matcher
+
+    def max_match_length(self, encoding: Optional[str]) -> Optional[int]:
+        """
+        Get the maximum length of a match, as searched by search_encoded.
+
+        :param encoding: Encoding of the content (see search_encoded)
+        :return: Length of the longest template, in the encodings searched,
+            or None if matches are not bounded (tolerant or templated notices)
+        """
+        if self.tolerant_whitespace or self.placeholders:
+            return None
+        templates = list(self.templates)
+        variant = self.encoded(encoding or "latin-1") if encoding != "utf-8" else None
+        if variant is not None:
+            templates += variant.templates
+        return max(map(len, templates))
+
+    def search_encoded(
+        self,
+        buffer: Buffer,
+        encoding: Optional[str],
+        start: int = 0,
+        end: Optional[int] = None,
+    ) -> Optional[NoticeMatch]:
+        """
+        Find the first occurrence of any of the templates in a content.
+
+        The content is searched as bytes for the templates encoded in its
+        encoding, except for tolerant or templated notices in wide encodings:
+        as the regexes of these notices are ASCII-based, the searched range
+        is then transcoded to UTF-8.
+        Contents of unknown encoding are searched for the templates in UTF-8,
+        then in Latin-1 (if the templates are not ASCII).
+
+        :param buffer: Content to search
+        :param encoding: Encoding of the content (see util.sniff_encoding),
+            or None if it is not known
+        :param start: Offset to start the search from
+        :param end: Offset to stop the search at (default: end of the buffer)
+        :return: The leftmost match, as by search, with offsets in the content
+        """
+        if encoding is None:
+            match = self.search(buffer, start, end)
+            latin1 = self.encoded("latin-1")
+            if match is None and latin1 is not None:
+                match = latin1.search(buffer, start, end)
+            return match
+        if encoding == "utf-8":
+            return self.search(buffer, start, end)
+        variant = self.encoded(encoding)
+        if variant is not None:
+            return variant.search(buffer, start, end)
+        if encoding not in WIDE_ENCODINGS:
+            return self.search(buffer, start, end)
+        return self._search(buffer, start, end, encoding)
+
+    def search(
+        self, buffer: Buffer, start: int = 0, end: Optional[int] = None
+    ) -> Optional[NoticeMatch]:
+        """
+        Find the first occurrence of any of the templates.
+
+        :param buffer: Content to search
+        :param start: Offset to start the search from
+        :param end: Offset to stop the search at (default: end of the buffer)
+        :return: The leftmost match, or None if no template is found.
+            For templated notices, the match includes the latest year found.
+        """
+        return self._search(buffer, start, end)
+
+    def _search(
+        self,
+        buffer: Buffer,
+        start: int,
+        end: Optional[int],
+        encoding: Optional[str] = None,
+    ) -> Optional[NoticeMatch]:
+        """
+        Find the first occurrence of any of the templates.
+
+        :param encoding: Wide encoding of the content, if the regexes are run
+            on the lines around the anchors transcoded to UTF-8 (see search)
+        """
+        if end is None:
+            end = len(buffer)
+        if not self._regexes:
+            found: Optional[Tuple[int, int]] = None
+            for group in self._groups:
+                found = self._search_group(group, buffer, start, end, found)
+            if found is None:
+                return None
+            pos, idx = found[0], self._order[found[1]]
+            return NoticeMatch(self.names[idx], pos, pos + len(self.templates[idx]))
+        best = None
+        # Later templates must start before the best match so far
+        limit = end
+        for idx in self._order:
+            best = self._search_regex(idx, buffer, start, end, limit, encoding) or best
+            if best is not None:
+                limit = best.start
+        return best
+
+    def _search_group(
+        self,
+        group: _KeyGroup,
+        buffer: Buffer,
+        start: int,
+        end: int,
+        found: Optional[Tuple[int, int]],
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Find the first occurrence of the literal templates of a group.
+
+        The key of the group is found with find, and the templates are compared
+        with the bytes around each of its occurrences. After MAX_KEY_HITS
+        occurrences (a frequent key), the rest of the content is searched for
+        each template with find instead.
+
+        :param group: Templates and their key
+        :param found: Offset and search rank of the best occurrence so far
+        :return: Offset and search rank of the best occurrence, among the ones
+            of the templates of the group and found
+        """
+        max_offset = max(offset for _, offset in group.members)
+        hits = 0
+        pos = buffer.find(group.key, start, end)
+        # The occurrences of the templates starting after found are not needed
+        while pos != -1 and (found is None or pos - max_offset <= found[0]):
+            if hits == MAX_KEY_HITS:
+                break
+            hits += 1
+            for idx, offset in group.members:
+                found = self._occurrence_at(
+                    idx, buffer, pos - offset, start, end, found
+                )
+            pos = buffer.find(group.key, pos + 1, end)
+        else:
+            return found
+        # The occurrences whose first occurrence of the key precedes pos are
+        # checked already
+        for idx, offset in group.members:
+            template = self.templates[idx]
+            high = end if found is None else min(end, found[0] + len(template))
+            hit = buffer.find(template, max(start, pos - offset), high)
+            if hit != -1:
+                found = self._occurrence_at(idx, buffer, hit, start, end, found)
+        return found
+
+    def _occurrence_at(
+        self,
+        idx: int,
+        buffer: Buffer,
+        pos: int,
+        start: int,
+        end: int,
+        found: Optional[Tuple[int, int]],
+    ) -> Optional[Tuple[int, int]]:
+        """Get the best of found and the occurrence of a template at an offset"""
+        template = self.templates[idx]
+        rank = (pos, self._rank[idx])
+        # Even empty templates must start before the end
+        if pos < start or pos >= end or pos + len(template) > end:
+            return found
+        if found is not None and rank >= found:
+            return found
+        return rank if buffer[pos : pos + len(template)] == template else found
+
+    def _search_regex(
+        self,
+        idx: int,
+        buffer: Buffer,
+        start: int,
+        end: int,
+        limit: int,
+        encoding: Optional[str],
+    ) -> Optional[NoticeMatch]:
+        """
+        Find the first occurrence of a tolerant or templated notice.
+
+        The anchor of the template is found with find, and the regex is run
+        on the lines of each of its occurrences (as many lines before and after
+        it as in the template), where any occurrence of the notice lies.
+
+        :param idx: Index of the template
+        :param limit: Offset the occurrence must start before
+        :param encoding: Wide encoding of the content (see _search)
+        :return: The leftmost match starting before the limit, if any
+        """
+        anchor = self._encoded_anchors(encoding or "utf-8")[idx]
+        newline = "\n".encode(encoding) if encoding else b"\n"
+        unit = len(newline)
+        best = None
+        pos = _find(buffer, anchor.text, start, end, unit)
+        while pos != -1:
+            low = pos
+            for _ in range(anchor.lines_before + 1):
+                low = _rfind(buffer, newline, start, low, unit)
+                if low == -1:
+                    low = start
+                    break
+            else:
+                low += unit
+            if low >= limit:
+                break
+            # The windows of the occurrences in the next bytes are merged, so
+            # that frequent anchors cost one regex search per window size
+            last = _rfind(buffer, anchor.text, pos, min(end, low + WINDOW_SIZE), unit)
+            line_end = high = _find(buffer, newline, max(pos, last), end, unit)
+            for _ in range(anchor.lines_after):
+                if high == -1:
+                    break
+                high = _find(buffer, newline, high + unit, end, unit)
+            high = end if high == -1 else min(high + unit, end)
+            match = self._search_window(idx, buffer, low, high, limit, encoding)
+            if match is not None:
+                best, limit = match, match.start
+            if line_end == -1:
+                break
+            pos = _find(buffer, anchor.text, line_end + unit, end, unit)
+        return best
+
+    def _search_window(
+        self,
+        idx: int,
+        buffer: Buffer,
+        start: int,
+        end: int,
+        limit: int,
+        encoding: Optional[str],
+    ) -> Optional[NoticeMatch]:
+        """
+        Run the regex of a template on a range of a content.
+
+        Contents in a wide encoding are transcoded to UTF-8, as the regexes
+        are ASCII-based, and the offsets of the match are mapped back.
+
+        :param idx: Index of the template
+        :param limit: Offset the occurrence must start before
+        :param encoding: Wide encoding of the content (see _search)
+        :return: The leftmost match of the template in the range, if any
+        """
+        regex = self._regexes[idx]
+        if encoding is None:
+            match = regex.search(buffer, start, end)
+            if match is None:
+                return None
+            span = match.span()
+        else:
+            text = bytes(buffer[start:end]).decode(encoding, errors="replace")
+            transcoded = text.encode("utf-8")
+            match = regex.search(transcoded)
+            if match is None:
+                return None
+
+            def offset(pos: int) -> int:
+                return start + len(transcoded[:pos].decode("utf-8").encode(encoding))
+
+            span = (offset(match.start()), offset(match.end()))
+        if span[0] >= limit:
+            return None
+        years = [int(year) for year in match.groups() if year]
+        return NoticeMatch(
+            self.names[idx], span[0], span[1], max(years) if years else None
+        )
+
+    def _encoded_anchors(self, encoding: str) -> List[_Anchor]:
+        """Get the anchors of the templates, encoded once per encoding"""
+        try:
+            return self._anchors[encoding]
+        except KeyError:
+            pass
+        anchors = [
+            anchor._replace(text=anchor.text.decode("utf-8").encode(encoding))
+            for anchor in self._anchors["utf-8"]
+        ]
+        self._anchors[encoding] = anchors
+        return anchors
+
+    def near_miss(
+        self, head: Buffer, max_ratio: float, values: Optional[Dict[str, str]] = None
+    ) -> Optional[NearMiss]:
+        """
+        Find the closest approximate occurrence of any of the templates, e.g. a
+        notice with a typo, a stale year or truncated.
+
+        The content is decoded, and searched with approximate_search, so the
+        cost is linear in its length: it is meant for the beginning of the
+        files where no template was found.
+
+        :param head: Beginning of the file content
+        :param max_ratio: Maximum edit distance of the occurrences, as a ratio
+            of the length of the template
+        :param values: Values of the placeholders of templated notices; other
+            placeholders are searched as is
+        :return: The occurrence with the fewest edits, or None if none is
+            within the maximum distance
+        """
+        encoding, bom_size = sniff_encoding(head)
+        if encoding is None:
+            encoding = "utf-8" if is_utf8(head) else "latin-1"
+        text = bytes(head[bom_size:]).decode(encoding, errors="replace")
+        best = None
+        for name, template in zip(self.names, self.templates):
+            if self.placeholders:
+                template = render_template(
+                    template,
+                    {
+                        **{key.decode(): f"{{{key.decode()}}}" for key in PLACEHOLDERS},
+                        **(values or {}),
+                    },
+                )
+            expected = template.decode("utf-8", errors="replace")
+            expected = expected.strip() if self.tolerant_whitespace else expected
+            expected = expected.strip("\r\n")
+            if not expected:
+                continue
+            distance, start, end = approximate_search(text, expected)
+            if distance > int(len(expected) * max_ratio):
+                continue
+            if best is None or distance < best.distance:
+                line = text.count("\n", 0, start) + 1
+                best = NearMiss(name, distance, line, text[start:end], expected)
+        return best
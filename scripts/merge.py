@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+"""
+Merge the exit codes of the shards of a check into a single exit code.
+
+Each argument is the exit code of a `copyright-notice --shard=INDEX/COUNT`
+invocation, or the path to a file containing it (e.g. saved by a CI node).
+"""
+
+import argparse
+import sys
+from typing import Iterable, Optional, Sequence
+
+from .error import exception_to_retcode_mapping
+
+
+def merge_retcodes(retcodes: Iterable[int]) -> int:
+    """
+    Combine the exit codes of the shards of a check.
+
+    :param retcodes: Exit code of each shard
+    :return: 0 if all the shards passed, 1 if files failed the check in some
+        shards without errors in any shard, otherwise the most severe error:
+        unexpected codes first (e.g. crashes or usage errors), then the codes
+        of exception_to_retcode_mapping, in its order
+    """
+    codes = set(retcodes)
+    errors = codes - {0, 1}
+    if not errors:
+        return max(codes, default=0)
+    known = list(exception_to_retcode_mapping.values())
+    unexpected = errors - set(known)
+    if unexpected:
+        return max(unexpected)
+    return min(errors, key=known.index)
+
+
+def _retcode(value: str) -> int:
+    """Parse an exit code command-line argument, or read it from a file"""
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        with open(value, encoding="utf-8") as f_retcode:
+            return int(f_retcode.read().strip())
+    except (OSError, ValueError) as exc:
+        raise argparse.ArgumentTypeError(
+            f"expected an exit code, or a file containing one, got {value}: {exc}"
+        ) from exc
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """copyright-notice-merge entry point"""
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "retcodes",
+        nargs="+",
+        type=_retcode,
+        metavar="RETCODE",
+        help="Exit code of a shard, or path to a file containing it.",
+    )
+    args = parser.parse_args(argv)
+
+    return merge_retcodes(args.retcodes)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
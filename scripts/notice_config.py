@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+"""Per-directory mapping of the notices, compiled into a path-prefix trie"""
+
+import configparser
+import fnmatch
+import os
+from typing import Dict, Generic, Iterator, List, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+# Section of the configuration file mapping path patterns to notice templates
+CONFIG_SECTION = "tool:copyright-notice"
+
+
+def read_notice_config(config_path: str) -> List[Tuple[str, List[str]]]:
+    """
+    Read the mapping from path patterns to notice templates.
+
+    The mapping is the CONFIG_SECTION section of an INI file (e.g. setup.cfg),
+    where each key is a path pattern, and each value is a whitespace-separated
+    list of notice templates, any of which is accepted:
+
+        [tool:copyright-notice]
+        * = copyright.txt
+        third_party/ = notices/third_party.txt
+        projects/*/oss/ = notices/apache.txt notices/mit.txt
+
+    :param config_path: Path to the configuration file
+    :return: (path pattern, notice template paths) pairs, in file order.
+        Template paths are relative to the directory of the configuration file.
+    :raises FileNotFoundError: if the configuration file does not exist
+    :raises ValueError: if the configuration file is invalid
+    """
+    parser = configparser.ConfigParser(delimiters=("=",), interpolation=None)
+    # Path patterns are case-sensitive
+    parser.optionxform = str  # type: ignore[assignment,method-assign]
+    try:
+        with open(config_path, encoding="utf-8") as f_config:
+            parser.read_file(f_config)
+    except configparser.Error as exc:
+        raise ValueError(str(exc)) from exc
+    if not parser.has_section(CONFIG_SECTION):
+        raise ValueError(f"No [{CONFIG_SECTION}] section")
+    config_dir = os.path.dirname(config_path)
+    mapping = []
+    for pattern, value in parser.items(CONFIG_SECTION):
+        notices = value.split()
+        if not notices:
+            raise ValueError(f"No notice for {pattern}")
+        mapping.append(
+            (pattern, [os.path.join(config_dir, notice) for notice in notices])
+        )
+    return mapping
+
+
+class _TrieNode(Generic[V]):
+    """Node of a PathTrie, for a path component"""
+
+    __slots__ = ("children", "globs", "value")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_TrieNode[V]"] = {}
+        self.globs: List[Tuple[str, "_TrieNode[V]"]] = []
+        self.value: Optional[V] = None
+
+
+class PathTrie(Generic[V]):
+    """
+    Map from path patterns to values, by path component.
+
+    A pattern matches a path if each of its components matches the path
+    component at the same depth, literally or as a glob (e.g. *, test_*).
+    A path is mapped to the value of the deepest (i.e. most specific) pattern
+    matching a prefix of it, preferring literal components over globs at the
+    same depth, and the globs inserted last (as in CODEOWNERS files).
+    The empty pattern matches any path.
+    The lookup cost is proportional to the depth of the path.
+    """
+
+    def __init__(self) -> None:
+        self._root: _TrieNode[V] = _TrieNode()
+
+    @staticmethod
+    def _components(path: str) -> List[str]:
+        return [
+            comp for comp in path.replace("\\", "/").split("/") if comp not in ("", ".")
+        ]
+
+    def insert(self, pattern: str, value: V) -> None:
+        """
+        Map a path pattern to a value, replacing the previous value if any.
+
+        :param pattern: Slash-separated path pattern
+        :param value: Value of the paths matching the pattern
+        """
+        node = self._root
+        for comp in self._components(pattern):
+            if not any(char in comp for char in "*?["):
+                node = node.children.setdefault(comp, _TrieNode())
+                continue
+            for glob, child in node.globs:
+                if glob == comp:
+                    node = child
+                    break
+            else:
+                child = _TrieNode()
+                node.globs.append((comp, child))
+                node = child
+        node.value = value
+
+    def covers_all(self) -> bool:
+        """
+        Check if every path is mapped to a value.
+
+        :return: True if the empty pattern or the * pattern is mapped
+        """
+        root = self._root
+        return root.value is not None or any(
+            glob == "*" and child.value is not None for glob, child in root.globs
+        )
+
+    def values(self) -> Iterator[V]:
+        """
+        Iterate over the values of the patterns.
+
+        :return: Iterator over the values, shallower patterns first
+        """
+        level = [self._root]
+        while level:
+            for node in level:
+                if node.value is not None:
+                    yield node.value
+            level = [
+                child
+                for node in level
+                for child in (*node.children.values(), *(c for _, c in node.globs))
+            ]
+
+    def lookup(self, path: str) -> Optional[V]:
+        """
+        Get the value of the most specific pattern matching a path.
+
+        :param path: Slash-separated relative path
+        :return: Value of the pattern, or None if no pattern matches
+        """
+        best = self._root.value
+        frontier = [self._root]
+        for comp in self._components(path):
+            matches = []
+            for node in frontier:
+                child = node.children.get(comp)
+                if child is not None:
+                    matches.append(child)
+                matches.extend(
+                    child
+                    for glob, child in reversed(node.globs)
+                    if fnmatch.fnmatchcase(comp, glob)
+                )
+            if not matches:
+                break
+            for node in matches:
+                if node.value is not None:
+                    best = node.value
+                    break
+            frontier = matches
+        return best
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+"""Machine-readable reports of the per-file results, written as they come"""
+
+import json
+import os
+from abc import ABC, abstractmethod
+from pathlib import PurePath
+from typing import IO, TYPE_CHECKING, Any, Dict
+from urllib.parse import quote
+
+if TYPE_CHECKING:
+    from .copyright_notice import FileResult
+
+SARIF_VERSION = "2.1.0"
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+TOOL_NAME = "copyright-notice"
+TOOL_URI = "https://github.com/leoll2/copyright_notice_precommit"
+
+# Rules of the SARIF report, by verdict of the files failing the check,
+# as (description, level)
+SARIF_RULES = {
+    "missing": ("File does not contain a valid copyright notice", "error"),
+    "not-in-header": (
+        "File does not contain a valid copyright notice in its header",
+        "error",
+    ),
+    "outdated": ("File contains a copyright notice with an outdated year", "error"),
+    "fixed": ("File did not contain a valid copyright notice: fixed", "warning"),
+}
+
+
+def result_to_dict(result: "FileResult") -> Dict[str, Any]:
+    """
+    Convert the result of the check of a file to a JSON-serializable dict.
+
+    :param result: Result of the check
+    :return: Path, verdict, matched template, offset, year, skip reason,
+        and closest approximate notice (template, edit distance, line and diff)
+    """
+    near_miss = None
+    if result.near_miss is not None:
+        near_miss = {
+            "template": result.near_miss.template,
+            "distance": result.near_miss.distance,
+            "line": result.near_miss.line,
+            "diff": "\n".join(result.near_miss.diff()),
+        }
+    return {
+        "path": str(result.path),
+        "verdict": result.verdict.value,
+        "template": result.template,
+        "offset": result.offset,
+        "year": result.year,
+        "reason": result.reason,
+        "near_miss": near_miss,
+    }
+
+
+class Reporter(ABC):
+    """Base class of the reporters, writing each result to a text stream"""
+
+    def __init__(self, stream: IO[str]):
+        """
+        :param stream: Text stream to write the report to
+        """
+        self.stream = stream
+
+    @abstractmethod
+    def report(self, result: "FileResult") -> None:
+        """
+        Write the result of the check of a file.
+
+        :param result: Result of the check
+        """
+
+    def close(self, successful: bool = True) -> None:
+        """
+        Terminate the report, without closing the stream.
+
+        :param successful: If False, the check was interrupted by an error
+        """
+        self.stream.flush()
+
+
+class JsonLinesReporter(Reporter):
+    """Reporter writing a JSON object per line for each file checked"""
+
+    def report(self, result: "FileResult") -> None:
+        self.stream.write(json.dumps(result_to_dict(result)) + "\n")
+
+
+class SarifReporter(Reporter):
+    """
+    Reporter writing a SARIF log of the files failing the check.
+
+    The log is written incrementally: the results are serialized as they come,
+    and the document is terminated by close().
+    """
+
+    def __init__(self, stream: IO[str]):
+        super().__init__(stream)
+        self._count = 0
+        rules = [
+            {
+                "id": rule_id,
+                "shortDescription": {"text": description},
+                "defaultConfiguration": {"level": level},
+            }
+            for rule_id, (description, level) in SARIF_RULES.items()
+        ]
+        driver = {"name": TOOL_NAME, "informationUri": TOOL_URI, "rules": rules}
+        header = json.dumps(
+            {
+                "$schema": SARIF_SCHEMA,
+                "version": SARIF_VERSION,
+                "runs": [{"tool": {"driver": driver}, "results": []}],
+            }
+        )
+        # Leave the results array open, to append the results to it
+        self.stream.write(header[: -len("]}]}")])
+
+    @staticmethod
+    def artifact_uri(filepath: str) -> str:
+        """
+        Get the URI of a checked file.
+
+        :param filepath: Path to the file
+        :return: file URI if the path is absolute, relative URI reference otherwise
+        """
+        path = PurePath(filepath)
+        if os.path.isabs(filepath):
+            return path.as_uri()
+        return quote(path.as_posix())
+
+    def report(self, result: "FileResult") -> None:
+        rule = SARIF_RULES.get(result.verdict.value)
+        if rule is None:
+            return
+        location: Dict[str, Any] = {
+            "artifactLocation": {"uri": self.artifact_uri(str(result.path))}
+        }
+        message = f"{result.path}: {rule[0]}."
+        if result.offset >= 0:
+            location["region"] = {"byteOffset": result.offset}
+        elif result.near_miss is not None:
+            location["region"] = {"startLine": result.near_miss.line}
+            message += (
+                f" Closest notice ({result.near_miss.template}): "
+                f"{result.near_miss.distance} edit(s) away."
+            )
+        entry = {
+            "ruleId": result.verdict.value,
+            "level": rule[1],
+            "message": {"text": message},
+            "locations": [{"physicalLocation": location}],
+        }
+        self.stream.write(("," if self._count else "") + json.dumps(entry))
+        self._count += 1
+
+    def close(self, successful: bool = True) -> None:
+        invocations = json.dumps([{"executionSuccessful": successful}])
+        self.stream.write(f'],"invocations":{invocations}}}]}}\n')
+        super().close(successful)
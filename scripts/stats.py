@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+"""Instrumentation of the phases of a check run"""
+
+import heapq
+import json
+import threading
+import time
+from contextlib import contextmanager
+from types import TracebackType
+from typing import (
+    Any,
+    ContextManager,
+    Counter,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
+
+DEFAULT_SLOWEST = 10
+
+
+class CheckStats:
+    """
+    Timings and counters of a check run, safe to update from several threads.
+
+    Phases run by the files checked in parallel (stat, read, search, ...)
+    are summed over all the files, so they can exceed the wall time of the run.
+    """
+
+    def __init__(self, slowest: int = DEFAULT_SLOWEST):
+        """
+        :param slowest: Number of slowest files to keep track of
+        """
+        self.phases: Dict[str, float] = {}
+        self.counters: Counter[str] = Counter()
+        self.slowest = slowest
+        self._slowest_files: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Time a phase of the run, adding up to the previous times of the phase.
+
+        :param name: Name of the phase
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """
+        Add up to the time of a phase of the run.
+
+        :param name: Name of the phase
+        :param seconds: Time spent in the phase
+        """
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name: str, value: int = 1) -> None:
+        """
+        Increment a counter.
+
+        :param name: Name of the counter
+        :param value: Increment
+        """
+        with self._lock:
+            self.counters[name] += value
+
+    def record_file(self, filepath: str, seconds: float) -> None:
+        """
+        Record the time spent on the check of a file.
+
+        :param filepath: Path to the file
+        :param seconds: Time spent on the file
+        """
+        with self._lock:
+            if len(self._slowest_files) < self.slowest:
+                heapq.heappush(self._slowest_files, (seconds, filepath))
+            elif self._slowest_files and seconds > self._slowest_files[0][0]:
+                heapq.heapreplace(self._slowest_files, (seconds, filepath))
+
+    @property
+    def slowest_files(self) -> List[Tuple[str, float]]:
+        """Slowest files checked, as (path, seconds) pairs, slowest first"""
+        with self._lock:
+            return [
+                (filepath, seconds)
+                for seconds, filepath in sorted(self._slowest_files, reverse=True)
+            ]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Get the statistics in a JSON-serializable form.
+
+        :return: Phase timings in seconds, counters, and slowest files
+        """
+        with self._lock:
+            phases = dict(self.phases)
+            counters = dict(self.counters)
+        return {
+            "phases": phases,
+            "counters": counters,
+            "slowest_files": [
+                {"path": filepath, "seconds": seconds}
+                for filepath, seconds in self.slowest_files
+            ],
+        }
+
+    def to_json(self) -> str:
+        """
+        Serialize the statistics to JSON.
+
+        :return: JSON document of as_dict()
+        """
+        return json.dumps(self.as_dict(), indent=2, sort_keys=True)
+
+    def format(self) -> str:
+        """
+        Format the statistics as a human-readable report.
+
+        :return: Multi-line report
+        """
+        data = self.as_dict()
+        lines = ["Phases (seconds):"]
+        lines.extend(
+            f"  {name:<16}{seconds:>10.4f}" for name, seconds in data["phases"].items()
+        )
+        lines.append("Counters:")
+        lines.extend(
+            f"  {name:<16}{value:>10}"
+            for name, value in sorted(data["counters"].items())
+        )
+        if data["slowest_files"]:
+            lines.append("Slowest files (seconds):")
+            lines.extend(
+                f"  {entry['seconds']:>10.4f}  {entry['path']}"
+                for entry in data["slowest_files"]
+            )
+        return "\n".join(lines)
+
+
+class _NoPhase:
+    """Context manager doing nothing, in place of an untimed phase"""
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        return None
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(stats: Optional[CheckStats], name: str) -> ContextManager[None]:
+    """
+    Time a phase of the run if statistics are collected.
+
+    :param stats: Statistics of the run, or None if not collected
+    :param name: Name of the phase
+    :return: Context manager timing the phase
+    """
+    if stats is None:
+        return _NO_PHASE
+    return stats.phase(name)
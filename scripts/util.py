@@ -2,8 +2,124 @@
 
 """Utility functions"""
 
+import asyncio
+import codecs
+import fnmatch
+import itertools
+import json
+import logging
+import mmap
+import os
+import posixpath
+import re
 import subprocess
-from typing import Any, Optional, Set
+import tempfile
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextlib import ExitStack
+from types import TracebackType
+from typing import (
+    IO,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    BinaryIO,
+    Callable,
+    Deque,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# In-memory or memory-mapped file content
+Buffer = Union[bytes, bytearray, mmap.mmap]
+
+# Path standing for the standard input
+STDIN_PATH = "-"
+
+# Size of a single read when streaming the content of a file
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Number of bytes at the beginning of a file sniffed to classify it
+SNIFF_SIZE = 8000
+
+# Signature of the Git LFS pointer files, and their maximum size
+LFS_POINTER_PREFIX = b"version https://git-lfs.github.com/spec/v1\n"
+LFS_POINTER_MAX_SIZE = 1024
+
+# Byte order marks and their encodings, the UTF-32 ones first as the
+# UTF-32-LE BOM starts with the UTF-16-LE one
+BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+# Encodings whose code units are wider than a byte, i.e. not ASCII-compatible
+WIDE_ENCODINGS = frozenset(("utf-16-le", "utf-16-be", "utf-32-le", "utf-32-be"))
+
+# Number of bytes sniffed to recognize UTF-16 contents without a BOM
+UTF16_SNIFF_SIZE = 64
+
+# Reasons to skip the check of a file, in reporting order
+SKIP_REASONS = ("empty", "binary", "lfs-pointer", "oversized")
+
+# Name of the memo file of the staged added files, in the cache directory
+ADDED_FILES_MEMO = "added-files.json"
+
+# Subdirectory of the memo directory holding the memos of the submodules
+SUBMODULES_MEMO_DIR = "submodules"
+
+# Environment variables bound to a repository, not inherited by the git
+# commands run in its submodules (see `git rev-parse --local-env-vars`)
+_LOCAL_REPO_ENV = (
+    "GIT_ALTERNATE_OBJECT_DIRECTORIES",
+    "GIT_COMMON_DIR",
+    "GIT_CONFIG",
+    "GIT_CONFIG_COUNT",
+    "GIT_CONFIG_PARAMETERS",
+    "GIT_DIR",
+    "GIT_GRAFT_FILE",
+    "GIT_IMPLICIT_WORK_TREE",
+    "GIT_INDEX_FILE",
+    "GIT_INTERNAL_SUPER_PREFIX",
+    "GIT_NO_REPLACE_OBJECTS",
+    "GIT_OBJECT_DIRECTORY",
+    "GIT_PREFIX",
+    "GIT_REPLACE_REF_BASE",
+    "GIT_SHALLOW_FILE",
+    "GIT_WORK_TREE",
+)
+
+# Size of a single read from the output of a streamed git command
+GIT_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Number of items handed at once to the workers of async_ordered_map
+ASYNC_BATCH_SIZE = 16
+
+# Modes of Git tree entries which are not regular files (symlinks, submodules)
+_NON_FILE_MODES = (b"120000", b"160000")
+
+# Size of a single read when looking for the end of the header lines
+HEADER_CHUNK_SIZE = 64 * 1024
 
 
 def cmd_output(*cmd: str, retcode: Optional[int] = 0, **kwargs: Any) -> str:
@@ -26,17 +142,491 @@ def cmd_output(*cmd: str, retcode: Optional[int] = 0, **kwargs: Any) -> str:
     return stdout
 
 
-def added_files() -> Set[str]:
+def write_atomically(filepath: str, data: bytes) -> None:
+    """
+    Write a file through a temporary file renamed over it.
+
+    :param filepath: Path to the file
+    :param data: Content of the file
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filepath), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f_tmp:
+            f_tmp.write(data)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def git_dir(repo: Optional[str] = None) -> Optional[str]:
+    """
+    Find the Git directory of the repository containing a directory,
+    without spawning git.
+
+    :param repo: Directory in the repository, e.g. a submodule
+        (default: the current directory, or the GIT_DIR environment variable)
+    :return: Path to the Git directory, or None if not found
+    """
+    if repo is None and os.environ.get("GIT_DIR"):
+        return os.environ["GIT_DIR"]
+    path = os.path.abspath(repo or os.getcwd())
+    while True:
+        dotgit = os.path.join(path, ".git")
+        if os.path.isdir(dotgit):
+            return dotgit
+        if os.path.isfile(dotgit):
+            # Worktrees and submodules: ".git" file pointing to the Git directory
+            with open(dotgit, encoding="utf-8") as f_dotgit:
+                content = f_dotgit.read().strip()
+            if not content.startswith("gitdir:"):
+                return None
+            return os.path.normpath(os.path.join(path, content[7:].strip()))
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+def _index_state(gitdir: str) -> List[Any]:
+    """
+    Identify the current state of the index and of HEAD, without spawning git.
+
+    Git rewrites the index through a new file, so its stat changes on every update.
+
+    :param gitdir: Path to the Git directory
+    :return: JSON-serializable state, equal only if nothing changed
+    """
+    common_dir = gitdir
+    try:
+        with open(os.path.join(gitdir, "commondir"), encoding="utf-8") as f_common:
+            common_dir = os.path.join(gitdir, f_common.read().strip())
+    except FileNotFoundError:
+        pass
+    with open(os.path.join(gitdir, "HEAD"), encoding="utf-8") as f_head:
+        head = f_head.read().strip()
+    paths = [
+        os.environ.get("GIT_INDEX_FILE") or os.path.join(gitdir, "index"),
+        os.path.join(common_dir, "packed-refs"),
+    ]
+    if head.startswith("ref:"):
+        ref = head[4:].strip()
+        paths += [os.path.join(gitdir, ref), os.path.join(common_dir, ref)]
+    state: List[Any] = [os.path.abspath(gitdir), head]
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            state.append([path, stat.st_size, stat.st_mtime_ns, stat.st_ino])
+        except FileNotFoundError:
+            state.append([path])
+    return state
+
+
+def submodule_env() -> Dict[str, str]:
+    """
+    Get the environment of the git commands run in a submodule.
+
+    :return: Environment of the current process, without the variables bound
+        to the current repository (e.g. GIT_INDEX_FILE set by Git hooks)
+    """
+    return {key: val for key, val in os.environ.items() if key not in _LOCAL_REPO_ENV}
+
+
+def added_files(memo_dir: Optional[str] = None, repo: Optional[str] = None) -> Set[str]:
     """
     Get the set of Git added files in the staging area.
 
-    :return: Set of added staged file paths
+    If a memo directory is given, the result is stored there along with the state
+    of the index and HEAD, and reused by later calls (even from other processes)
+    as long as they did not change.
+
+    :param memo_dir: Directory of the memo of the result
+    :param repo: If set, root of the repository to inspect instead of the
+        current one, e.g. a submodule
+    :return: Set of added staged file paths, relative to the repository root
     """
     cmd = ("git", "diff", "--staged", "--name-only", "--diff-filter=A")
-    return set(cmd_output(*cmd).splitlines())
+    kwargs: Dict[str, Any] = {}
+    if repo is not None:
+        kwargs = {"cwd": repo, "env": submodule_env()}
+    gitdir = git_dir(repo) if memo_dir is not None else None
+    if memo_dir is None or gitdir is None:
+        return set(cmd_output(*cmd, **kwargs).splitlines())
+
+    memo_path = os.path.join(memo_dir, ADDED_FILES_MEMO)
+    try:
+        state = _index_state(gitdir)
+    except OSError:
+        return set(cmd_output(*cmd, **kwargs).splitlines())
+    try:
+        with open(memo_path, encoding="utf-8") as f_memo:
+            memo = json.load(f_memo)
+        if memo["state"] == state:
+            return set(memo["files"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    files = cmd_output(*cmd, **kwargs).splitlines()
+    try:
+        os.makedirs(memo_dir, exist_ok=True)
+        write_atomically(
+            memo_path, json.dumps({"state": state, "files": files}).encode()
+        )
+    except OSError as exc:
+        logging.debug("Failed to write memo %s: %s", memo_path, exc)
+    return set(files)
 
 
-def parse_file_as_bytes(filepath: str) -> bytes:
+def _child_submodules(repo: str) -> List[str]:
+    """Initialized submodules declared in the .gitmodules file of a repository"""
+    gitmodules = os.path.join(repo, ".gitmodules")
+    if not os.path.isfile(gitmodules):
+        return []
+    output = cmd_output(
+        "git",
+        "config",
+        "-z",
+        "--file",
+        gitmodules,
+        "--get-regexp",
+        r"^submodule\..*\.path$",
+        retcode=None,
+        env=submodule_env(),
+    )
+    paths = []
+    for entry in output.split("\0"):
+        if "\n" not in entry:
+            continue
+        path = posixpath.normpath(posixpath.join(repo, entry.split("\n", 1)[1]))
+        # Uninitialized submodules have no .git directory (or file)
+        if os.path.exists(os.path.join(path, ".git")):
+            paths.append(path)
+    return paths
+
+
+def submodules(repo: str = ".", jobs: Optional[int] = None) -> List[str]:
+    """
+    Find the initialized submodules of a repository, recursively.
+
+    The submodules are read from the .gitmodules files, and those of the
+    submodules at the same depth are read concurrently.
+
+    :param repo: Root of the repository
+    :param jobs: Number of .gitmodules files read in parallel (default: CPU count)
+    :return: Paths to the submodules, relative to the repository root,
+        parents first
+    """
+    jobs = jobs or os.cpu_count() or 1
+    found: List[str] = []
+    level = [repo]
+    while level:
+        level = [
+            path
+            for children in ordered_map(_child_submodules, level, jobs)
+            for path in children
+        ]
+        found.extend(level)
+    return [posixpath.relpath(path, repo) for path in found]
+
+
+def submodules_added_files(
+    memo_dir: Optional[str] = None, jobs: Optional[int] = None
+) -> Tuple[List[str], Set[str]]:
+    """
+    Get the Git added files in the staging areas of the submodules.
+
+    The submodules are found by submodules(), and their staged files are listed
+    concurrently. Submodules have separate indexes, so the files staged in them
+    are not seen by added_files().
+
+    :param memo_dir: Directory of the memos of the results (see added_files),
+        in a subdirectory per submodule
+    :param jobs: Number of submodules inspected in parallel (default: CPU count)
+    :return: Paths to the submodules, and set of the added staged file paths,
+        both relative to the root of the current repository
+    """
+    jobs = jobs or os.cpu_count() or 1
+    paths = submodules(jobs=jobs)
+
+    def added(path: str) -> Set[str]:
+        sub_memo_dir = None
+        if memo_dir is not None:
+            sub_memo_dir = os.path.join(
+                memo_dir, SUBMODULES_MEMO_DIR, path.replace("/", "%")
+            )
+        return {posixpath.join(path, name) for name in added_files(sub_memo_dir, path)}
+
+    return paths, set().union(*ordered_map(added, paths, jobs))
+
+
+class GitCatFile:
+    """
+    Long-lived `git cat-file --batch` process, to read many Git objects
+    without spawning one process per object.
+
+    Requests are serialized, so an instance can be shared among threads.
+    """
+
+    def __init__(self, **kwargs: Any):
+        self._cmd = ("git", "cat-file", "--batch")
+        kwargs.setdefault("stdin", subprocess.PIPE)
+        kwargs.setdefault("stdout", subprocess.PIPE)
+        kwargs.setdefault("stderr", subprocess.PIPE)
+        self._proc = subprocess.Popen(self._cmd, **kwargs)
+        self._stdin = cast(IO[bytes], self._proc.stdin)
+        self._stdout = cast(IO[bytes], self._proc.stdout)
+        self._lock = threading.Lock()
+
+    def _fail(self) -> RuntimeError:
+        self._proc.kill()
+        _, stderr = self._proc.communicate()
+        return RuntimeError(self._cmd, 0, self._proc.returncode, "", stderr)
+
+    def read_blob(self, obj: str) -> Optional[bytes]:
+        """
+        Read the content of a blob.
+
+        :param obj: Name of the object, e.g. ":path" for the staged version of a file
+        :return: Content of the blob, or None if there is no such blob
+        :raises RuntimeError: if the git process failed
+        """
+        with self._lock:
+            try:
+                self._stdin.write(obj.encode() + b"\n")
+                self._stdin.flush()
+                line = self._stdout.readline().rstrip(b"\n")
+            except OSError as exc:
+                raise self._fail() from exc
+            # The object name, which may contain spaces, precedes these replies
+            if line.endswith((b" missing", b" ambiguous")):
+                return None
+            header = line.rsplit(b" ", 2)
+            if len(header) != 3 or not header[2].isdigit():
+                raise self._fail()
+            size = int(header[2])
+            content = self._stdout.read(size)
+            if len(content) != size or self._stdout.read(1) != b"\n":
+                raise self._fail()
+        return content if header[1] == b"blob" else None
+
+    def close(self) -> None:
+        """
+        Terminate the git process.
+
+        :raises RuntimeError: if the git process returned with an unexpected code
+        """
+        _, stderr = self._proc.communicate()
+        if self._proc.returncode != 0:
+            raise RuntimeError(self._cmd, 0, self._proc.returncode, "", stderr)
+
+    def __enter__(self) -> "GitCatFile":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._proc.kill()
+            self._proc.communicate()
+
+
+def staged_object(filepath: str) -> str:
+    """
+    Get the name of the Git object holding the staged content of a file.
+
+    :param filepath: Path to the file, relative to the current directory
+    :return: Object name, usable with `git cat-file`
+    """
+    return ":./" + os.path.relpath(filepath).replace(os.sep, "/")
+
+
+def tracked_files(recurse_submodules: bool = False, **kwargs: Any) -> Iterator[str]:
+    """
+    Stream the paths of the regular files tracked by Git, from `git ls-files -z`.
+
+    The paths are yielded while git lists them, in its order (sorted),
+    without collecting them in memory first.
+
+    :param recurse_submodules: If True, list the files of the active
+        submodules too, instead of the submodules themselves
+    :param kwargs: Keyword args for the command
+    :return: Iterator over the tracked file paths
+    :raises RuntimeError: if the command failed
+    """
+    cmd: Tuple[str, ...] = ("git", "ls-files", "-z", "--stage")
+    if recurse_submodules:
+        cmd += ("--recurse-submodules",)
+    kwargs.setdefault("stdout", subprocess.PIPE)
+    kwargs.setdefault("stderr", subprocess.PIPE)
+    proc = subprocess.Popen(cmd, **kwargs)
+    stdout = cast(IO[bytes], proc.stdout)
+    try:
+        pending = b""
+        for chunk in iter(lambda: stdout.read(GIT_STREAM_CHUNK_SIZE), b""):
+            *entries, pending = (pending + chunk).split(b"\0")
+            for entry in entries:
+                info, path = entry.split(b"\t", 1)
+                if info[:6] not in _NON_FILE_MODES:
+                    yield os.fsdecode(path)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        _, stderr = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(cmd, 0, proc.returncode, "", stderr)
+
+
+def changed_files(
+    from_ref: str, to_ref: str = "HEAD", modified: bool = False, **kwargs: Any
+) -> Dict[str, str]:
+    """
+    Get the regular files added between two revisions, from a single
+    `git diff-tree -z` call.
+
+    Only Git objects are read, so a bare repository is enough.
+    Renamed files are reported as added.
+
+    :param from_ref: Revision to compare from (e.g. the base of a pull request)
+    :param to_ref: Revision to compare to
+    :param modified: If True, get the modified files as well
+    :param kwargs: Keyword args for the command
+    :return: Name of the blob holding the content of each file at to_ref,
+        by path relative to the root of the repository, in path order
+    :raises RuntimeError: if the command failed (e.g. unknown revision)
+    """
+    diff_filter = "AM" if modified else "A"
+    cmd = (
+        "git",
+        "diff-tree",
+        "-z",
+        "-r",
+        "--no-renames",
+        f"--diff-filter={diff_filter}",
+        from_ref,
+        to_ref,
+        "--",
+    )
+    kwargs.setdefault("stdout", subprocess.PIPE)
+    kwargs.setdefault("stderr", subprocess.PIPE)
+    proc = subprocess.Popen(cmd, **kwargs)
+    stdout, stderr = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(cmd, 0, proc.returncode, "", stderr)
+    # Records are ":<old mode> <new mode> <old blob> <new blob> <status>\0<path>\0"
+    fields = stdout.split(b"\0")
+    files = {}
+    for info, path in zip(fields[0::2], fields[1::2]):
+        _, mode, _, blob, _ = info.split(b" ")
+        if mode not in _NON_FILE_MODES:
+            files[os.fsdecode(path)] = blob.decode()
+    return files
+
+
+def path_filter(
+    include: Sequence[str] = (), exclude: Sequence[str] = ()
+) -> Callable[[str], bool]:
+    """
+    Build a predicate selecting paths by glob patterns (see fnmatch).
+
+    :param include: If not empty, select only the paths matching any of these
+    :param exclude: Do not select the paths matching any of these
+    :return: Predicate, True for the selected paths
+    """
+
+    def compile_globs(globs: Sequence[str]) -> Optional[Pattern[str]]:
+        if not globs:
+            return None
+        return re.compile("|".join(fnmatch.translate(glob) for glob in globs))
+
+    include_re = compile_globs(include)
+    exclude_re = compile_globs(exclude)
+
+    def selected(filepath: str) -> bool:
+        filepath = str(filepath)
+        if include_re is not None and not include_re.match(filepath):
+            return False
+        return exclude_re is None or not exclude_re.match(filepath)
+
+    return selected
+
+
+def shard_of(filepath: str, count: int) -> int:
+    """
+    Assign a file to a shard, by a hash of its path stable across runs,
+    processes and platforms.
+
+    :param filepath: Path to the file (the same path given the same way,
+        e.g. relative to the root of the repository, is always assigned
+        to the same shard)
+    :param count: Number of shards
+    :return: Index of the shard of the file, from 1 to count
+    """
+    path = os.path.normpath(str(filepath)).replace(os.sep, "/")
+    return zlib.crc32(os.fsencode(path)) % count + 1
+
+
+class CreationYears:
+    """
+    Years the files were added to the Git repository, read from a single
+    `git log` walk of the history on first use, instead of one per file.
+
+    Lookups are serialized until the history is read, so an instance can be
+    shared among threads.
+    """
+
+    def __init__(self, **kwargs: Any):
+        """
+        :param kwargs: Keyword args for the git commands
+        """
+        self._kwargs = kwargs
+        self._years: Optional[Dict[str, int]] = None
+        self._prefix = ""
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, int]:
+        prefix = cmd_output("git", "rev-parse", "--show-prefix", **self._kwargs)
+        self._prefix = prefix.strip()
+        # Without rename detection, renamed files are added by the renaming commit
+        cmd = ("git", "log", "--diff-filter=A", "--no-renames", "--name-only", "-z")
+        output = cmd_output(
+            *cmd, "--format=%x00%ad", "--date=format:%Y", **self._kwargs
+        )
+        # Commits are listed from the latest, as a null byte and their year,
+        # each followed by the added paths (the first one after a line break)
+        years: Dict[str, int] = {}
+        year = 0
+        header = False
+        for token in output.split("\0"):
+            if not token:
+                header = True
+            elif header:
+                year, header = int(token), False
+            else:
+                years[token[1:] if token[:1] == "\n" else token] = year
+        return years
+
+    def get(self, filepath: str) -> Optional[int]:
+        """
+        Get the year a file was added to the Git repository.
+
+        :param filepath: Path to the file
+        :return: Year of the earliest commit adding the file,
+            or None if the file is not committed yet
+        :raises RuntimeError: if a git command failed
+        """
+        with self._lock:
+            if self._years is None:
+                self._years = self._load()
+        path = os.path.relpath(filepath).replace(os.sep, "/")
+        return self._years.get(posixpath.normpath(self._prefix + path))
+
+
+def parse_file_as_bytes(filepath: Union[str, "os.PathLike[str]"]) -> bytes:
     """
     Read a file as raw bytes.
 
@@ -45,3 +635,320 @@ def parse_file_as_bytes(filepath: str) -> bytes:
     """
     with open(filepath, "rb") as fpath:
         return fpath.read()
+
+
+def _pread(fd: int, size: int, offset: int) -> bytes:
+    """
+    Read up to size bytes at the given offset of a file descriptor.
+
+    :param fd: File descriptor to read from
+    :param size: Maximum number of bytes to read
+    :param offset: Position in the file to start reading from
+    :return: Bytes read (shorter than size only at end of file)
+    """
+    if hasattr(os, "pread"):
+        return os.pread(fd, size, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def size_skip_reason(size: int, max_size: Optional[int] = None) -> Optional[str]:
+    """
+    Classify a file by its size.
+
+    :param size: Size of the file
+    :param max_size: Maximum size of the files to check
+    :return: Reason to skip the file (see SKIP_REASONS), or None
+    """
+    if size == 0:
+        return "empty"
+    if max_size is not None and size > max_size:
+        return "oversized"
+    return None
+
+
+def sniff_encoding(head: Buffer) -> Tuple[Optional[str], int]:
+    """
+    Detect the encoding of a file content from its first bytes.
+
+    The encoding is given by the byte order mark, if any. Contents without
+    a BOM are recognized as UTF-16 if their first characters are all ASCII,
+    i.e. if every other byte is null.
+
+    :param head: Beginning of the file content
+    :return: Encoding of the content (None if it is not known, i.e. any
+        ASCII-compatible encoding), and size of its byte order mark
+    """
+    for bom, encoding in BOMS:
+        if head[: len(bom)] == bom:
+            return encoding, len(bom)
+    if head.find(b"\0", 0, UTF16_SNIFF_SIZE) != -1:
+        sample = bytes(head[: min(len(head), UTF16_SNIFF_SIZE) & ~1])
+        even, odd = sample[0::2], sample[1::2]
+        if even.count(0) == len(even) and b"\0" not in odd:
+            return "utf-16-be", 0
+        if odd.count(0) == len(odd) and b"\0" not in even:
+            return "utf-16-le", 0
+    return None, 0
+
+
+def is_utf8(head: Buffer) -> bool:
+    """
+    Check if a file content is valid UTF-8 (or ASCII).
+
+    :param head: Beginning of the file content (possibly cut within a character)
+    :return: True if the content decodes as UTF-8
+    """
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def content_skip_reason(head: Buffer) -> Optional[str]:
+    """
+    Classify a file by sniffing the beginning of its content.
+
+    :param head: Beginning of the file content (possibly the whole content)
+    :return: Reason to skip the file (see SKIP_REASONS), or None
+    """
+    if not head:
+        return "empty"
+    if (
+        head.find(b"\0", 0, SNIFF_SIZE) != -1
+        and sniff_encoding(head)[0] not in WIDE_ENCODINGS
+    ):
+        return "binary"
+    if (
+        len(head) <= LFS_POINTER_MAX_SIZE
+        and head[: len(LFS_POINTER_PREFIX)] == LFS_POINTER_PREFIX
+    ):
+        return "lfs-pointer"
+    return None
+
+
+def header_end(
+    buffer: Buffer, max_bytes: Optional[int] = None, max_lines: Optional[int] = None
+) -> int:
+    """
+    Find where the header of an in-memory file content ends.
+
+    :param buffer: File content
+    :param max_bytes: Maximum number of bytes of the header
+    :param max_lines: Maximum number of lines of the header
+    :return: Offset of the end of the header
+    """
+    end = len(buffer) if max_bytes is None else min(len(buffer), max_bytes)
+    if max_lines is not None:
+        pos = -1
+        for _ in range(max_lines):
+            pos = buffer.find(b"\n", pos + 1, end)
+            if pos == -1:
+                return end
+        end = pos + 1
+    return end
+
+
+def readinto_full(stream: BinaryIO, buffer: memoryview) -> int:
+    """
+    Fill a buffer from a stream, unless it ends first.
+
+    Unlike a single read, it does not stop at the partial reads of pipes.
+
+    :param stream: Binary stream to read from
+    :param buffer: Buffer to fill
+    :return: Number of bytes read (less than the buffer size only at end of stream)
+    """
+    # Binary files and standard streams are buffered or raw I/O objects
+    readinto = stream.readinto  # type: ignore[attr-defined]
+    size = 0
+    while size < len(buffer):
+        count = readinto(buffer[size:])
+        if not count:
+            break
+        size += count
+    return size
+
+
+def read_stream_header(
+    stream: BinaryIO, max_bytes: Optional[int] = None, max_lines: Optional[int] = None
+) -> bytes:
+    """
+    Read the header of a stream, i.e. its first bytes and/or lines.
+
+    Unlike read_file_header, the stream need not be seekable (e.g. a pipe).
+
+    :param stream: Binary stream to read from
+    :param max_bytes: Maximum number of bytes to read
+    :param max_lines: Maximum number of lines to read
+    :return: Bytes at the beginning of the stream
+    """
+    header = bytearray()
+    chunk = bytearray(HEADER_CHUNK_SIZE)
+    newlines = 0
+    while max_bytes is None or len(header) < max_bytes:
+        size = HEADER_CHUNK_SIZE
+        if max_bytes is not None:
+            size = min(size, max_bytes - len(header))
+        count = readinto_full(stream, memoryview(chunk)[:size])
+        header += memoryview(chunk)[:count]
+        if max_lines is not None:
+            newlines += chunk.count(b"\n", 0, count)
+            if newlines >= max_lines:
+                return bytes(header[: header_end(header, None, max_lines)])
+        if count < size:
+            break
+    return bytes(header)
+
+
+def read_file_header(
+    filepath: str, max_bytes: Optional[int] = None, max_lines: Optional[int] = None
+) -> bytes:
+    """
+    Read the header of a file, i.e. its first bytes and/or lines.
+
+    When only max_bytes is given, the header is fetched with a single read.
+
+    :param filepath: Path to the file
+    :param max_bytes: Maximum number of bytes to read
+    :param max_lines: Maximum number of lines to read
+    :return: Bytes at the beginning of the file
+    """
+    fd = os.open(filepath, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        if max_lines is None:
+            return _pread(fd, max_bytes if max_bytes is not None else 0, 0)
+        header = bytearray()
+        newlines = 0
+        while max_bytes is None or len(header) < max_bytes:
+            size = HEADER_CHUNK_SIZE
+            if max_bytes is not None:
+                size = min(size, max_bytes - len(header))
+            chunk = _pread(fd, size, len(header))
+            if not chunk:
+                break
+            pos = -1
+            while newlines < max_lines:
+                pos = chunk.find(b"\n", pos + 1)
+                if pos == -1:
+                    break
+                newlines += 1
+            if newlines == max_lines:
+                header += chunk[: pos + 1]
+                break
+            header += chunk
+        return bytes(header)
+    finally:
+        os.close(fd)
+
+
+def ordered_map(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    jobs: int = 1,
+    executor: Optional[Executor] = None,
+) -> Generator[R, None, None]:
+    """
+    Apply a function to each item using a pool of threads, yielding in input order.
+
+    At most a few tasks per worker are in flight at any time, so the items
+    can be a lazy iterable of any length. If a task raises, or if the iterator
+    is closed, the pending tasks are cancelled (and the exception propagated).
+
+    :param func: Function to apply
+    :param items: Items to process
+    :param jobs: Number of worker threads (1 means serial, in the caller thread)
+    :param executor: If set, pool of `jobs` worker threads to use, e.g. to reuse
+        the threads across calls (by default, a pool is created for the call)
+    :return: Generator of the results, in the same order as the items
+    """
+    if jobs <= 1:
+        yield from map(func, items)
+        return
+    with ExitStack() as stack:
+        if executor is None:
+            executor = stack.enter_context(ThreadPoolExecutor(max_workers=jobs))
+        pending: Deque["Future[R]"] = deque()
+        try:
+            for item in items:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= 4 * jobs:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _map_batch(func: Callable[[T], R], batch: List[T]) -> Tuple[List[R], Any]:
+    results = []
+    try:
+        for item in batch:
+            results.append(func(item))
+    except Exception as exc:  # pylint: disable=broad-except
+        return results, exc
+    return results, None
+
+
+async def async_ordered_map(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    concurrency: int,
+    batch_size: int = ASYNC_BATCH_SIZE,
+) -> AsyncIterator[R]:
+    """
+    Apply a blocking function to each item from the event loop, yielding in order.
+
+    The function runs in a dedicated pool of `concurrency` worker threads,
+    so that as many blocking calls (e.g. reads) overlap while the event loop
+    stays responsive. Each worker is handed batches of items, to amortize the
+    cost of the round trips with the event loop. If a call raises, the results
+    of the previous items are yielded, then the exception is propagated.
+
+    :param func: Blocking function to apply
+    :param items: Items to process
+    :param concurrency: Maximum number of calls in flight
+    :param batch_size: Number of items handed to a worker at once
+    :return: Asynchronous iterator over the results, in the same order as the items
+    """
+    loop = asyncio.get_event_loop()
+    items_iter = iter(items)
+    batches = iter(lambda: list(itertools.islice(items_iter, batch_size)), [])
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending: Deque["asyncio.Future[Tuple[List[R], Any]]"] = deque()
+        try:
+            for batch in batches:
+                pending.append(loop.run_in_executor(executor, _map_batch, func, batch))
+                if len(pending) < concurrency:
+                    continue
+                results, exc = await pending.popleft()
+                for result in results:
+                    yield result
+                if exc is not None:
+                    raise exc
+            while pending:
+                results, exc = await pending.popleft()
+                for result in results:
+                    yield result
+                if exc is not None:
+                    raise exc
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def run_coroutine(coroutine: Awaitable[R]) -> R:
+    """
+    Run a coroutine to completion in a new event loop.
+
+    :param coroutine: Coroutine to run
+    :return: Result of the coroutine
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
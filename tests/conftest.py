@@ -1,5 +1,6 @@
 pytest_plugins = [
     "tests.fixtures.sample_notices",
     "tests.fixtures.sample_paths",
+    "tests.fixtures.sample_repos",
     "tests.fixtures.sample_source_files",
 ]
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# mypy: ignore-errors
+
+"""Fixtures to generate sample Git repositories"""
+
+import subprocess
+
+import pytest
+
+
+def git(*args, cwd=None):
+    return subprocess.run(
+        ("git",) + args, cwd=cwd, check=True, stdout=subprocess.PIPE
+    ).stdout.decode()
+
+
+@pytest.fixture
+def git_repo(tmp_path, monkeypatch):
+    repo_path = tmp_path / "repo"
+    repo_path.mkdir()
+    git("init", "-q", cwd=repo_path)
+    git("config", "user.name", "Wile E. Coyote", cwd=repo_path)
+    git("config", "user.email", "wilecoyote@acme.com", cwd=repo_path)
+    git("config", "commit.gpgsign", "false", cwd=repo_path)
+    monkeypatch.chdir(repo_path)
+    yield repo_path
+
+
+def _init_repo(path):
+    path.mkdir()
+    git("init", "-q", cwd=path)
+    git("config", "user.name", "Wile E. Coyote", cwd=path)
+    git("config", "user.email", "wilecoyote@acme.com", cwd=path)
+    git("config", "commit.gpgsign", "false", cwd=path)
+    (path / "README.md").write_text("ACME\n")
+    git("add", "README.md", cwd=path)
+    git("commit", "-q", "-m", "Initial commit", cwd=path)
+
+
+def _add_submodule(url, path, cwd):
+    git(
+        "-c", "protocol.file.allow=always", "submodule", "add", "-q", url, path, cwd=cwd
+    )
+
+
+@pytest.fixture
+def repo_with_submodules(git_repo, tmp_path):
+    """
+    Repository with a submodule at libs/core, itself with a nested submodule
+    at vendor/zlib, and an uninitialized submodule at libs/extra
+    """
+    for name in ("core", "zlib", "extra"):
+        _init_repo(tmp_path / name)
+    _add_submodule(str(tmp_path / "zlib"), "vendor/zlib", tmp_path / "core")
+    git("commit", "-q", "-m", "Add zlib", cwd=tmp_path / "core")
+    (git_repo / "main.py").write_text("print()\n")
+    git("add", "main.py")
+    git("commit", "-q", "-m", "Initial commit")
+    _add_submodule(str(tmp_path / "core"), "libs/core", git_repo)
+    git(
+        "-c",
+        "protocol.file.allow=always",
+        "submodule",
+        "update",
+        "-q",
+        "--init",
+        "--recursive",
+    )
+    _add_submodule(str(tmp_path / "extra"), "libs/extra", git_repo)
+    git("commit", "-q", "-m", "Add submodules")
+    git("submodule", "deinit", "-q", "libs/extra")
+    yield git_repo
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# mypy: ignore-errors
+
+"""
+Test the checks run through the daemon
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from scripts import client
+from scripts import daemon as daemon_module
+from scripts.daemon import Daemon
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="Unix sockets not supported"
+)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    socket_path = str(tmp_path / "daemon.sock")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "scripts.daemon", f"--socket={socket_path}"],
+        cwd=REPO_ROOT,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        if os.path.exists(socket_path):
+            break
+        time.sleep(0.05)
+    yield socket_path
+    process.terminate()
+    process.wait()
+
+
+class TestDaemon:
+    def test_remote_check(
+        self, daemon, tmp_path, monkeypatch, capsys, notice_once_as_file, notice_once
+    ):
+        (tmp_path / "found.py").write_text(notice_once)
+        (tmp_path / "missing.py").write_text("print()\n")
+        monkeypatch.chdir(tmp_path)
+        options = ["--enforce-all", f"--notice={notice_once_as_file}", "--jsonl=-"]
+
+        assert client.run_remote(["found.py", *options], daemon) == 0
+        assert client.run_remote(["found.py", "missing.py", *options], daemon) == 1
+        out, err = capsys.readouterr()
+        assert [json.loads(line)["verdict"] for line in out.splitlines()] == [
+            "found",
+            "found",
+            "missing",
+        ]
+        assert "File missing.py does not contain" in err
+
+    def test_remote_usage_error(self, daemon, capsys):
+        assert client.run_remote(["--bogus"], daemon) == 2
+        assert "copyright-notice: error" in capsys.readouterr().err
+
+    def test_protocol_mismatch(self, daemon, monkeypatch):
+        monkeypatch.setattr(client, "PROTOCOL_VERSION", -1)
+
+        assert client.run_remote(["file.py"], daemon) is None
+
+    def test_no_daemon(self, tmp_path):
+        assert client.run_remote(["file.py"], str(tmp_path / "daemon.sock")) is None
+
+    def test_fallback(self, tmp_path, monkeypatch, notice_once_as_file, notice_once):
+        (tmp_path / "found.py").write_text(notice_once)
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv(client.SOCKET_ENV, str(tmp_path / "daemon.sock"))
+
+        assert client.main(["found.py", "--enforce-all", "--no-cache"]) == 3
+        argv = ["found.py", "--enforce-all", f"--notice={notice_once_as_file}"]
+        assert client.main(argv) == 0
+
+    def test_stale_socket(self, tmp_path):
+        socket_path = str(tmp_path / "daemon.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(socket_path)
+        assert client.run_remote(["file.py"], socket_path) is None
+
+        daemon = Daemon(socket_path, idle_timeout=0.01)
+        daemon.serve()
+        assert not os.path.exists(socket_path)
+
+    def test_already_running(self, daemon):
+        with pytest.raises(RuntimeError):
+            Daemon(daemon)
+
+    def test_unresponsive_daemon(self, tmp_path):
+        socket_path = str(tmp_path / "daemon.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(socket_path)
+            sock.listen()
+            start = time.monotonic()
+            assert (
+                client.run_remote(["file.py"], socket_path, accept_timeout=0.1) is None
+            )
+            assert time.monotonic() - start < 5
+
+    @pytest.mark.parametrize("check_owner", [True, False])
+    def test_daemon_of_other_user(self, daemon, monkeypatch, capsys, check_owner):
+        uid = os.getuid()
+        monkeypatch.setattr(os, "getuid", lambda: uid + 1)
+        if not check_owner:
+            # The daemon is still rejected by the credentials of its process
+            if not hasattr(socket, "SO_PEERCRED"):
+                pytest.skip("SO_PEERCRED not supported")
+            monkeypatch.setattr(client, "_is_own_socket", lambda path: True)
+
+        assert client.run_remote(["--bogus"], daemon) is None
+        assert "copyright-notice: error" not in capsys.readouterr().err
+
+    def test_silent_client(
+        self, tmp_path, monkeypatch, notice_once_as_file, notice_once
+    ):
+        monkeypatch.setattr(daemon_module._RequestHandler, "timeout", 0.1)
+        (tmp_path / "found.py").write_text(notice_once)
+        monkeypatch.chdir(tmp_path)
+        socket_path = str(tmp_path / "daemon.sock")
+        daemon = Daemon(socket_path, idle_timeout=0.5)
+        thread = threading.Thread(target=daemon.serve)
+        # The standard streams of the daemon, in this process, are redirected
+        # while it serves a request: the request does not output anything
+        argv = ["found.py", "--enforce-all", f"--notice={notice_once_as_file}"]
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as silent:
+            silent.connect(socket_path)
+            thread.start()
+            retcode = client.run_remote(argv, socket_path, accept_timeout=2)
+        thread.join()
+        assert retcode == 0
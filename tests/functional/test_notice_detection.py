@@ -5,18 +5,33 @@
 Test the ability of the script to detect copyright notices.
 """
 
+import datetime
 import filecmp
+import io
+import json
 import os
-from unittest.mock import patch
+import sys
+import threading
+import time
+import xml.dom.minidom
+from unittest.mock import ANY, Mock, patch
 
 import pytest
-from scripts.copyright_notice import CopyrightNoticeChecker
+from scripts.copyright_notice import (
+    CopyrightNoticeChecker,
+    FileResult,
+    Verdict,
+    main,
+)
 from scripts.error import (
     CopyrightNoticeParsingError,
     CopyrightNoticeTemplateFileNotFoundError,
     CopyrightNoticeValidationError,
     SourceCodeFileNotFoundError,
 )
+from scripts.stats import CheckStats
+from scripts.util import parse_file_as_bytes, run_coroutine, tracked_files
+from tests.fixtures.sample_repos import git
 
 
 def show_file_and_notice(source_code_filepath, notice_template_filepath):
@@ -75,9 +90,7 @@ class TestNoticeDetection:
             )
 
     def test_validation_error(self, source_code_once_as_file, notice_once_as_file):
-        with patch.object(
-            CopyrightNoticeChecker, "file_contains_valid_notice"
-        ) as mock_fn:
+        with patch.object(CopyrightNoticeChecker, "check_file") as mock_fn:
             mock_fn.side_effect = Exception("intentionally raised from mocked method")
 
             with pytest.raises(CopyrightNoticeValidationError):
@@ -86,3 +99,811 @@ class TestNoticeDetection:
                     notice_path=notice_once_as_file,
                     enforce_all=True,
                 )
+
+    def test_notice_in_header(self, tmp_path, notice_once_as_file, notice_once):
+        source_code_path = tmp_path / "source_code.py"
+        source_code_path.write_text("#!/usr/bin/env python\n" + notice_once)
+        assert CopyrightNoticeChecker.check_files_have_notice(
+            filenames=[source_code_path],
+            notice_path=notice_once_as_file,
+            enforce_all=True,
+            max_header_lines=len(notice_once.splitlines()) + 1,
+        )
+        assert CopyrightNoticeChecker.check_files_have_notice(
+            filenames=[source_code_path],
+            notice_path=notice_once_as_file,
+            enforce_all=True,
+            max_header_bytes=len(notice_once) + 64,
+        )
+
+    def test_notice_not_in_header(self, tmp_path, notice_once_as_file, notice_once):
+        source_code_path = tmp_path / "source_code.py"
+        source_code_path.write_text("\n" * 100 + notice_once)
+        assert not CopyrightNoticeChecker.check_files_have_notice(
+            filenames=[source_code_path],
+            notice_path=notice_once_as_file,
+            enforce_all=True,
+            max_header_lines=50,
+        )
+        result = CopyrightNoticeChecker.check_file(
+            str(source_code_path), notice_once.encode(), max_header_bytes=50
+        )
+        assert result.verdict is Verdict.NOT_IN_HEADER
+
+    @pytest.mark.parametrize(
+        "content, expected",
+        [
+            ("print()\n", Verdict.MISSING),
+            ("print()\n" * 7, Verdict.MISSING),
+            ("print()\n" * 7 + "\n", Verdict.NOT_IN_HEADER),
+        ],
+    )
+    @pytest.mark.parametrize(
+        "header_window", [{"max_header_lines": 7}, {"max_header_bytes": 56}]
+    )
+    def test_notice_missing_in_whole_header(
+        self, tmp_path, notice_once, content, header_window, expected
+    ):
+        source_code_path = tmp_path / "short.py"
+        source_code_path.write_text(content)
+        result = CopyrightNoticeChecker.check_file(
+            str(source_code_path), notice_once.encode(), **header_window
+        )
+        assert result.verdict is expected
+
+    def test_parallel_results_are_ordered(
+        self, tmp_path, notice_once_as_file, notice_once, caplog
+    ):
+        filenames = []
+        for idx in range(50):
+            source_code_path = tmp_path / f"source_code_{idx:02d}.py"
+            source_code_path.write_text(notice_once if idx % 3 else "print()\n")
+            filenames.append(str(source_code_path))
+        assert not CopyrightNoticeChecker.check_files_have_notice(
+            filenames=filenames[::-1],
+            notice_path=notice_once_as_file,
+            enforce_all=True,
+            jobs=8,
+        )
+        expected = [path for idx, path in enumerate(filenames) if idx % 3 == 0]
+        assert [record.args[0] for record in caplog.records] == expected
+
+    def test_cached_results(self, tmp_path, notice_once_as_file, notice_once):
+        source_code_path = tmp_path / "source_code.py"
+        source_code_path.write_text(notice_once)
+        old = time.time() - 3600
+        os.utime(source_code_path, (old, old))
+        options = {
+            "filenames": [str(source_code_path)],
+            "notice_path": notice_once_as_file,
+            "enforce_all": True,
+            "cache_dir": str(tmp_path / "cache"),
+        }
+        assert CopyrightNoticeChecker.check_files_have_notice(**options)
+
+        with patch.object(CopyrightNoticeChecker, "check_file") as mock_fn:
+            assert CopyrightNoticeChecker.check_files_have_notice(**options)
+            mock_fn.assert_not_called()
+
+        source_code_path.write_text("print()\n")
+        os.utime(source_code_path, (old, old + 1))
+        assert not CopyrightNoticeChecker.check_files_have_notice(**options)
+
+    def test_cached_skip_size_limit(self, tmp_path, notice_once_as_file):
+        source_code_path = tmp_path / "source_code.py"
+        source_code_path.write_text("print()\n")
+        old = time.time() - 3600
+        os.utime(source_code_path, (old, old))
+        options = {
+            "filenames": [str(source_code_path)],
+            "notice_path": notice_once_as_file,
+            "enforce_all": True,
+            "cache_dir": str(tmp_path / "cache"),
+        }
+        assert CopyrightNoticeChecker.check_files_have_notice(
+            max_file_size=5, **options
+        )
+        assert not CopyrightNoticeChecker.check_files_have_notice(**options)
+
+    def test_fix_cached_failure(self, git_repo, notice_once_as_file, notice_once):
+        (git_repo / "a.py").write_text("print()\n")
+        old = time.time() - 3600
+        os.utime(git_repo / "a.py", (old, old))
+        argv = ["a.py", f"--notice={notice_once_as_file}", "--enforce-all"]
+
+        assert main(argv) == 1
+        assert (git_repo / ".git" / "copyright-notice-cache").exists()
+        assert main([*argv, "--fix"]) == 1
+        assert (git_repo / "a.py").read_text() == f"{notice_once}print()\n"
+        assert main(argv) == 0
+
+    def test_staged_content(self, git_repo, notice_once_as_file, notice_once):
+        (git_repo / "staged.py").write_text(notice_once)
+        (git_repo / "unstaged.py").write_text("print()\n")
+        git("add", "staged.py", "unstaged.py")
+        (git_repo / "staged.py").write_text("print()\n")
+        (git_repo / "unstaged.py").write_text(notice_once)
+        options = {"notice_path": notice_once_as_file, "staged": True}
+
+        assert CopyrightNoticeChecker.check_files_have_notice(["staged.py"], **options)
+        assert not CopyrightNoticeChecker.check_files_have_notice(
+            ["unstaged.py"], **options
+        )
+        assert not CopyrightNoticeChecker.check_files_have_notice(
+            ["staged.py"], notice_path=notice_once_as_file
+        )
+
+    @pytest.mark.parametrize("filename", ["untracked.py", "my  untracked file.py"])
+    def test_staged_missing_file(self, git_repo, notice_once_as_file, filename):
+        with pytest.raises(SourceCodeFileNotFoundError):
+            CopyrightNoticeChecker.check_files_have_notice(
+                [filename],
+                notice_path=notice_once_as_file,
+                enforce_all=True,
+                staged=True,
+            )
+
+    def test_multiple_notices(self, tmp_path, caplog):
+        notice_paths = []
+        for idx, text in enumerate(("Copyright (C) Foo", "Copyright (C) Bar")):
+            notice_paths.append(tmp_path / f"notice_{idx}.txt")
+            notice_paths[-1].write_text(text)
+        filenames = []
+        for idx, text in enumerate(("Copyright (C) Bar", "Copyright (C) Baz")):
+            filenames.append(tmp_path / f"source_code_{idx}.py")
+            filenames[-1].write_text(f"# {text}\nprint()\n")
+
+        assert CopyrightNoticeChecker.check_files_have_notice(
+            filenames=filenames[:1], notice_path=notice_paths, enforce_all=True
+        )
+        assert not CopyrightNoticeChecker.check_files_have_notice(
+            filenames=filenames, notice_path=notice_paths, enforce_all=True
+        )
+        assert [record.args[0] for record in caplog.records] == [filenames[1]]
+
+        result = CopyrightNoticeChecker.check_file(
+            str(filenames[0]), CopyrightNoticeChecker.load_notices(notice_paths)
+        )
+        assert result == FileResult(
+            str(filenames[0]), Verdict.FOUND, 2, str(notice_paths[1])
+        )
+
+    @pytest.mark.parametrize(
+        "year_policy, year_offset, expected",
+        [
+            ("any", -10, True),
+            ("current", -1, False),
+            ("current", 0, True),
+            ("creation", -1, False),
+            ("creation", 0, True),
+        ],
+    )
+    def test_year_policy(self, git_repo, year_policy, year_offset, expected):
+        year = datetime.date.today().year + year_offset
+        notice_path = git_repo / "notice.txt"
+        notice_path.write_text("Copyright (C) {year_range} {holder}")
+        (git_repo / "source_code.py").write_text(f"# Copyright (C) {year} ACME\n")
+        git("add", "source_code.py")
+        git("commit", "-q", "-m", "Add source code")
+
+        assert (
+            CopyrightNoticeChecker.check_files_have_notice(
+                filenames=["source_code.py"],
+                notice_path=notice_path,
+                enforce_all=True,
+                placeholders=True,
+                year_policy=year_policy,
+            )
+            == expected
+        )
+
+    @pytest.mark.parametrize("header_window", [{}, {"max_header_lines": 10}])
+    def test_fix(self, tmp_path, notice_once_as_file, notice_once, header_window):
+        with_notice_path = tmp_path / "with_notice.py"
+        with_notice_path.write_text(f"#!/usr/bin/env python\n{notice_once}print()\n")
+        without_notice_path = tmp_path / "without_notice.py"
+        without_notice_path.write_text("#!/usr/bin/env python\nprint()\n")
+        options = {
+            "filenames": [with_notice_path, without_notice_path],
+            "notice_path": notice_once_as_file,
+            "enforce_all": True,
+            **header_window,
+        }
+
+        assert not CopyrightNoticeChecker.check_files_have_notice(**options, fix=True)
+        assert without_notice_path.read_text() == with_notice_path.read_text()
+        assert CopyrightNoticeChecker.check_files_have_notice(**options)
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_fix_placeholders(self, tmp_path):
+        notice_path = tmp_path / "notice.txt"
+        notice_path.write_text("# Copyright (C) {year} ACME Inc")
+        source_code_path = tmp_path / "source_code.py"
+        source_code_path.write_text("print()\n")
+        options = {
+            "filenames": [source_code_path],
+            "notice_path": notice_path,
+            "enforce_all": True,
+            "placeholders": True,
+        }
+
+        assert not CopyrightNoticeChecker.check_files_have_notice(**options, fix=True)
+        year = datetime.date.today().year
+        assert source_code_path.read_text() == (
+            f"# Copyright (C) {year} ACME Inc\nprint()\n"
+        )
+        assert CopyrightNoticeChecker.check_files_have_notice(**options)
+
+        notice_path.write_text("# Copyright (C) {year} {holder}")
+        with pytest.raises(CopyrightNoticeParsingError):
+            CopyrightNoticeChecker.check_files_have_notice(**options, fix=True)
+
+    def test_tracked_files_stream(self, git_repo, notice_once_as_file, notice_once):
+        (git_repo / "vendor").mkdir()
+        (git_repo / "with_notice.py").write_text(notice_once)
+        (git_repo / "without_notice.txt").write_text("nothing here")
+        (git_repo / "vendor" / "without_notice.py").write_text("print()\n")
+        git("add", ".")
+        options = {"notice_path": notice_once_as_file, "enforce_all": True}
+
+        assert not CopyrightNoticeChecker.check_files_have_notice(
+            tracked_files(), **options
+        )
+        assert CopyrightNoticeChecker.check_files_have_notice(
+            tracked_files(), include=["*.py"], exclude=["vendor/*"], **options
+        )
+
+    @pytest.mark.parametrize("staged", [False, True])
+    def test_skipped_files(self, git_repo, notice_once_as_file, caplog, staged):
+        (git_repo / "__init__.py").write_bytes(b"")
+        (git_repo / "image.png").write_bytes(b"\x89PNG\r\n\x1a\n\0\0\0\rIHDR")
+        (git_repo / "data.bin").write_bytes(
+            b"version https://git-lfs.github.com/spec/v1\noid sha256:0\nsize 1\n"
+        )
+        (git_repo / "large.py").write_bytes(b"print()\n" * 1000)
+        filenames = ["__init__.py", "image.png", "data.bin", "large.py"]
+        git("add", *filenames)
+
+        assert CopyrightNoticeChecker.check_files_have_notice(
+            filenames,
+            notice_path=notice_once_as_file,
+            enforce_all=True,
+            staged=staged,
+            max_file_size=1000,
+        )
+        assert caplog.messages == [
+            "Skipped 4 files: 1 empty, 1 binary, 1 lfs-pointer, 1 oversized."
+        ]
+
+    def test_stats(self, tmp_path, notice_once_as_file, notice_once):
+        filenames = []
+        for idx in range(3):
+            filenames.append(str(tmp_path / f"notice{idx}.py"))
+            (tmp_path / f"notice{idx}.py").write_text(notice_once)
+        filenames.append(str(tmp_path / "missing.py"))
+        (tmp_path / "missing.py").write_text("print()\n")
+        filenames.append(str(tmp_path / "__init__.py"))
+        (tmp_path / "__init__.py").write_text("")
+        stats = CheckStats(slowest=2)
+
+        assert not CopyrightNoticeChecker.check_files_have_notice(
+            filenames, notice_once_as_file, enforce_all=True, stats=stats
+        )
+        assert {"load_notices", "select", "stat", "read", "search", "check"} <= set(
+            stats.phases
+        )
+        assert stats.counters == {
+            "files": 5,
+            "found": 3,
+            "missing": 1,
+            "skipped": 1,
+            "skipped:empty": 1,
+            "bytes_scanned": 3 * len(notice_once.encode()) + len("print()\n"),
+        }
+        assert len(stats.slowest_files) == 2
+        assert {path for path, _ in stats.slowest_files} <= set(filenames)
+
+    def test_stats_cached(self, tmp_path, notice_once_as_file, notice_once):
+        source_code_path = tmp_path / "source_code.py"
+        source_code_path.write_text(notice_once)
+        old = time.time() - 3600
+        os.utime(source_code_path, (old, old))
+        options = {
+            "filenames": [str(source_code_path)],
+            "notice_path": notice_once_as_file,
+            "enforce_all": True,
+            "cache_dir": str(tmp_path / "cache"),
+        }
+        CopyrightNoticeChecker.check_files_have_notice(**options)
+        stats = CheckStats()
+
+        assert CopyrightNoticeChecker.check_files_have_notice(**options, stats=stats)
+        assert stats.counters == {"files": 1, "found": 1, "cached": 1}
+        assert {"cache_load", "cache_save"} <= set(stats.phases)
+
+    def test_reports(self, tmp_path, notice_once_as_file, notice_once, capsys):
+        (tmp_path / "found.py").write_text(notice_once)
+        (tmp_path / "missing.py").write_text("print()\n")
+        (tmp_path / "__init__.py").write_text("")
+        filenames = [str(tmp_path / name) for name in ("found.py", "missing.py")]
+        filenames.append(str(tmp_path / "__init__.py"))
+        sarif_path = tmp_path / "report.sarif"
+        options = ["--enforce-all", "--no-cache", f"--notice={notice_once_as_file}"]
+        options += ["--jsonl=-", f"--sarif={sarif_path}"]
+
+        assert main([*filenames, *options]) == 1
+        lines = capsys.readouterr().out.splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {
+                "path": filenames[2],
+                "verdict": "skipped",
+                "template": None,
+                "offset": -1,
+                "year": None,
+                "reason": "empty",
+                "near_miss": None,
+            },
+            {
+                "path": filenames[0],
+                "verdict": "found",
+                "template": str(notice_once_as_file),
+                "offset": 0,
+                "year": None,
+                "reason": None,
+                "near_miss": None,
+            },
+            {
+                "path": filenames[1],
+                "verdict": "missing",
+                "template": None,
+                "offset": -1,
+                "year": None,
+                "reason": None,
+                "near_miss": None,
+            },
+        ]
+        (run,) = json.loads(sarif_path.read_text())["runs"]
+        assert [result["ruleId"] for result in run["results"]] == ["missing"]
+        assert run["invocations"] == [{"executionSuccessful": True}]
+
+    def test_reports_on_error(self, tmp_path, capsys):
+        sarif_path = tmp_path / "report.sarif"
+        options = ["--enforce-all", f"--notice={tmp_path / 'notice.txt'}"]
+
+        assert main(["file.py", *options, f"--sarif={sarif_path}"]) == 3
+        (run,) = json.loads(sarif_path.read_text())["runs"]
+        assert run["results"] == []
+        assert run["invocations"] == [{"executionSuccessful": False}]
+
+    @pytest.mark.parametrize("concurrency", [1, 4])
+    def test_async_check(
+        self, tmp_path, notice_once_as_file, notice_once, caplog, concurrency
+    ):
+        filenames = []
+        for idx in range(20):
+            source_code_path = tmp_path / f"file{idx:02d}.py"
+            source_code_path.write_text(notice_once if idx % 3 else "print()\n")
+            filenames.append(str(source_code_path))
+        stats = CheckStats()
+
+        assert not run_coroutine(
+            CopyrightNoticeChecker.check_files_have_notice_async(
+                reversed(filenames),
+                notice_once_as_file,
+                concurrency=concurrency,
+                enforce_all=True,
+                stats=stats,
+            )
+        )
+        missing = [path for idx, path in enumerate(filenames) if not idx % 3]
+        assert caplog.messages == [
+            f"File {path} does not contain a valid copyright notice."
+            for path in reversed(missing)
+        ]
+        assert stats.counters["files"] == 20
+        assert stats.counters["missing"] == len(missing)
+
+    def test_async_check_error(self, tmp_path, notice_once_as_file):
+        with pytest.raises(SourceCodeFileNotFoundError):
+            run_coroutine(
+                CopyrightNoticeChecker.check_files_have_notice_async(
+                    [str(tmp_path / "missing.py")],
+                    notice_once_as_file,
+                    enforce_all=True,
+                )
+            )
+
+    def test_async_retcode(self, tmp_path, notice_once_as_file, notice_once):
+        (tmp_path / "found.py").write_text(notice_once)
+
+        assert (
+            CopyrightNoticeChecker.check_files_have_notice_with_retcode(
+                [str(tmp_path / "found.py")],
+                notice_once_as_file,
+                enforce_all=True,
+                jobs=None,
+                io_concurrency=8,
+            )
+            == 0
+        )
+
+    def test_notice_config(self, tmp_path, caplog):
+        notices = {}
+        for name in ("default", "third_party", "oss"):
+            notices[name] = tmp_path / "notices" / f"{name}.txt"
+            notices[name].parent.mkdir(exist_ok=True)
+            notices[name].write_text(f"Copyright (C) {name}")
+        config_path = tmp_path / "setup.cfg"
+        config_path.write_text(
+            "[tool:copyright-notice]\n"
+            "* = notices/default.txt\n"
+            "third_party/ = notices/third_party.txt\n"
+            "projects/*/oss = notices/oss.txt notices/default.txt\n"
+        )
+        expected = {
+            "main.py": ("default", Verdict.FOUND),
+            "lib/util.py": ("default", Verdict.FOUND),
+            "third_party/lib.py": ("third_party", Verdict.FOUND),
+            "third_party/vendored.py": ("default", Verdict.MISSING),
+            "projects/a/oss/main.py": ("oss", Verdict.FOUND),
+            "projects/b/oss/main.py": ("default", Verdict.FOUND),
+            "projects/b/main.py": ("oss", Verdict.MISSING),
+        }
+        filenames = []
+        for path, (name, _) in expected.items():
+            filenames.append(tmp_path / path)
+            filenames[-1].parent.mkdir(parents=True, exist_ok=True)
+            filenames[-1].write_text(f"# Copyright (C) {name}\nprint()\n")
+        reporter = Mock()
+
+        with patch(
+            "scripts.copyright_notice.parse_file_as_bytes",
+            wraps=parse_file_as_bytes,
+        ) as mock_parse:
+            assert not CopyrightNoticeChecker.check_files_have_notice(
+                filenames,
+                "missing.txt",
+                enforce_all=True,
+                notice_config=str(config_path),
+                reporters=[reporter],
+            )
+        assert sorted(call[0][0] for call in mock_parse.call_args_list) == sorted(
+            str(path) for path in notices.values()
+        )
+        verdicts = {
+            call[0][0].path: call[0][0].verdict
+            for call in reporter.report.call_args_list
+        }
+        assert verdicts == {
+            tmp_path / path: verdict for path, (_, verdict) in expected.items()
+        }
+
+    def test_notice_config_fallback(self, tmp_path, notice_once_as_file, notice_once):
+        (tmp_path / "oss.txt").write_text("Copyright (C) oss")
+        (tmp_path / "setup.cfg").write_text("[tool:copyright-notice]\noss = oss.txt\n")
+        (tmp_path / "main.py").write_text(notice_once)
+
+        assert CopyrightNoticeChecker.check_files_have_notice(
+            [str(tmp_path / "main.py")],
+            notice_once_as_file,
+            enforce_all=True,
+            notice_config=str(tmp_path / "setup.cfg"),
+        )
+
+    @pytest.mark.parametrize(
+        "content", [None, "[metadata]\nname = foo\n", "[tool:copyright-notice]\n* =\n"]
+    )
+    def test_invalid_notice_config(self, tmp_path, notice_once_as_file, content):
+        config_path = tmp_path / "setup.cfg"
+        if content is not None:
+            config_path.write_text(content)
+
+        with pytest.raises(CopyrightNoticeParsingError):
+            CopyrightNoticeChecker.check_files_have_notice(
+                [],
+                notice_once_as_file,
+                enforce_all=True,
+                notice_config=str(config_path),
+            )
+
+    @pytest.mark.parametrize(
+        "encoding, bom",
+        [
+            ("utf-8", "\ufeff"),
+            ("utf-16-le", "\ufeff"),
+            ("utf-16-be", "\ufeff"),
+            ("utf-16-le", ""),
+            ("latin-1", ""),
+        ],
+    )
+    def test_encodings(self, tmp_path, encoding, bom):
+        notice_path = tmp_path / "notice.txt"
+        notice_path.write_bytes("Copyright © ACME".encode())
+        found, missing = tmp_path / "found.rc", tmp_path / "missing.rc"
+        found.write_bytes(f"{bom}// Copyright © ACME\r\n".encode(encoding))
+        missing.write_bytes(f"{bom}// Copyright ACME é\r\n".encode(encoding))
+        filenames = [str(found), str(missing)]
+
+        for path in filenames:
+            result = CopyrightNoticeChecker.check_file(
+                path, CopyrightNoticeChecker.load_notices(notice_path)
+            )
+            assert result.verdict is (
+                Verdict.FOUND if path == str(found) else Verdict.MISSING
+            )
+        assert not CopyrightNoticeChecker.check_files_have_notice(
+            filenames, notice_path, enforce_all=True, fix=True
+        )
+        assert CopyrightNoticeChecker.check_files_have_notice(
+            filenames, notice_path, enforce_all=True
+        )
+        assert (
+            missing.read_bytes()
+            .decode(encoding)
+            .startswith(f"{bom}Copyright © ACME\r\n// ")
+        )
+
+    @pytest.mark.parametrize(
+        "options, expected",
+        [
+            ([], 0),
+            (["--check-modified"], 1),
+            (["--to-ref=HEAD~1", "--check-modified"], 0),
+        ],
+    )
+    def test_ref_range(
+        self,
+        git_repo,
+        tmp_path,
+        monkeypatch,
+        notice_once_as_file,
+        notice_once,
+        caplog,
+        options,
+        expected,
+    ):
+        (git_repo / "modified.py").write_text(notice_once)
+        git("add", ".")
+        git("commit", "-q", "-m", "Base")
+        (git_repo / "added.py").write_text(notice_once)
+        git("add", ".")
+        git("commit", "-q", "-m", "Add")
+        (git_repo / "modified.py").write_text("print()\n")
+        git("add", ".")
+        git("commit", "-q", "-m", "Modify")
+        git("clone", "-q", "--bare", str(git_repo), str(tmp_path / "bare.git"))
+        monkeypatch.chdir(tmp_path / "bare.git")
+
+        argv = ["--from-ref=HEAD~2", f"--notice={notice_once_as_file}", *options]
+        assert main(argv) == expected
+        if expected:
+            assert caplog.messages == [
+                "File modified.py does not contain a valid copyright notice."
+            ]
+
+    @pytest.mark.parametrize("jobs", [1, 4])
+    def test_checker_instance(self, tmp_path, notice_once_as_file, notice_once, jobs):
+        filenames = []
+        for idx in range(10):
+            filenames.append(str(tmp_path / f"source_code_{idx}.py"))
+            with open(filenames[-1], "w") as f_src:
+                f_src.write(notice_once if idx % 3 else "print()\n")
+        stats = CheckStats()
+
+        with patch(
+            "scripts.copyright_notice.parse_file_as_bytes",
+            wraps=parse_file_as_bytes,
+        ) as mock_parse, patch(
+            "scripts.copyright_notice.added_files", return_value=set(filenames[1:])
+        ) as mock_added, CopyrightNoticeChecker(
+            notice_once_as_file, jobs=jobs, stats=stats
+        ) as checker:
+            results = checker.iter_results(filenames)
+            assert next(results) == FileResult(filenames[1], Verdict.FOUND, 0, ANY)
+            results.close()
+            assert not checker.check_files(filenames)
+            assert checker.check_files(filenames[1:3])
+            assert [result.verdict for result in checker.iter_results(filenames)] == [
+                Verdict.FOUND if idx % 3 else Verdict.MISSING for idx in range(1, 10)
+            ]
+        mock_parse.assert_called_once()
+        mock_added.assert_called_once()
+        assert stats.counters["files"] == 1 + 9 + 2 + 9
+
+    def test_checker_instance_error(self, tmp_path, notice_once_as_file):
+        with CopyrightNoticeChecker(notice_once_as_file, enforce_all=True) as checker:
+            with pytest.raises(SourceCodeFileNotFoundError):
+                checker.check_files([str(tmp_path / "missing.py")])
+            (tmp_path / "empty.py").touch()
+            assert checker.check_files([str(tmp_path / "empty.py")])
+
+    def test_shards(self, tmp_path, notice_once_as_file, notice_once, caplog):
+        filenames = []
+        for idx in range(30):
+            filenames.append(str(tmp_path / f"source_code_{idx}.py"))
+            with open(filenames[-1], "w") as f_src:
+                f_src.write("print()\n" if idx % 3 else notice_once)
+        options = {"notice_path": notice_once_as_file, "enforce_all": True}
+
+        has_notice = [
+            CopyrightNoticeChecker.check_files_have_notice(
+                filenames, shard=(index, 3), **options
+            )
+            for index in range(1, 4)
+        ]
+        warned = sorted(record.args[0] for record in caplog.records)
+        assert warned == sorted(path for idx, path in enumerate(filenames) if idx % 3)
+        assert not all(has_notice)
+
+    @pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="Named pipes are Unix-only")
+    def test_named_pipe(self, tmp_path, notice_once_as_file, notice_once):
+        fifo_path = str(tmp_path / "source_code.py")
+        os.mkfifo(fifo_path)
+
+        def write():
+            with open(fifo_path, "w") as f_fifo:
+                f_fifo.write("x\n" * 1024 * 1024 + notice_once)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            assert CopyrightNoticeChecker.check_files_have_notice(
+                [fifo_path], notice_once_as_file, enforce_all=True
+            )
+        finally:
+            writer.join()
+
+    def test_mmap_failure(self, tmp_path, notice_once_as_file, notice_once):
+        with_notice_path = tmp_path / "with_notice.py"
+        with_notice_path.write_text(f"#!/usr/bin/env python\n{notice_once}print()\n")
+        without_notice_path = tmp_path / "without_notice.py"
+        without_notice_path.write_text("#!/usr/bin/env python\nprint()\n")
+        options = {
+            "filenames": [str(with_notice_path), str(without_notice_path)],
+            "notice_path": notice_once_as_file,
+            "enforce_all": True,
+        }
+
+        with patch("scripts.copyright_notice.mmap.mmap", side_effect=OSError):
+            assert not CopyrightNoticeChecker.check_files_have_notice(
+                **options, fix=True
+            )
+            assert without_notice_path.read_text() == with_notice_path.read_text()
+            assert CopyrightNoticeChecker.check_files_have_notice(**options)
+
+    @pytest.mark.parametrize("has_notice", [True, False])
+    def test_stdin(self, git_repo, notice_once, monkeypatch, caplog, has_notice):
+        (git_repo / "copyright.txt").write_text(notice_once)
+        content = f"{notice_once if has_notice else ''}print()\n"
+        monkeypatch.setattr(
+            sys, "stdin", io.TextIOWrapper(io.BytesIO(content.encode()))
+        )
+
+        # Checked although not staged
+        assert main(["-", "--jsonl=report.jsonl"]) == (0 if has_notice else 1)
+        report = json.loads((git_repo / "report.jsonl").read_text())
+        assert report["path"] == "-"
+        assert report["verdict"] == ("found" if has_notice else "missing")
+
+    def test_comment_styles(self, tmp_path, caplog):
+        notice_path = tmp_path / "notice.txt"
+        notice_path.write_text("Copyright (C) ACME Inc\nAll Rights Reserved\n")
+        contents = {
+            "main.py": "# Copyright (C) ACME Inc\n# All Rights Reserved\nprint()\n",
+            "main.c": "/*\n * Copyright (C) ACME Inc\n * All Rights Reserved\n */\n",
+            "schema.sql": "-- Copyright (C) ACME Inc\n-- All Rights Reserved\n",
+            "view.jsx": "// Copyright (C) ACME Inc\n// All Rights Reserved\n",
+            "notes.txt": "Copyright (C) ACME Inc\nAll Rights Reserved\n",
+            # Commented in the syntax of another language
+            "lib.rs": "# Copyright (C) ACME Inc\n# All Rights Reserved\n",
+        }
+        for name, content in contents.items():
+            (tmp_path / name).write_text(content)
+        filenames = [str(tmp_path / name) for name in contents]
+        options = {"notice_path": str(notice_path), "enforce_all": True}
+
+        assert not CopyrightNoticeChecker.check_files_have_notice(
+            filenames, comment_styles={".jsx": "slash"}, **options
+        )
+        assert [record.args[0] for record in caplog.records] == [
+            str(tmp_path / "lib.rs")
+        ]
+        assert not CopyrightNoticeChecker.check_files_have_notice(
+            filenames[:-1], **options
+        )
+
+        (tmp_path / "lib.rs").write_text("fn main() {}\n")
+        assert not CopyrightNoticeChecker.check_files_have_notice(
+            filenames, comment_styles={}, fix=True, **options
+        )
+        assert (tmp_path / "lib.rs").read_text() == (
+            "// Copyright (C) ACME Inc\n// All Rights Reserved\nfn main() {}\n"
+        )
+
+    def test_fix_xml_declaration(self, tmp_path):
+        notice_path = tmp_path / "notice.txt"
+        notice_path.write_text("Copyright (C) ACME Inc\n")
+        source_path = tmp_path / "icon.svg"
+        source_path.write_text('<?xml version="1.0" encoding="UTF-8"?>\n<svg/>\n')
+
+        assert not CopyrightNoticeChecker.check_files_have_notice(
+            [str(source_path)],
+            notice_path=str(notice_path),
+            enforce_all=True,
+            comment_styles={},
+            fix=True,
+        )
+        assert source_path.read_text() == (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            "<!--\nCopyright (C) ACME Inc\n-->\n<svg/>\n"
+        )
+        assert xml.dom.minidom.parse(str(source_path)).documentElement.tagName == "svg"
+
+    def test_recurse_submodules(self, repo_with_submodules, notice_once, caplog):
+        (repo_with_submodules / "copyright.txt").write_text(notice_once)
+        (repo_with_submodules / "added.py").write_text(notice_once)
+        git("add", "added.py")
+        core = repo_with_submodules / "libs" / "core"
+        (core / "with_notice.py").write_text(notice_once)
+        (core / "vendor" / "zlib" / "without_notice.py").write_text("print()\n")
+        git("add", "with_notice.py", cwd=core)
+        git("add", "without_notice.py", cwd=core / "vendor" / "zlib")
+
+        # As run by pre-commit, with the files of the superproject only: the
+        # files of the submodules are not added to each batch of files
+        assert main(["added.py", "libs/core"]) == 0
+        assert main(["--recurse-submodules", "added.py", "libs/core"]) == 0
+        assert caplog.messages == []
+        without_notice = "libs/core/vendor/zlib/without_notice.py"
+        assert main([without_notice]) == 0
+        assert main(["--recurse-submodules", without_notice]) == 1
+
+        # As run by pre-commit once, without files
+        caplog.clear()
+        (repo_with_submodules / "added.py").write_text("print()\n")
+        assert main(["--recurse-submodules"]) == 1
+        assert caplog.messages == [
+            "File added.py does not contain a valid copyright notice.",
+            f"File {without_notice} does not contain a valid copyright notice.",
+        ]
+
+        caplog.clear()
+        assert main(["--recurse-submodules", "--all-tracked"]) == 1
+        failing = [record.args[0] for record in caplog.records]
+        assert "libs/core/vendor/zlib/README.md" in failing
+        assert "libs/core/with_notice.py" not in failing
+
+    @pytest.mark.parametrize("staged", [False, True])
+    def test_near_miss(self, git_repo, caplog, staged):
+        (git_repo / "copyright.txt").write_text("# Copyright (C) 2021 ACME Inc\n")
+        (git_repo / "stale.py").write_text(
+            "#!/usr/bin/env python\n# Copyright (C) 2019 ACME Inc\nprint()\n"
+        )
+        (git_repo / "unrelated.py").write_text("print()\n")
+        (git_repo / "valid.py").write_text("# Copyright (C) 2021 ACME Inc\n")
+        git("add", "stale.py", "unrelated.py", "valid.py")
+        argv = ["--near-miss", "--jsonl=report.jsonl", "stale.py", "unrelated.py"]
+        argv += ["valid.py"] + (["--staged"] if staged else [])
+
+        # Failing results are not cached, to report their near misses again
+        for _ in range(2):
+            caplog.clear()
+            assert main(argv) == 1
+            assert caplog.messages == [
+                "File stale.py does not contain a valid copyright notice.",
+                "Closest notice (copyright.txt) at line 2, 2 edit(s) away:\n"
+                "--- expected\n+++ found\n@@ -1 +1 @@\n"
+                "-# Copyright (C) 2021 ACME Inc\n+# Copyright (C) 2019 ACME Inc",
+                "File unrelated.py does not contain a valid copyright notice.",
+            ]
+        report = [
+            json.loads(line)
+            for line in (git_repo / "report.jsonl").read_text().splitlines()
+        ]
+        assert [
+            entry["near_miss"] and entry["near_miss"]["line"] for entry in report
+        ] == [
+            2,
+            None,
+            None,
+        ]
@@ -4,12 +4,47 @@
 """
 Test command-line options parsing
 """
+
 import os
 import shlex
 from typing import List, Sequence
-from unittest.mock import patch
+from unittest.mock import ANY, patch
+
+import pytest
+from scripts.cache import DEFAULT_MAX_ENTRIES
+from scripts.copyright_notice import (
+    DEFAULT_NEAR_MISS_RATIO,
+    CopyrightNoticeChecker,
+    main,
+)
+
+DEFAULT_CACHE_DIR = os.path.join(".git", "copyright-notice-cache")
 
-from scripts.copyright_notice import CopyrightNoticeChecker, main
+DEFAULT_OPTIONS = {
+    "enforce_all": False,
+    "include": [],
+    "exclude": [],
+    "max_header_bytes": None,
+    "max_header_lines": None,
+    "jobs": None,
+    "io_concurrency": None,
+    "cache_dir": DEFAULT_CACHE_DIR,
+    "cache_max_entries": DEFAULT_MAX_ENTRIES,
+    "staged": False,
+    "tolerant_whitespace": False,
+    "placeholders": False,
+    "year_policy": "any",
+    "fix": False,
+    "max_file_size": None,
+    "stats": None,
+    "reporters": [],
+    "notice_config": None,
+    "blobs": None,
+    "shard": None,
+    "comment_styles": None,
+    "recurse_submodules": False,
+    "near_miss": None,
+}
 
 
 class TestCmdline:
@@ -32,8 +67,11 @@ class TestCmdline:
 
         with patch.object(
             CopyrightNoticeChecker, "check_files_have_notice_with_retcode"
-        ) as mock_fn:
+        ) as mock_fn, patch(
+            "scripts.copyright_notice.default_cache_dir"
+        ) as mock_cache_dir_fn:
             mock_fn.return_value = 0
+            mock_cache_dir_fn.return_value = DEFAULT_CACHE_DIR
 
             main(args)
 
@@ -46,8 +84,8 @@ class TestCmdline:
             file_paths,
             options,
             list(file_paths),
-            "copyright.txt",
-            enforce_all=False,
+            ["copyright.txt"],
+            **DEFAULT_OPTIONS,
         )
 
     def test_with_notice(self, file_paths):
@@ -58,8 +96,8 @@ class TestCmdline:
             file_paths,
             options,
             list(file_paths),
-            notice_file,
-            enforce_all=False,
+            [notice_file],
+            **DEFAULT_OPTIONS,
         )
 
     def test_with_enforce_all(self, file_paths):
@@ -69,6 +107,325 @@ class TestCmdline:
             file_paths,
             options,
             list(file_paths),
-            "copyright.txt",
-            enforce_all=True,
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "enforce_all": True},
+        )
+
+    def test_with_header_window(self, file_paths):
+        options = ["--max-header-bytes=4096", "--max-header-lines", "20"]
+
+        TestCmdline._test_call(
+            file_paths,
+            options,
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "max_header_bytes": 4096, "max_header_lines": 20},
+        )
+
+    def test_with_jobs(self, file_paths):
+        options = ["--jobs=3"]
+
+        TestCmdline._test_call(
+            file_paths,
+            options,
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "jobs": 3},
+        )
+
+    def test_with_cache_options(self, file_paths):
+        options = ["--cache-dir=/tmp/cache", "--cache-max-entries=10"]
+
+        TestCmdline._test_call(
+            file_paths,
+            options,
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "cache_dir": "/tmp/cache", "cache_max_entries": 10},
+        )
+
+    def test_with_no_cache(self, file_paths):
+        options = ["--no-cache", "--cache-dir=/tmp/cache"]
+
+        TestCmdline._test_call(
+            file_paths,
+            options,
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "cache_dir": None},
+        )
+
+    def test_with_staged(self, file_paths):
+        options = ["--staged"]
+
+        TestCmdline._test_call(
+            file_paths,
+            options,
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "staged": True},
+        )
+
+    def test_with_multiple_notices(self, file_paths):
+        options = ["--notice=a.txt", "--notice", "b.txt"]
+
+        TestCmdline._test_call(
+            file_paths,
+            options,
+            list(file_paths),
+            ["a.txt", "b.txt"],
+            **DEFAULT_OPTIONS,
+        )
+
+    def test_with_tolerant_whitespace(self, file_paths):
+        options = ["--tolerant-whitespace"]
+
+        TestCmdline._test_call(
+            file_paths,
+            options,
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "tolerant_whitespace": True},
+        )
+
+    def test_with_placeholders(self, file_paths):
+        options = ["--placeholders", "--year-policy=creation"]
+
+        TestCmdline._test_call(
+            file_paths,
+            options,
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "placeholders": True, "year_policy": "creation"},
+        )
+
+    def test_with_fix(self, file_paths):
+        options = ["--fix"]
+
+        TestCmdline._test_call(
+            file_paths,
+            options,
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "fix": True},
+        )
+
+    def test_with_fix_and_staged(self, file_paths):
+        with pytest.raises(SystemExit):
+            main(TestCmdline._build_cmd(file_paths, ["--fix", "--staged"]))
+
+    def test_with_include_exclude(self, file_paths):
+        options = ["--include=*.py", "--include", "*.txt", "--exclude=home/*"]
+
+        TestCmdline._test_call(
+            file_paths,
+            options,
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "include": ["*.py", "*.txt"], "exclude": ["home/*"]},
+        )
+
+    def test_with_all_tracked(self):
+        tracked = iter(["a.py", "b.py"])
+        with patch("scripts.copyright_notice.tracked_files") as mock_tracked_fn:
+            mock_tracked_fn.return_value = tracked
+            TestCmdline._test_call(
+                [],
+                ["--all-tracked"],
+                tracked,
+                ["copyright.txt"],
+                **{**DEFAULT_OPTIONS, "enforce_all": True},
+            )
+
+    def test_with_max_file_size(self, file_paths):
+        options = ["--max-file-size=1000000"]
+
+        TestCmdline._test_call(
+            file_paths,
+            options,
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "max_file_size": 1000000},
+        )
+
+    @pytest.mark.parametrize(
+        "options, expected",
+        [(["--stats"], "Phases"), (["--stats", "--stats-format=json"], '"phases"')],
+    )
+    def test_with_stats(self, file_paths, capsys, options, expected):
+        TestCmdline._test_call(
+            file_paths,
+            options,
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "stats": ANY},
+        )
+        assert expected in capsys.readouterr().out
+
+    def test_with_stats_and_report_to_stdout(self, file_paths, capsys):
+        with patch("scripts.copyright_notice.JsonLinesReporter"):
+            TestCmdline._test_call(
+                file_paths,
+                ["--stats", "--jsonl=-"],
+                list(file_paths),
+                ["copyright.txt"],
+                **{**DEFAULT_OPTIONS, "stats": ANY, "reporters": ANY},
+            )
+        captured = capsys.readouterr()
+        assert "Phases" in captured.err
+        assert "Phases" not in captured.out
+
+    def test_reports_both_to_stdout(self, file_paths):
+        with pytest.raises(SystemExit):
+            main(["--jsonl=-", "--sarif=-", *file_paths])
+
+    def test_with_reports(self, file_paths, tmp_path):
+        options = ["--jsonl=-", f"--sarif={tmp_path / 'report.sarif'}"]
+
+        with patch("scripts.copyright_notice.JsonLinesReporter") as mock_jsonl, patch(
+            "scripts.copyright_notice.SarifReporter"
+        ) as mock_sarif:
+            TestCmdline._test_call(
+                file_paths,
+                options,
+                list(file_paths),
+                ["copyright.txt"],
+                **{
+                    **DEFAULT_OPTIONS,
+                    "reporters": [mock_jsonl.return_value, mock_sarif.return_value],
+                },
+            )
+            mock_jsonl.return_value.close.assert_called_once_with(successful=True)
+            mock_sarif.return_value.close.assert_called_once_with(successful=True)
+
+    def test_with_io_concurrency(self, file_paths):
+        TestCmdline._test_call(
+            file_paths,
+            ["--io-concurrency=128"],
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "io_concurrency": 128},
+        )
+
+    def test_io_concurrency_with_jobs(self, file_paths):
+        with pytest.raises(SystemExit):
+            main(["--io-concurrency=128", "--jobs=4", *file_paths])
+
+    def test_with_notice_config(self, file_paths):
+        TestCmdline._test_call(
+            file_paths,
+            ["--notice-config=setup.cfg"],
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "notice_config": "setup.cfg"},
+        )
+
+    @pytest.mark.parametrize(
+        "options, expected_args",
+        [
+            (["--from-ref=main"], ("main", "HEAD", False)),
+            (
+                ["--from-ref=main", "--to-ref=pr", "--check-modified"],
+                ("main", "pr", True),
+            ),
+        ],
+    )
+    def test_with_from_ref(self, options, expected_args):
+        blobs = {"a.py": "1" * 40, "b.py": "2" * 40}
+        with patch("scripts.copyright_notice.changed_files") as mock_changed_fn:
+            mock_changed_fn.return_value = blobs
+            TestCmdline._test_call(
+                [],
+                options,
+                ["a.py", "b.py"],
+                ["copyright.txt"],
+                **{**DEFAULT_OPTIONS, "enforce_all": True, "blobs": blobs},
+            )
+        from_ref, to_ref, modified = expected_args
+        mock_changed_fn.assert_called_once_with(from_ref, to_ref, modified=modified)
+
+    @pytest.mark.parametrize(
+        "options",
+        [
+            ["--to-ref=pr"],
+            ["--check-modified"],
+            ["--from-ref=main", "--staged"],
+            ["--from-ref=main", "--fix"],
+            ["--from-ref=main", "--all-tracked"],
+        ],
+    )
+    def test_invalid_ref_options(self, options):
+        with pytest.raises(SystemExit):
+            main(options)
+
+    def test_with_shard(self, file_paths):
+        TestCmdline._test_call(
+            file_paths,
+            ["--shard=2/3"],
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "shard": (2, 3)},
+        )
+
+    @pytest.mark.parametrize("shard", ["0/3", "4/3", "1", "a/b", "1/2/3"])
+    def test_invalid_shard(self, file_paths, shard):
+        with pytest.raises(SystemExit):
+            main([f"--shard={shard}", *file_paths])
+
+    @pytest.mark.parametrize(
+        "options, expected",
+        [
+            (["--comment-styles"], {}),
+            (
+                ["--comment-style=.jsx=slash", "--comment-style", "BUILD=hash"],
+                {".jsx": "slash", "BUILD": "hash"},
+            ),
+        ],
+    )
+    def test_with_comment_styles(self, file_paths, options, expected):
+        TestCmdline._test_call(
+            file_paths,
+            options,
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "comment_styles": expected},
+        )
+
+    @pytest.mark.parametrize("style", [".jsx", ".jsx=", "=slash", ".jsx=unknown"])
+    def test_invalid_comment_style(self, file_paths, style):
+        with pytest.raises(SystemExit):
+            main([f"--comment-style={style}", *file_paths])
+
+    def test_with_recurse_submodules(self, file_paths):
+        TestCmdline._test_call(
+            file_paths,
+            ["--recurse-submodules"],
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "recurse_submodules": True},
+        )
+
+    def test_with_all_tracked_recurse_submodules(self):
+        with patch("scripts.copyright_notice.tracked_files") as mock_tracked_fn:
+            TestCmdline._test_call(
+                [],
+                ["--all-tracked", "--recurse-submodules"],
+                mock_tracked_fn.return_value,
+                ["copyright.txt"],
+                **{**DEFAULT_OPTIONS, "enforce_all": True, "recurse_submodules": True},
+            )
+        mock_tracked_fn.assert_called_once_with(recurse_submodules=True)
+
+    @pytest.mark.parametrize("options", [["--staged"], ["--from-ref=main"]])
+    def test_invalid_recurse_submodules(self, file_paths, options):
+        with pytest.raises(SystemExit):
+            main(["--recurse-submodules", *options, *file_paths])
+
+    def test_with_near_miss(self, file_paths):
+        TestCmdline._test_call(
+            file_paths,
+            ["--near-miss"],
+            list(file_paths),
+            ["copyright.txt"],
+            **{**DEFAULT_OPTIONS, "near_miss": DEFAULT_NEAR_MISS_RATIO},
         )
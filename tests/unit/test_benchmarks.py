@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# mypy: ignore-errors
+
+"""
+Unit tests of the benchmark helpers
+"""
+
+import os
+
+import pytest
+from benchmarks.run import Result, compare_to_baseline
+from benchmarks.synthetic import TreeSpec, generate_tree
+
+NOTICE = b"Copyright Notice (C) 1970"
+
+
+class TestSyntheticTree:
+    def test_deterministic(self, tmp_path):
+        spec = TreeSpec(files=20, mean_size=512, hit_ratio=0.5, files_per_dir=8)
+        paths1, total1 = generate_tree(str(tmp_path / "a"), spec, NOTICE)
+        paths2, total2 = generate_tree(str(tmp_path / "b"), spec, NOTICE)
+
+        assert len(paths1) == 20
+        assert len({os.path.dirname(path) for path in paths1}) == 3
+        assert total1 == total2
+        contents = [open(path, "rb").read() for path in paths1]
+        assert contents == [open(path, "rb").read() for path in paths2]
+        assert sum(map(len, contents)) == total1
+
+    @pytest.mark.parametrize("hit_ratio", [0.0, 1.0])
+    def test_hit_ratio(self, tmp_path, hit_ratio):
+        spec = TreeSpec(files=10, mean_size=256, hit_ratio=hit_ratio)
+        paths, _ = generate_tree(str(tmp_path), spec, NOTICE)
+
+        hits = [NOTICE in open(path, "rb").read() for path in paths]
+        assert hits == [bool(hit_ratio)] * 10
+
+    @pytest.mark.parametrize("position", ["top", "middle", "bottom"])
+    def test_notice_position(self, tmp_path, position):
+        spec = TreeSpec(files=1, mean_size=4096, size_distribution="fixed")
+        spec = spec._replace(notice_position=position)
+        (path,), total = generate_tree(str(tmp_path), spec, NOTICE)
+
+        offset = open(path, "rb").read().find(NOTICE)
+        expected = {"top": 0, "middle": total // 2, "bottom": total - len(NOTICE) - 1}
+        assert abs(offset - expected[position]) < 80
+
+    def test_invalid_spec(self, tmp_path):
+        with pytest.raises(ValueError):
+            generate_tree(str(tmp_path), TreeSpec(1, 10, "normal"), NOTICE)
+
+
+class TestCompareToBaseline:
+    BASELINE = {
+        "scenario": {"files_per_s": 1000, "bytes_per_s": 1e6, "peak_rss_kib": 100}
+    }
+
+    @pytest.mark.parametrize(
+        "files_per_s, bytes_per_s, peak_rss_kib, regressions",
+        [
+            (1000, 1e6, 100, 0),
+            (800, 0.8e6, 120, 0),
+            (700, 1e6, None, 1),
+            (700, 0.7e6, 130, 3),
+        ],
+    )
+    def test_regressions(self, files_per_s, bytes_per_s, peak_rss_kib, regressions):
+        result = Result(1, 1, 1.0, files_per_s, bytes_per_s, peak_rss_kib)
+
+        found = compare_to_baseline("scenario", result, self.BASELINE)
+        assert len(found) == regressions
+
+    def test_no_baseline(self):
+        result = Result(1, 1, 1.0, 1, 1, 1)
+
+        assert compare_to_baseline("other", result, self.BASELINE) == []
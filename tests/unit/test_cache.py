@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# mypy: ignore-errors
+
+"""
+Unit tests for the results cache
+"""
+
+import os
+import time
+
+from scripts import cache as cache_module
+from scripts.cache import ResultCache, config_digest, file_key, keep_loaded
+
+
+def _make_old_file(path, content=b"content"):
+    path.write_bytes(content)
+    old = time.time() - 3600
+    os.utime(path, (old, old))
+    return str(path)
+
+
+class TestResultCache:
+    """Unit tests for ResultCache"""
+
+    def test_roundtrip(self, tmp_path):
+        filepath = _make_old_file(tmp_path / "a.py")
+        key = file_key(filepath)
+        cache = ResultCache(str(tmp_path / "cache"), "digest")
+        assert cache.get(filepath, key) is None
+        cache.put(filepath, key, "found", 12, "notice.txt")
+        cache.put("other.py", key, "skipped", -1, reason="empty")
+        cache.save()
+
+        cache = ResultCache(str(tmp_path / "cache"), "digest")
+        assert cache.get(filepath, key) == ("found", 12, "notice.txt", None)
+        assert cache.get("other.py", key) == ("skipped", -1, None, "empty")
+
+    def test_invalidation(self, tmp_path):
+        filepath = _make_old_file(tmp_path / "a.py")
+        cache = ResultCache(str(tmp_path / "cache"), "digest")
+        cache.put(filepath, file_key(filepath), "found", 0)
+        cache.save()
+
+        _make_old_file(tmp_path / "a.py", b"modified content")
+        cache = ResultCache(str(tmp_path / "cache"), "digest")
+        assert cache.get(filepath, file_key(filepath)) is None
+
+    def test_different_digest(self, tmp_path):
+        filepath = _make_old_file(tmp_path / "a.py")
+        key = file_key(filepath)
+        cache = ResultCache(str(tmp_path / "cache"), config_digest(b"a"))
+        cache.put(filepath, key, "found", 0)
+        cache.save()
+
+        cache = ResultCache(str(tmp_path / "cache"), config_digest(b"b"))
+        assert cache.get(filepath, key) is None
+
+    def test_recent_file_not_cached(self, tmp_path):
+        filepath = tmp_path / "a.py"
+        filepath.write_bytes(b"content")
+        assert file_key(str(filepath)) is None
+
+    def test_eviction(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache"), "digest", max_entries=2)
+        cache.put("old.py", (1, 1, 1), "found", 0)
+        cache._now -= 10
+        cache.put("older.py", (1, 1, 1), "found", 0)
+        cache._now += 20
+        cache.put("new.py", (1, 1, 1), "found", 0)
+        cache.save()
+
+        cache = ResultCache(str(tmp_path / "cache"), "digest", max_entries=2)
+        assert cache.get("older.py", (1, 1, 1)) is None
+        assert cache.get("old.py", (1, 1, 1)) is not None
+        assert cache.get("new.py", (1, 1, 1)) is not None
+
+    def test_corrupted_cache(self, tmp_path):
+        (tmp_path / "results.json").write_text("{not json")
+        cache = ResultCache(str(tmp_path), "digest")
+        assert cache.get("a.py", (1, 1, 1)) is None
+
+    def test_keep_loaded(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(cache_module, "_loaded_entries", None)
+        keep_loaded()
+        cache = ResultCache(str(tmp_path), config_digest(b"a"))
+        cache.put("a.py", (1, 1, 1), "found", 0)
+        cache.save()
+        (tmp_path / "results.json").write_text("{not json")
+
+        cache = ResultCache(str(tmp_path), config_digest(b"b"))
+        cache.put("b.py", (1, 1, 1), "missing", -1)
+        cache.save()
+
+        cache = ResultCache(str(tmp_path), config_digest(b"a"))
+        assert cache.get("a.py", (1, 1, 1)) == ("found", 0, None, None)
+        monkeypatch.setattr(cache_module, "_loaded_entries", None)
+        cache = ResultCache(str(tmp_path), config_digest(b"a"))
+        assert cache.get("a.py", (1, 1, 1)) == ("found", 0, None, None)
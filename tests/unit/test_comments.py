@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# mypy: ignore-errors
+
+"""
+Unit tests for the registry of comment styles
+"""
+
+import pytest
+from scripts.comments import COMMENT_STYLES, CommentRegistry, CommentStyle
+
+NOTICE = b"Copyright (C) ACME Inc\n\nAll Rights Reserved\n"
+
+
+@pytest.mark.parametrize(
+    "style, expected",
+    [
+        ("hash", b"# Copyright (C) ACME Inc\n#\n# All Rights Reserved"),
+        ("slash", b"// Copyright (C) ACME Inc\n//\n// All Rights Reserved"),
+        (
+            "c-block",
+            b"/*\n * Copyright (C) ACME Inc\n *\n * All Rights Reserved\n */",
+        ),
+        ("dash", b"-- Copyright (C) ACME Inc\n--\n-- All Rights Reserved"),
+        ("html", b"<!--\nCopyright (C) ACME Inc\n\nAll Rights Reserved\n-->"),
+    ],
+)
+def test_render(style, expected):
+    assert COMMENT_STYLES[style].render(NOTICE) == expected
+
+
+def test_render_crlf():
+    assert CommentStyle("# ").render(b"\r\nline 1\r\nline 2\r\n") == (
+        b"# line 1\r\n# line 2"
+    )
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("main.py", "hash"),
+        ("src/main.rs", "slash"),
+        ("include/lib.h", "c-block"),
+        ("db/schema.sql", "dash"),
+        ("docs/index.html", "html"),
+        ("docker/Dockerfile", "hash"),
+        ("src/view.jsx", "html"),
+        ("BUILD", "hash"),
+        ("README", None),
+        ("data.bin", None),
+    ],
+)
+def test_style_for(path, expected):
+    registry = CommentRegistry({".jsx": "html", "BUILD": "hash"})
+    assert registry.style_for(path) == (expected and COMMENT_STYLES[expected])
+
+
+def test_unknown_style():
+    with pytest.raises(ValueError, match="Unknown comment style: xml"):
+        CommentRegistry({".xml": "xml"})
@@ -5,11 +5,12 @@
 Unit tests for CopyrightNoticeChecker methods
 """
 
+import io
 import sys
 from unittest.mock import patch
 
 import pytest
-from scripts.copyright_notice import CopyrightNoticeChecker
+from scripts.copyright_notice import CopyrightNoticeChecker, FileResult, Verdict
 from scripts.error import (
     CopyrightNoticeParsingError,
     CopyrightNoticeTemplateFileNotFoundError,
@@ -17,6 +18,8 @@ from scripts.error import (
     SourceCodeFileNotFoundError,
     exception_to_retcode_mapping,
 )
+from scripts.matcher import NoticeMatcher
+from scripts.util import SNIFF_SIZE
 
 if sys.version_info >= (3, 7):
     from contextlib import nullcontext
@@ -24,9 +27,9 @@ if sys.version_info >= (3, 7):
 
 # (
 #   mock return for parse_file_as_bytes
-#   mock return for file_contains_valid_notice
+#   mock return for check_file (True if the notice is found)
 #   side effect raised by parse_file_as_bytes,
-#   side effect raised by file_contains_valid_notice
+#   side effect raised by check_file
 #   expected return for check_files_have_notice,
 #   expected exception raised by check_files_have_notice
 # )
@@ -94,13 +97,15 @@ class TestCopyrightNoticeChecker:
             pytest_raises_ctx = nullcontext()
 
         mock_parse_ctx = patch("scripts.copyright_notice.parse_file_as_bytes")
-        mock_contains_ctx = patch.object(
-            CopyrightNoticeChecker, "file_contains_valid_notice"
-        )
+        mock_contains_ctx = patch.object(CopyrightNoticeChecker, "check_file")
 
-        with mock_parse_ctx as mock_parse_fn, mock_contains_ctx as mock_contains_fn, pytest_raises_ctx:  # noqa: E501
+        with mock_parse_ctx as mock_parse_fn, mock_contains_ctx as mock_contains_fn, (
+            pytest_raises_ctx
+        ):  # noqa: E501
             mock_parse_fn.return_value = mock_return_parse
-            mock_contains_fn.return_value = mock_return_contains
+            mock_contains_fn.return_value = FileResult(
+                "", Verdict.FOUND if mock_return_contains else Verdict.MISSING
+            )
             if side_effect_parse is not None:
                 mock_parse_fn.side_effect = side_effect_parse(
                     "intentionally raised error"
@@ -120,7 +125,15 @@ class TestCopyrightNoticeChecker:
 
             assert mock_contains_fn.call_count == 2
             for filename in filenames:
-                mock_contains_fn.assert_any_call(filename, mock_return_parse)
+                mock_contains_fn.assert_any_call(
+                    filename,
+                    NoticeMatcher([mock_return_parse], [notice]),
+                    max_header_bytes=None,
+                    max_header_lines=None,
+                    fix_notice=None,
+                    max_file_size=None,
+                    stats=None,
+                )
 
             if expected_side_effect is None:
                 assert return_value == expected_return
@@ -156,3 +169,90 @@ class TestCopyrightNoticeChecker:
             )
             if side_effect is None:
                 assert exit_code == expected_return
+
+    @pytest.mark.parametrize(
+        "offset",
+        [0, 100, SNIFF_SIZE - 20, SNIFF_SIZE - 1, SNIFF_SIZE, 2 * SNIFF_SIZE - 5, None],
+    )
+    @pytest.mark.parametrize(
+        "encoding, matcher",
+        [
+            ("utf-8", NoticeMatcher([b"# Copyright ACME"])),
+            ("utf-8", NoticeMatcher([b"# Copyright ACME", b"# (C) ACME Inc."])),
+            ("utf-8", NoticeMatcher([b"# Copyright  ACME"], tolerant_whitespace=True)),
+            ("utf-16", NoticeMatcher([b"# Copyright ACME"])),
+            ("utf-16", NoticeMatcher([b"# Copyright ACME"], tolerant_whitespace=True)),
+        ],
+    )
+    def test_check_stream(self, offset, encoding, matcher):
+        text = "x" * 5 * SNIFF_SIZE
+        if offset is not None:
+            text = text[:offset] + "\n# Copyright ACME\n" + text[offset:]
+        content = text.encode(encoding)
+
+        result = CopyrightNoticeChecker.check_stream(
+            "file.py", io.BytesIO(content), matcher, chunk_size=SNIFF_SIZE
+        )
+        assert result == CopyrightNoticeChecker.check_content(
+            "file.py", content, matcher
+        )
+        assert result.verdict is (Verdict.MISSING if offset is None else Verdict.FOUND)
+
+    @pytest.mark.parametrize(
+        "content, expected",
+        [
+            (b"", FileResult("file.py", Verdict.SKIPPED, reason="empty")),
+            (
+                b"\0" * 3 * SNIFF_SIZE,
+                FileResult("file.py", Verdict.SKIPPED, reason="binary"),
+            ),
+            (b"# Copyright ACME\n", FileResult("file.py", Verdict.FOUND, 0, "0")),
+        ],
+    )
+    def test_check_stream_small_or_skipped(self, content, expected):
+        result = CopyrightNoticeChecker.check_stream(
+            "file.py", io.BytesIO(content), b"# Copyright ACME", chunk_size=1
+        )
+        assert result == expected
+
+    def test_check_stream_header(self):
+        content = b"line\n" * 10 + b"# Copyright ACME\n" + b"x" * 1024 * 1024
+        stream = io.BytesIO(content)
+
+        result = CopyrightNoticeChecker.check_stream(
+            "file.py", stream, b"# Copyright ACME", max_header_lines=10
+        )
+        assert result.verdict is Verdict.NOT_IN_HEADER
+        assert stream.tell() < len(content)
+        result = CopyrightNoticeChecker.check_stream(
+            "file.py", io.BytesIO(content), b"# Copyright ACME", max_header_lines=11
+        )
+        assert result == FileResult("file.py", Verdict.FOUND, 50, "0")
+
+    @pytest.mark.parametrize(
+        "content, header_window, expected",
+        [
+            (b"print()\n", {"max_header_lines": 20}, Verdict.MISSING),
+            (b"print()\n", {"max_header_bytes": 50}, Verdict.MISSING),
+            (b"print()\n" * 20, {"max_header_lines": 20}, Verdict.NOT_IN_HEADER),
+            (b"print()\n" * 20, {"max_header_bytes": 50}, Verdict.NOT_IN_HEADER),
+        ],
+    )
+    def test_check_stream_whole_header(self, content, header_window, expected):
+        result = CopyrightNoticeChecker.check_stream(
+            "file.py", io.BytesIO(content), b"# Copyright ACME", **header_window
+        )
+        assert result.verdict is expected
+
+    @pytest.mark.parametrize(
+        "max_header_lines, expected",
+        [(20, Verdict.MISSING), (21, Verdict.MISSING), (19, Verdict.NOT_IN_HEADER)],
+    )
+    def test_check_content_whole_header(self, max_header_lines, expected):
+        result = CopyrightNoticeChecker.check_content(
+            "file.py",
+            b"print()\n" * 20,
+            b"# Copyright ACME",
+            max_header_lines=max_header_lines,
+        )
+        assert result.verdict is expected
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# mypy: ignore-errors
+
+"""
+Unit tests for the insertion of missing notices
+"""
+
+import os
+
+import pytest
+from scripts.fixer import notice_insertion_point, write_with_notice
+
+NOTICE = b"# Copyright (C) ACME Inc"
+
+
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        (b"", 0),
+        (b"print()\n", 0),
+        (b"#!/usr/bin/env python\nprint()\n", 22),
+        (b"#!/bin/sh", 9),
+        (b"# -*- coding: latin-1 -*-\nprint()\n", 26),
+        (b"#!/usr/bin/env python\n# vim: set fileencoding=utf-8 :\nprint()\n", 54),
+        (b"# comment\n# coding: utf-8\nprint()\n", 0),
+        (b"print()\n#!/bin/sh\n", 0),
+        (b'<?xml version="1.0"?>\n<svg/>\n', 22),
+        (b"<?xml version='1.0' encoding='utf-8' ?>  \r\n<a/>", 43),
+        (b"<?xml version='1.0'?><a/>", 21),
+        (b"<a/>\n", 0),
+    ],
+)
+def test_notice_insertion_point(content, expected):
+    assert notice_insertion_point(content) == expected
+
+
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        (b"", NOTICE + b"\n"),
+        (b"print()\n", NOTICE + b"\nprint()\n"),
+        (b"#!/bin/sh", b"#!/bin/sh\n" + NOTICE + b"\n"),
+        (b"#!/bin/sh\r\necho\r\n", b"#!/bin/sh\r\n" + NOTICE + b"\r\necho\r\n"),
+    ],
+)
+@pytest.mark.parametrize("head_size", [None, 0, 3])
+def test_write_with_notice(tmp_path, content, expected, head_size):
+    path = tmp_path / "source.sh"
+    path.write_bytes(content)
+    os.chmod(path, 0o750)
+    head = content if head_size is None else content[:head_size]
+
+    tmp_copy = write_with_notice(str(path), head, NOTICE)
+    assert os.path.dirname(tmp_copy) == str(tmp_path)
+    with open(tmp_copy, "rb") as f_copy:
+        if head_size is None or not content.startswith(b"#!"):
+            assert f_copy.read() == expected
+        assert os.stat(tmp_copy).st_mode & 0o777 == 0o750
+    assert path.read_bytes() == content
+
+
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        (b"\xef\xbb\xbf#!/bin/sh\n", "\ufeff#!/bin/sh\n# \u00a9 ACME\n".encode()),
+        (
+            "\ufeffecho\r\n".encode("utf-16-le"),
+            "\ufeff# \u00a9 ACME\r\necho\r\n".encode("utf-16-le"),
+        ),
+        (
+            '\ufeff<?xml version="1.0"?>\n<a/>'.encode("utf-16-be"),
+            '\ufeff<?xml version="1.0"?>\n# \u00a9 ACME\n<a/>'.encode("utf-16-be"),
+        ),
+        (
+            "print('\u00e9')\n".encode("latin-1"),
+            "# \u00a9 ACME\nprint('\u00e9')\n".encode("latin-1"),
+        ),
+    ],
+)
+def test_write_with_notice_encoding(tmp_path, content, expected):
+    path = tmp_path / "source.py"
+    path.write_bytes(content)
+
+    tmp_copy = write_with_notice(str(path), content, "# \u00a9 ACME".encode())
+    with open(tmp_copy, "rb") as f_copy:
+        assert f_copy.read() == expected
@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+# mypy: ignore-errors
+
+"""
+Unit tests for the notice matchers
+"""
+
+import mmap
+import re
+
+import pytest
+from scripts import matcher as matcher_module
+from scripts.comments import COMMENT_STYLES
+from scripts.matcher import (
+    NearMiss,
+    NoticeMatch,
+    NoticeMatcher,
+    approximate_search,
+    placeholder_pattern,
+    shared_keys,
+    template_anchor,
+    tolerant_pattern,
+)
+
+
+class TestNoticeMatcher:
+    """Unit tests for NoticeMatcher"""
+
+    def test_no_templates(self):
+        with pytest.raises(ValueError):
+            NoticeMatcher([])
+
+    @pytest.mark.parametrize(
+        "content, expected",
+        [
+            (b"abc", NoticeMatch("0", 0, 3)),
+            (b"xxabcxx", NoticeMatch("0", 2, 5)),
+            (b"ab c", None),
+        ],
+    )
+    def test_single_template(self, content, expected):
+        assert NoticeMatcher([b"abc"]).search(content) == expected
+
+    @pytest.mark.parametrize(
+        "content, expected",
+        [
+            (b"-- foo --", NoticeMatch("foo.txt", 3, 6)),
+            (b"-- bar --", NoticeMatch("bar.txt", 3, 6)),
+            (b"bar foo", NoticeMatch("bar.txt", 0, 3)),
+            (b"foobar", NoticeMatch("foobar.txt", 0, 6)),
+            (b"fo.o", None),
+        ],
+    )
+    def test_multiple_templates(self, content, expected):
+        matcher = NoticeMatcher(
+            [b"foo", b"bar", b"foobar", b"f.o"],
+            ["foo.txt", "bar.txt", "foobar.txt", "dot.txt"],
+        )
+        assert matcher.search(content) == expected
+
+    def test_search_window(self):
+        matcher = NoticeMatcher([b"foo", b"bar"])
+        assert matcher.search(b"xxxfoo", 0, 5) is None
+        assert matcher.search(b"xxxfoo", 0, 6) == NoticeMatch("0", 3, 6)
+        assert matcher.search(b"barfoo", 1) == NoticeMatch("0", 3, 6)
+
+    def test_search_mmap(self, tmp_path):
+        path = tmp_path / "source.txt"
+        path.write_bytes(b"#!/bin/sh\n# bar\n")
+        matcher = NoticeMatcher([b"foo", b"bar"])
+        with open(path, "rb") as f_src, mmap.mmap(
+            f_src.fileno(), 0, access=mmap.ACCESS_READ
+        ) as src_bytes:
+            assert matcher.search(src_bytes) == NoticeMatch("1", 12, 15)
+
+
+def test_shared_keys():
+    templates = [
+        b"# Copyright (C) ACME Inc",
+        b"// Copyright (C) Foo Corp",
+        b"Licensed under MIT",
+        b"# Copyright (C) ACME",
+    ]
+    assert shared_keys(templates) == [
+        (b" Copyright (C) ", [(0, 1), (1, 2), (3, 1)]),
+        (b"Licensed under MIT", [(2, 0)]),
+    ]
+
+
+@pytest.mark.parametrize("max_key_hits", [0, 1, 64])
+def test_shared_key_hits(monkeypatch, max_key_hits):
+    monkeypatch.setattr(matcher_module, "MAX_KEY_HITS", max_key_hits)
+    matcher = NoticeMatcher(
+        [b"Copyright (C) Foo", b"(C) Copyright (C) Bar", b"Copyright (C) Foo Corp"],
+        ["foo", "bar", "foo_corp"],
+    )
+    content = b"Copyright (C) Baz\n" * 10 + b"(C) Copyright (C) Foo Corp"
+
+    assert matcher.search(content) == NoticeMatch("foo_corp", 184, 206)
+    assert matcher.search(content, 0, 201) == NoticeMatch("foo", 184, 201)
+    assert matcher.search(content + b"(C) Copyright (C) Bar") == NoticeMatch(
+        "foo_corp", 184, 206
+    )
+    assert matcher.search(b"(C) Copyright (C) Bar" + content) == NoticeMatch(
+        "bar", 0, 21
+    )
+
+
+TOLERANT_TEMPLATE = b"""
+    Copyright (C) ACME Inc
+
+    All rights reserved.
+"""
+
+
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        (b"Copyright (C) ACME Inc\n\nAll rights reserved.", True),
+        (b"Copyright (C) ACME Inc\r\n\r\nAll rights reserved.\r\n", True),
+        (b"# Copyright  (C)\tACME Inc  \n  \n  All rights reserved.", True),
+        (b"Copyright (C) ACME Inc\nAll rights reserved.", False),
+        (b"Copyright (C) ACME Inc All rights reserved.", False),
+        (b"Copyright(C) ACME Inc\n\nAll rights reserved.", False),
+        (b"Copyright (C) ACME Inc\n\nAll rights reserved!", False),
+    ],
+)
+def test_tolerant_whitespace(content, expected):
+    matcher = NoticeMatcher([TOLERANT_TEMPLATE], tolerant_whitespace=True)
+    assert (matcher.search(content) is not None) == expected
+    assert (re.search(tolerant_pattern(TOLERANT_TEMPLATE), content) is not None) == (
+        expected
+    )
+
+
+PLACEHOLDER_TEMPLATE = b"Copyright (C) {year_range} {holder}. All rights reserved."
+
+
+@pytest.mark.parametrize(
+    "content, expected_year",
+    [
+        (b"# Copyright (C) 2021 ACME Inc. All rights reserved.", 2021),
+        (b"# Copyright (C) 2019-2023 ACME Inc. All rights reserved.", 2023),
+        (b"# Copyright (C) 2019 - 2023 ACME. All rights reserved.", 2023),
+        (b"# Copyright (C) 2019\xe2\x80\x932020 ACME. All rights reserved.", 2020),
+        (b"# Copyright (C) 21 ACME Inc. All rights reserved.", None),
+        (b"# Copyright (C) 2021 . All rights reserved.", None),
+        (b"# Copyright (C) 2021 ACME\n. All rights reserved.", None),
+    ],
+)
+def test_placeholders(content, expected_year):
+    matcher = NoticeMatcher([PLACEHOLDER_TEMPLATE], placeholders=True)
+    match = matcher.search(content)
+    if expected_year is None:
+        assert match is None
+    else:
+        assert match == NoticeMatch("0", 2, len(content), expected_year)
+
+
+def test_placeholders_multiple_templates():
+    matcher = NoticeMatcher(
+        [b"(C) {year} {holder}", b"Copyright {{{year}}}"], ["a", "b"], placeholders=True
+    )
+    assert matcher.search(b"Copyright {1999}") == NoticeMatch("b", 0, 16, 1999)
+    assert matcher.search(b"# (C) 2001 ACME") == NoticeMatch("a", 2, 15, 2001)
+
+
+def test_placeholders_tolerant_whitespace():
+    matcher = NoticeMatcher(
+        [b"Copyright {year}\nACME\n"], placeholders=True, tolerant_whitespace=True
+    )
+    assert matcher.search(b"Copyright  2001 \r\n  ACME").year == 2001
+
+
+@pytest.mark.parametrize(
+    "template, tolerant_whitespace, placeholders, expected",
+    [
+        (b"Copyright (C) ACME\nAll rights\n", False, False, (b"Copyright", 0, 2)),
+        (b"\n  (C) ACME\n\nAll rights\n", True, False, (b"rights", 2, 0)),
+        (b"(C) {year} {holder}\nLicensed", False, True, (b"Licensed", 1, 0)),
+        (b"{holder}\n{year}", False, True, (b"", 0, 1)),
+    ],
+)
+def test_template_anchor(template, tolerant_whitespace, placeholders, expected):
+    assert template_anchor(template, tolerant_whitespace, placeholders) == expected
+
+
+@pytest.mark.parametrize("window_size", [1, 64 * 1024])
+def test_tolerant_whitespace_windows(monkeypatch, window_size):
+    monkeypatch.setattr(matcher_module, "WINDOW_SIZE", window_size)
+    matcher = NoticeMatcher([TOLERANT_TEMPLATE], tolerant_whitespace=True)
+    notice = b"  Copyright (C)  ACME Inc\r\n\r\n  All rights reserved."
+    content = b"reserved.\nCopyright (C) ACME\n" * 100 + notice + b"\nrights\n"
+
+    match = matcher.search(content)
+    assert (match.start, match.end) == (
+        content.index(b"Copyright (C)  "),
+        len(content) - 8,
+    )
+    assert matcher.search(content, 0, len(content) - 9) is None
+
+
+def test_unknown_placeholder():
+    with pytest.raises(ValueError):
+        placeholder_pattern(b"Copyright {date}")
+
+
+def test_commented():
+    matcher = NoticeMatcher(
+        [b"Copyright {year} ACME\n"], ["notice.txt"], placeholders=True
+    )
+    commented = matcher.commented(COMMENT_STYLES["c-block"])
+
+    assert commented.templates == (b"/*\n * Copyright {year} ACME\n */",)
+    assert commented.names == ("notice.txt",)
+    assert commented.search(b"/*\n * Copyright 2021 ACME\n */\n").year == 2021
+    assert commented.search(b"# Copyright 2021 ACME\n") is None
+    assert matcher.commented(COMMENT_STYLES["c-block"]) is commented
+
+
+class TestSearchEncoded:
+    NOTICE = "Copyright \u00a9 ACME".encode("utf-8")
+
+    @pytest.mark.parametrize(
+        "encoding, bom",
+        [
+            ("utf-8", b"\xef\xbb\xbf"),
+            ("utf-16-le", b"\xff\xfe"),
+            ("utf-16-be", b"\xfe\xff"),
+            ("utf-32-le", b"\xff\xfe\0\0"),
+        ],
+    )
+    @pytest.mark.parametrize("tolerant_whitespace", [False, True])
+    def test_encoded(self, encoding, bom, tolerant_whitespace):
+        matcher = NoticeMatcher([self.NOTICE], tolerant_whitespace=tolerant_whitespace)
+        prefix = bom + "# ".encode(encoding)
+        notice = self.NOTICE.decode().encode(encoding)
+        content = prefix + notice + "\n".encode(encoding)
+
+        match = matcher.search_encoded(content, encoding)
+        assert (match.start, match.end) == (len(prefix), len(prefix) + len(notice))
+        assert matcher.search_encoded(content, encoding, 0, len(content) - 8) is None
+
+    def test_variants_cached(self):
+        matcher = NoticeMatcher([self.NOTICE])
+
+        variant = matcher.encoded("utf-16-le")
+        assert variant.templates == (self.NOTICE.decode().encode("utf-16-le"),)
+        assert matcher.encoded("utf-16-le") is variant
+        assert NoticeMatcher([b"ACME"]).encoded("latin-1") is None
+        assert NoticeMatcher([b"\xa9"]).encoded("latin-1") is None
+        assert NoticeMatcher([b"ACME"], placeholders=True).encoded("utf-16-le") is None
+
+    def test_latin1(self):
+        matcher = NoticeMatcher([self.NOTICE])
+
+        assert matcher.search_encoded(b"# " + self.NOTICE, None).start == 2
+        content = b"# " + self.NOTICE.decode().encode("latin-1")
+        assert matcher.search(content) is None
+        assert matcher.search_encoded(content, None) == NoticeMatch(
+            "0", 2, len(content)
+        )
+
+    def test_placeholders(self):
+        matcher = NoticeMatcher([b"Copyright {year} {holder}"], placeholders=True)
+        content = "\ufeff# Copyright 2021 ACME\n".encode("utf-16-le")
+
+        assert matcher.search_encoded(content, "utf-16-le") == NoticeMatch(
+            "0", 6, len(content) - 2, 2021
+        )
+
+    @pytest.mark.parametrize("encoding", ["utf-16-le", "utf-16-be", "utf-32-le"])
+    @pytest.mark.parametrize("window_size", [1, 64 * 1024])
+    def test_wide_windows(self, monkeypatch, encoding, window_size):
+        monkeypatch.setattr(matcher_module, "WINDOW_SIZE", window_size)
+        # Code units holding newline bytes must not be taken as line breaks
+        filler = "\u010a\u0a0a Copyright ACME \u0a00\n" * 50
+        notice = "\u0a20\u0100# Copyright  2021\r\n# ACME\n"
+        content = (filler + notice).encode(encoding)
+
+        for template, found in [
+            (b"Copyright {year}\n# ACME", "Copyright  2021"),
+            (b"{year}\n# {holder}", "2021\r\n"),
+        ]:
+            matcher = NoticeMatcher(
+                [template], placeholders=True, tolerant_whitespace=True
+            )
+            match = matcher.search_encoded(content, encoding)
+            assert (match.start, match.year) == (
+                content.rindex(found.encode(encoding)),
+                2021,
+            )
+
+
+@pytest.mark.parametrize(
+    "text, pattern, expected",
+    [
+        ("xx Copyright ACME yy", "Copyright ACME", (0, 3, 17)),
+        ("xx Copyrigth ACME yy", "Copyright ACME", (2, 3, 17)),
+        ("xx Copyright ACM", "Copyright ACME", (1, 3, 16)),
+        ("Copyright (C) 2019 ACME", "Copyright (C) 2021 ACME", (2, 0, 23)),
+        ("", "ACME", (4, 0, 0)),
+        ("abc", "xyz", (3, 0, 0)),
+    ],
+)
+def test_approximate_search(text, pattern, expected):
+    assert approximate_search(text, pattern) == expected
+
+
+class TestNearMiss:
+    """Unit tests for NoticeMatcher.near_miss"""
+
+    NOTICE = b"# Copyright (C) 2021 ACME Inc\n# All Rights Reserved\n"
+
+    @pytest.mark.parametrize(
+        "head, expected_distance, expected_text",
+        [
+            (
+                b"#!/bin/sh\n# Copyright (C) 2019 ACME Inc\n# All Rights Reserved\n",
+                2,
+                "# Copyright (C) 2019 ACME Inc\n# All Rights Reserved",
+            ),
+            (
+                b"#!/bin/sh\n# Copyright (C) 2021 ACME Inc\n# All Rights\n",
+                9,
+                "# Copyright (C) 2021 ACME Inc\n# All Rights",
+            ),
+            (
+                (
+                    "#!/bin/sh\n# Copyright (C) 2019 ACME Inc\n# All Rights Reserved\n"
+                ).encode("utf-16"),
+                2,
+                "# Copyright (C) 2019 ACME Inc\n# All Rights Reserved",
+            ),
+            (b"#!/bin/sh\necho hello\n", None, None),
+        ],
+    )
+    def test_near_miss(self, head, expected_distance, expected_text):
+        near_miss = NoticeMatcher([self.NOTICE], ["notice.txt"]).near_miss(head, 0.25)
+        if expected_distance is None:
+            assert near_miss is None
+            return
+        assert near_miss == NearMiss(
+            "notice.txt",
+            expected_distance,
+            2,
+            expected_text,
+            self.NOTICE.decode().strip(),
+        )
+
+    def test_multiple_templates(self):
+        matcher = NoticeMatcher([b"(C) ACME Corp", b"Copyright ACME Inc"], ["a", "b"])
+        assert matcher.near_miss(b"Copyright ACME Inx", 0.25).template == "b"
+        assert matcher.near_miss(b"(C) ACME Crop", 0.25).template == "a"
+
+    def test_placeholders(self):
+        matcher = NoticeMatcher(
+            [b"Copyright (C) {year_range} {holder}"], placeholders=True
+        )
+        near_miss = matcher.near_miss(
+            b"# Copyright (C) 2020 ACME\n", 0.5, {"year_range": "2021"}
+        )
+        assert near_miss.expected == "Copyright (C) 2021 {holder}"
+        assert near_miss.text.startswith("Copyright (C) 2020")
+
+    def test_diff(self):
+        near_miss = NearMiss("a", 1, 1, "line 1\nline 3", "line 1\nline 2")
+        assert near_miss.diff() == [
+            "--- expected",
+            "+++ found",
+            "@@ -1,2 +1,2 @@",
+            " line 1",
+            "-line 2",
+            "+line 3",
+        ]
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# mypy: ignore-errors
+
+"""
+Unit tests of the merge of the exit codes of the shards
+"""
+
+import pytest
+from scripts.merge import main, merge_retcodes
+
+
+@pytest.mark.parametrize(
+    "retcodes, expected",
+    [
+        ([], 0),
+        ([0, 0], 0),
+        ([0, 1, 0], 1),
+        ([1, 6, 0, 4], 4),
+        ([5, 3], 3),
+        ([6, 255, 1], 255),
+        ([2, 3], 2),
+        (iter([0, 1]), 1),
+    ],
+)
+def test_merge_retcodes(retcodes, expected):
+    assert merge_retcodes(retcodes) == expected
+
+
+def test_main(tmp_path):
+    (tmp_path / "shard-1.rc").write_text("1\n")
+    (tmp_path / "shard-2.rc").write_text("0\n")
+
+    assert main(["0", str(tmp_path / "shard-1.rc"), str(tmp_path / "shard-2.rc")]) == 1
+    assert main(["0", "0"]) == 0
+    with pytest.raises(SystemExit):
+        main(["0", str(tmp_path / "missing.rc")])
+    with pytest.raises(SystemExit):
+        main([])
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# mypy: ignore-errors
+
+"""
+Unit tests of the per-directory mapping of the notices
+"""
+
+import os
+
+import pytest
+from scripts.notice_config import PathTrie, read_notice_config
+
+
+@pytest.fixture
+def trie():
+    trie = PathTrie()
+    for pattern in ("*", "src/", "src/vendor", "src/*/gen", "src/lib/gen", "*.md"):
+        trie.insert(pattern, pattern)
+    return trie
+
+
+class TestPathTrie:
+    @pytest.mark.parametrize(
+        "path, expected",
+        [
+            ("setup.py", "*"),
+            ("README.md", "*.md"),
+            ("src", "src/"),
+            ("src/main.py", "src/"),
+            ("./src/main.py", "src/"),
+            ("src/vendor/lib.py", "src/vendor"),
+            ("src/app/gen/api.py", "src/*/gen"),
+            ("src/lib/gen/api.py", "src/lib/gen"),
+            ("src/app/main.py", "src/"),
+            ("tests/src/vendor/test.py", "*"),
+            ("../other/file.py", "*"),
+        ],
+    )
+    def test_lookup(self, trie, path, expected):
+        assert trie.lookup(path) == expected
+
+    def test_no_match(self):
+        trie = PathTrie()
+        trie.insert("src", 1)
+
+        assert trie.lookup("tests/test.py") is None
+        assert not trie.covers_all()
+        trie.insert("", 0)
+        assert trie.lookup("tests/test.py") == 0
+        assert trie.covers_all()
+
+    def test_values(self, trie):
+        assert sorted(trie.values()) == sorted(
+            ["*", "src/", "src/vendor", "src/*/gen", "src/lib/gen", "*.md"]
+        )
+        assert trie.covers_all()
+
+
+def test_read_notice_config(tmp_path):
+    config_path = tmp_path / "setup.cfg"
+    config_path.write_text(
+        "[metadata]\nname = foo\n\n"
+        "[tool:copyright-notice]\n"
+        "* = copyright.txt\n"
+        "Third_Party/ = notices/a.txt\n    notices/b.txt\n"
+    )
+
+    assert read_notice_config(str(config_path)) == [
+        ("*", [os.path.join(str(tmp_path), "copyright.txt")]),
+        (
+            "Third_Party/",
+            [
+                os.path.join(str(tmp_path), "notices/a.txt"),
+                os.path.join(str(tmp_path), "notices/b.txt"),
+            ],
+        ),
+    ]
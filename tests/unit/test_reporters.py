@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# mypy: ignore-errors
+
+"""
+Unit tests of the reporters of the per-file results
+"""
+
+import io
+import json
+import os
+
+import pytest
+from scripts.copyright_notice import FileResult, Verdict
+from scripts.matcher import NearMiss
+from scripts.reporters import (
+    JsonLinesReporter,
+    Reporter,
+    SarifReporter,
+    result_to_dict,
+)
+
+RESULTS = [
+    FileResult("a.py", Verdict.FOUND, 0, "copyright.txt"),
+    FileResult("b.py", Verdict.MISSING),
+    FileResult("c.py", Verdict.SKIPPED, reason="binary"),
+    FileResult("d e.py", Verdict.OUTDATED, 12, "copyright.txt", 2019),
+]
+
+
+def test_result_to_dict():
+    assert result_to_dict(RESULTS[3]) == {
+        "path": "d e.py",
+        "verdict": "outdated",
+        "template": "copyright.txt",
+        "offset": 12,
+        "year": 2019,
+        "reason": None,
+        "near_miss": None,
+    }
+
+
+def test_result_to_dict_near_miss():
+    near_miss = NearMiss("copyright.txt", 1, 3, "# (C) ACNE", "# (C) ACME")
+    assert result_to_dict(FileResult("b.py", Verdict.MISSING, near_miss=near_miss))[
+        "near_miss"
+    ] == {
+        "template": "copyright.txt",
+        "distance": 1,
+        "line": 3,
+        "diff": "--- expected\n+++ found\n@@ -1 +1 @@\n-# (C) ACME\n+# (C) ACNE",
+    }
+
+
+def test_reporter_is_abstract():
+    with pytest.raises(TypeError):
+        Reporter(io.StringIO())
+
+
+class TestJsonLinesReporter:
+    def test_streamed(self):
+        stream = io.StringIO()
+        reporter = JsonLinesReporter(stream)
+
+        for count, result in enumerate(RESULTS, 1):
+            reporter.report(result)
+            assert len(stream.getvalue().splitlines()) == count
+        reporter.close()
+
+        lines = stream.getvalue().splitlines()
+        assert [json.loads(line) for line in lines] == list(
+            map(result_to_dict, RESULTS)
+        )
+
+
+class TestSarifReporter:
+    @pytest.mark.parametrize("successful", [True, False])
+    def test_report(self, successful):
+        stream = io.StringIO()
+        reporter = SarifReporter(stream)
+        for result in RESULTS:
+            reporter.report(result)
+        reporter.close(successful)
+
+        sarif = json.loads(stream.getvalue())
+        assert sarif["version"] == "2.1.0"
+        (run,) = sarif["runs"]
+        rules = {rule["id"] for rule in run["tool"]["driver"]["rules"]}
+        assert {result["ruleId"] for result in run["results"]} <= rules
+        assert [
+            (
+                result["ruleId"],
+                result["locations"][0]["physicalLocation"]["artifactLocation"]["uri"],
+            )
+            for result in run["results"]
+        ] == [("missing", "b.py"), ("outdated", "d%20e.py")]
+        region = run["results"][1]["locations"][0]["physicalLocation"]["region"]
+        assert region == {"byteOffset": 12}
+        assert run["invocations"] == [{"executionSuccessful": successful}]
+
+    def test_report_near_miss(self):
+        stream = io.StringIO()
+        reporter = SarifReporter(stream)
+        near_miss = NearMiss("copyright.txt", 2, 3, "# (C) 2019", "# (C) 2021")
+        reporter.report(FileResult("b.py", Verdict.MISSING, near_miss=near_miss))
+        reporter.close()
+
+        (result,) = json.loads(stream.getvalue())["runs"][0]["results"]
+        assert result["message"]["text"] == (
+            "b.py: File does not contain a valid copyright notice. "
+            "Closest notice (copyright.txt): 2 edit(s) away."
+        )
+        region = result["locations"][0]["physicalLocation"]["region"]
+        assert region == {"startLine": 3}
+
+    def test_no_results(self):
+        stream = io.StringIO()
+        SarifReporter(stream).close()
+
+        assert json.loads(stream.getvalue())["runs"][0]["results"] == []
+
+    def test_absolute_uri(self, tmp_path):
+        path = os.path.join(str(tmp_path), "a.py")
+
+        assert SarifReporter.artifact_uri(path).startswith("file://")
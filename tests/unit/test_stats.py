@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# mypy: ignore-errors
+
+"""
+Unit tests of the check run instrumentation
+"""
+
+import json
+import threading
+
+from scripts.stats import CheckStats, phase
+
+
+class TestCheckStats:
+    def test_phases_add_up(self):
+        stats = CheckStats()
+        with stats.phase("search"):
+            pass
+        first = stats.phases["search"]
+        with phase(stats, "search"):
+            pass
+
+        assert stats.phases["search"] >= first > 0
+
+    def test_phase_without_stats(self):
+        with phase(None, "search"):
+            pass
+
+    def test_phase_timed_on_error(self):
+        stats = CheckStats()
+        try:
+            with stats.phase("read"):
+                raise OSError
+        except OSError:
+            pass
+
+        assert "read" in stats.phases
+
+    def test_counters_thread_safe(self):
+        stats = CheckStats()
+
+        def count():
+            for _ in range(1000):
+                stats.count("files")
+                stats.count("bytes_scanned", 10)
+
+        threads = [threading.Thread(target=count) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert stats.counters == {"files": 4000, "bytes_scanned": 40000}
+
+    def test_slowest_files(self):
+        stats = CheckStats(slowest=3)
+        for idx, seconds in enumerate([0.5, 0.1, 0.9, 0.3, 0.7]):
+            stats.record_file(f"file{idx}.py", seconds)
+
+        assert stats.slowest_files == [
+            ("file2.py", 0.9),
+            ("file4.py", 0.7),
+            ("file0.py", 0.5),
+        ]
+
+    def test_no_slowest_files(self):
+        stats = CheckStats(slowest=0)
+        stats.record_file("file.py", 1.0)
+
+        assert stats.slowest_files == []
+
+    def test_report(self):
+        stats = CheckStats()
+        with stats.phase("check"):
+            stats.count("files", 2)
+        stats.record_file("file.py", 0.25)
+
+        data = json.loads(stats.to_json())
+        assert set(data["phases"]) == {"check"}
+        assert data["counters"] == {"files": 2}
+        assert data["slowest_files"] == [{"path": "file.py", "seconds": 0.25}]
+        text = stats.format()
+        assert "check" in text
+        assert "file.py" in text
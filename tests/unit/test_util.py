@@ -0,0 +1,428 @@
+#!/usr/bin/env python
+# mypy: ignore-errors
+
+"""
+Unit tests for utility functions
+"""
+
+import io
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from scripts.util import (
+    CreationYears,
+    GitCatFile,
+    added_files,
+    async_ordered_map,
+    changed_files,
+    cmd_output,
+    content_skip_reason,
+    git_dir,
+    is_utf8,
+    ordered_map,
+    path_filter,
+    read_file_header,
+    read_stream_header,
+    run_coroutine,
+    shard_of,
+    size_skip_reason,
+    sniff_encoding,
+    submodules,
+    submodules_added_files,
+    tracked_files,
+)
+from tests.fixtures.sample_repos import git
+
+SAMPLE_CONTENT = b"line 1\nline 2\r\nline 3\n\nline 5"
+
+
+@pytest.mark.parametrize(
+    "max_bytes, max_lines, expected",
+    [
+        (None, None, b""),
+        (4, None, b"line"),
+        (1000, None, SAMPLE_CONTENT),
+        (None, 1, b"line 1\n"),
+        (None, 2, b"line 1\nline 2\r\n"),
+        (None, 4, b"line 1\nline 2\r\nline 3\n\n"),
+        (None, 100, SAMPLE_CONTENT),
+        (10, 2, b"line 1\nlin"),
+        (100, 1, b"line 1\n"),
+    ],
+)
+def test_read_file_header(tmp_path, max_bytes, max_lines, expected):
+    path = tmp_path / "sample.txt"
+    path.write_bytes(SAMPLE_CONTENT)
+    assert read_file_header(str(path), max_bytes, max_lines) == expected
+
+
+class _Pipe(io.RawIOBase):
+    """Stream returning partial reads, as pipes do"""
+
+    def __init__(self, content, read_size):
+        super().__init__()
+        self._content = io.BytesIO(content)
+        self._read_size = read_size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._content.read(min(len(buffer), self._read_size))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+@pytest.mark.parametrize(
+    "max_bytes, max_lines, expected",
+    [
+        (None, None, SAMPLE_CONTENT),
+        (4, None, b"line"),
+        (None, 2, b"line 1\nline 2\r\n"),
+        (10, 2, b"line 1\nlin"),
+        (100, 1, b"line 1\n"),
+    ],
+)
+def test_read_stream_header(max_bytes, max_lines, expected):
+    stream = _Pipe(SAMPLE_CONTENT, 3)
+    assert read_stream_header(stream, max_bytes, max_lines) == expected
+
+
+@pytest.mark.parametrize("jobs", [1, 2, 8])
+def test_ordered_map(jobs):
+    assert list(ordered_map(lambda x: x * x, iter(range(100)), jobs)) == [
+        x * x for x in range(100)
+    ]
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_ordered_map_propagates_first_error(jobs):
+    def func(x):
+        if x % 10 == 3:
+            raise ValueError(x)
+        return x
+
+    results = ordered_map(func, range(100), jobs)
+    assert [next(results) for _ in range(3)] == [0, 1, 2]
+    with pytest.raises(ValueError, match="^3$"):
+        next(results)
+
+
+def test_shard_of():
+    paths = [f"dir_{idx % 7}/file_{idx}.py" for idx in range(1000)]
+    shards = [shard_of(path, 4) for path in paths]
+
+    assert set(shards) == {1, 2, 3, 4}
+    assert all(shards.count(index) > 150 for index in range(1, 5))
+    assert shard_of("dir/file.py", 4) == shard_of("./dir//file.py", 4)
+    assert shard_of("dir/file.py", 1) == 1
+    # Stable across runs and processes (unlike the built-in hash)
+    assert [shard_of(path, 4) for path in ("a.py", "b.py", "c/d.py")] == [
+        zlib.crc32(path.encode()) % 4 + 1 for path in ("a.py", "b.py", "c/d.py")
+    ]
+
+
+def test_ordered_map_executor():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for _ in range(2):
+            results = ordered_map(lambda x: x + 1, range(100), 4, executor)
+            assert next(results) == 1
+            results.close()
+            assert list(ordered_map(lambda x: x + 1, range(10), 4, executor)) == list(
+                range(1, 11)
+            )
+
+
+async def _collect(results):
+    return [result async for result in results]
+
+
+@pytest.mark.parametrize("concurrency", [1, 8])
+def test_async_ordered_map(concurrency):
+    def func(x):
+        time.sleep(0.001 * (x % 3))
+        return x * x
+
+    results = async_ordered_map(func, iter(range(50)), concurrency)
+    assert run_coroutine(_collect(results)) == [x * x for x in range(50)]
+
+
+def test_async_ordered_map_overlaps_calls():
+    barrier = threading.Barrier(4, timeout=5)
+
+    def func(x):
+        # Deadlocks unless 4 calls are in flight at once
+        barrier.wait()
+        return x
+
+    results = async_ordered_map(func, range(8), 4, batch_size=1)
+    assert run_coroutine(_collect(results)) == list(range(8))
+
+
+def test_async_ordered_map_batches():
+    threads = {}
+
+    def func(x):
+        threads[x] = threading.get_ident()
+        return x
+
+    results = async_ordered_map(func, range(8), 2, batch_size=4)
+    assert run_coroutine(_collect(results)) == list(range(8))
+    assert len({threads[x] for x in range(4)}) == 1
+
+
+def test_async_ordered_map_propagates_error():
+    def func(x):
+        if x == 3:
+            raise ValueError(x)
+        return x
+
+    seen = []
+
+    async def collect():
+        async for result in async_ordered_map(func, range(100), 4):
+            seen.append(result)
+
+    with pytest.raises(ValueError, match="^3$"):
+        run_coroutine(collect())
+    assert seen == [0, 1, 2]
+
+
+@pytest.mark.parametrize(
+    "include, exclude, expected",
+    [
+        ((), (), ["a.py", "b.txt", "dir/c.py", "dir/sub/d.py"]),
+        (("*.py",), (), ["a.py", "dir/c.py", "dir/sub/d.py"]),
+        (("*.py", "*.txt"), ("dir/*",), ["a.py", "b.txt"]),
+        ((), ("dir/sub/*", "b.*"), ["a.py", "dir/c.py"]),
+    ],
+)
+def test_path_filter(include, exclude, expected):
+    paths = ["a.py", "b.txt", "dir/c.py", "dir/sub/d.py"]
+    assert list(filter(path_filter(include, exclude), paths)) == expected
+
+
+def test_tracked_files(git_repo):
+    (git_repo / "dir").mkdir()
+    for name in ("b.py", "a b.py", "dir/c.py", "untracked.py"):
+        (git_repo / name).write_text("print()\n")
+    (git_repo / "link.py").symlink_to("b.py")
+    git("add", "b.py", "a b.py", "dir/c.py", "link.py")
+    assert list(tracked_files()) == ["a b.py", "b.py", "dir/c.py"]
+
+
+def test_changed_files(git_repo):
+    for name in ("modified.py", "deleted.py", "renamed.py"):
+        (git_repo / name).write_text(f"# {name}\n")
+    git("add", ".")
+    git("commit", "-q", "-m", "Base")
+    (git_repo / "dir").mkdir()
+    (git_repo / "dir" / "added.py").write_text("print()\n")
+    (git_repo / "modified.py").write_text("print()\n")
+    (git_repo / "deleted.py").unlink()
+    (git_repo / "renamed.py").rename(git_repo / "moved.py")
+    (git_repo / "link.py").symlink_to("moved.py")
+    git("add", "-A")
+    git("commit", "-q", "-m", "Change")
+
+    added = changed_files("HEAD~1")
+    assert list(added) == ["dir/added.py", "moved.py"]
+    assert added["dir/added.py"] == git("rev-parse", "HEAD:dir/added.py").strip()
+    assert list(changed_files("HEAD~1", "HEAD", modified=True)) == [
+        "dir/added.py",
+        "modified.py",
+        "moved.py",
+    ]
+    assert changed_files("HEAD", "HEAD~1") == {
+        "deleted.py": git("rev-parse", "HEAD~1:deleted.py").strip(),
+        "renamed.py": git("rev-parse", "HEAD~1:renamed.py").strip(),
+    }
+    with pytest.raises(RuntimeError):
+        changed_files("unknown")
+
+
+def test_creation_years(git_repo, monkeypatch):
+    (git_repo / "dir").mkdir()
+    for name, year in (("old.py", 2019), ("dir/new file.py", 2021)):
+        (git_repo / name).write_text("print()\n")
+        git("add", name)
+        monkeypatch.setenv("GIT_AUTHOR_DATE", f"{year}-06-01T12:00:00")
+        git("commit", "-q", "-m", f"Add {name}")
+    git("rm", "-q", "old.py")
+    git("commit", "-q", "-m", "Remove old.py")
+    (git_repo / "old.py").write_text("print()\n")
+    git("add", "old.py")
+    git("commit", "-q", "-m", "Add old.py again")
+    (git_repo / "renamed.py").write_text("print()\n")
+    git("add", "renamed.py")
+    monkeypatch.setenv("GIT_AUTHOR_DATE", "2020-06-01T12:00:00")
+    git("commit", "-q", "-m", "Add renamed.py")
+    git("mv", "renamed.py", "dir/moved.py")
+    monkeypatch.setenv("GIT_AUTHOR_DATE", "2022-06-01T12:00:00")
+    git("commit", "-q", "-m", "Move renamed.py")
+    (git_repo / "untracked.py").write_text("print()\n")
+
+    with patch("scripts.util.cmd_output", wraps=cmd_output) as mock_cmd:
+        years = CreationYears()
+        assert years.get("old.py") == 2019
+        assert years.get("dir/new file.py") == 2021
+        assert years.get("dir/moved.py") == 2022
+        assert years.get("untracked.py") is None
+    assert sum(call.args[1] == "log" for call in mock_cmd.call_args_list) == 1
+
+    monkeypatch.chdir(git_repo / "dir")
+    assert CreationYears().get("new file.py") == 2021
+    assert CreationYears().get("../old.py") == 2019
+
+
+def test_git_cat_file(git_repo):
+    (git_repo / "my  file.py").write_text("print()\n")
+    git("add", "my  file.py")
+
+    with GitCatFile() as cat_file:
+        assert cat_file.read_blob(":my  file.py") == b"print()\n"
+        assert cat_file.read_blob(":not staged.py") is None
+        assert cat_file.read_blob(":not  staged  either.py") is None
+        assert cat_file.read_blob(":my  file.py") == b"print()\n"
+
+
+def test_git_dir(git_repo, tmp_path, monkeypatch):
+    (git_repo / "dir").mkdir()
+    monkeypatch.chdir(git_repo / "dir")
+    assert git_dir() == str(git_repo / ".git")
+
+    git("commit", "-q", "--allow-empty", "-m", "Initial commit")
+    git("worktree", "add", "-q", str(tmp_path / "worktree"))
+    monkeypatch.chdir(tmp_path / "worktree")
+    assert git_dir() == str(git_repo / ".git" / "worktrees" / "worktree")
+
+    monkeypatch.chdir(tmp_path)
+    assert git_dir() is None
+
+
+def test_added_files_memo(git_repo, tmp_path):
+    memo_dir = str(tmp_path / "memo")
+    (git_repo / "a.py").write_text("print()\n")
+    (git_repo / "b.py").write_text("print()\n")
+    git("add", "a.py")
+
+    with patch("scripts.util.cmd_output", wraps=cmd_output) as mock_cmd_fn:
+        assert added_files(memo_dir) == {"a.py"}
+        assert added_files(memo_dir) == {"a.py"}
+        assert mock_cmd_fn.call_count == 1
+
+        git("add", "b.py")
+        assert added_files(memo_dir) == {"a.py", "b.py"}
+        assert mock_cmd_fn.call_count == 2
+
+        git("commit", "-q", "-m", "Add files")
+        assert added_files(memo_dir) == set()
+        assert added_files(memo_dir) == set()
+        assert mock_cmd_fn.call_count == 3
+
+        assert added_files() == set()
+        assert mock_cmd_fn.call_count == 4
+
+
+@pytest.mark.parametrize(
+    "size, max_size, expected",
+    [(0, None, "empty"), (10, None, None), (10, 10, None), (11, 10, "oversized")],
+)
+def test_size_skip_reason(size, max_size, expected):
+    assert size_skip_reason(size, max_size) == expected
+
+
+@pytest.mark.parametrize(
+    "head, expected",
+    [
+        (b"", "empty"),
+        (b"print()\n", None),
+        (b"\x89PNG\r\n\x1a\n\0\0\0\rIHDR", "binary"),
+        (b"x" * 8000 + b"\0", None),
+        (
+            b"version https://git-lfs.github.com/spec/v1\n"
+            b"oid sha256:4d7a214614ab2935c943f9e0ff69d22e"
+            b"adbb8f32b1258daaa5e2ca24d17e2393\n"
+            b"size 12345\n",
+            "lfs-pointer",
+        ),
+        (b"version https://git-lfs.github.com/spec/v1\n" + b"x" * 1024, None),
+        ("\ufeffprint()\n".encode("utf-16-le"), None),
+        ("print()\n".encode("utf-16-be"), None),
+        ("\ufeffprint()\n".encode("utf-32-le"), None),
+    ],
+)
+def test_content_skip_reason(head, expected):
+    assert content_skip_reason(head) == expected
+
+
+@pytest.mark.parametrize(
+    "head, expected",
+    [
+        (b"", (None, 0)),
+        (b"print()\n", (None, 0)),
+        (b"\xa9 ACME", (None, 0)),
+        (b"\xef\xbb\xbfprint()\n", ("utf-8", 3)),
+        ("\ufeffprint()\n".encode("utf-16-le"), ("utf-16-le", 2)),
+        ("\ufeffprint()\n".encode("utf-16-be"), ("utf-16-be", 2)),
+        ("\ufeffprint()\n".encode("utf-32-le"), ("utf-32-le", 4)),
+        ("\ufeffprint()\n".encode("utf-32-be"), ("utf-32-be", 4)),
+        ("print()\n".encode("utf-16-le"), ("utf-16-le", 0)),
+        ("print()\n".encode("utf-16-be"), ("utf-16-be", 0)),
+        (b"\x89PNG\r\n\x1a\n\0\0\0\rIHDR", (None, 0)),
+    ],
+)
+def test_sniff_encoding(head, expected):
+    assert sniff_encoding(head) == expected
+
+
+@pytest.mark.parametrize(
+    "head, expected",
+    [
+        (b"print()\n", True),
+        ("# \u00a9 ACME\n".encode("utf-8"), True),
+        ("# \u00a9".encode("utf-8")[:-1], True),
+        ("# \u00a9 ACME\n".encode("latin-1"), False),
+    ],
+)
+def test_is_utf8(head, expected):
+    assert is_utf8(head) == expected
+
+
+def test_submodules(repo_with_submodules):
+    assert submodules() == ["libs/core", "libs/core/vendor/zlib"]
+    assert submodules("libs/core") == ["vendor/zlib"]
+
+
+def test_submodules_added_files(repo_with_submodules, tmp_path, monkeypatch):
+    memo_dir = str(tmp_path / "memo")
+    (repo_with_submodules / "added.py").write_text("print()\n")
+    git("add", "added.py")
+    for path in ("libs/core", "libs/core/vendor/zlib"):
+        (repo_with_submodules / path / "new.py").write_text("print()\n")
+        git("add", "new.py", cwd=repo_with_submodules / path)
+    # As set by Git hooks, for the superproject only
+    monkeypatch.setenv("GIT_INDEX_FILE", str(repo_with_submodules / ".git" / "index"))
+
+    for _ in range(2):
+        assert submodules_added_files(memo_dir, jobs=2) == (
+            ["libs/core", "libs/core/vendor/zlib"],
+            {"libs/core/new.py", "libs/core/vendor/zlib/new.py"},
+        )
+    assert added_files() == {"added.py"}
+    assert (tmp_path / "memo" / "submodules" / "libs%core").is_dir()
+
+
+def test_tracked_files_recurse_submodules(repo_with_submodules):
+    assert list(tracked_files()) == [".gitmodules", "main.py"]
+    assert list(tracked_files(recurse_submodules=True)) == [
+        ".gitmodules",
+        "libs/core/.gitmodules",
+        "libs/core/README.md",
+        "libs/core/vendor/zlib/README.md",
+        "main.py",
+    ]